@@ -1,23 +1,132 @@
 from pathlib import Path
+import argparse
+import sys
+
+import cv2
+
+from typing import List, Optional
 
 from src.processor.process_video import process_video
 import src.analyser.evaluate as evaluate
 
 import src.tracker.tracker_constants as tracker_constants
+import src.processor.output_constants as output_constants
+from src.processor.detection_scheduler import Scheduler_Options
+from src.processor.frame_renderer import Frame_Renderer
+from src.processor.motion_gate import Motion_Options
+from src.processor.trajectory_exporter import Export_Options
+from src.tracker.auto_tracker import Auto_Options
+import src.processor.stream as stream
+from src.tracker.multi_ball_tracker import Multi_Ball_Options
+import src.benchmark.benchmarks as benchmarks
+from src.benchmark.synthetic_video import RESOLUTIONS_ALL
+from src.detector.model_registry import get_detector
 
 
-def process(input_file: Path, tracker_type: str):
+def process(
+    input_file: Path,
+    tracker_type: str,
+    trace_file: Optional[Path] = None,
+    detection_budget: Optional[float] = None,
+    max_balls: Optional[int] = None,
+    motion_gate: bool = False,
+    tracking_scale: float = 1.0,
+    export_file: Optional[Path] = None,
+    fps_budget: Optional[float] = None,
+):
     result = process_video(
-        input_file=input_file, tracker_type=tracker_type, should_show_live_output=True
+        input_file=input_file,
+        tracker_type=tracker_type,
+        output_mode=output_constants.OUTPUT_LIVE,
+        trace_file=trace_file,
+        scheduler_options=(
+            Scheduler_Options(detection_budget=detection_budget)
+            if detection_budget is not None
+            else None
+        ),
+        multi_ball_options=(
+            Multi_Ball_Options(
+                max_tracks=max_balls,
+                tracker_type=tracker_type,
+                tracking_scale=tracking_scale,
+            )
+            if max_balls is not None
+            else None
+        ),
+        motion_options=Motion_Options() if motion_gate else None,
+        tracking_scale=tracking_scale,
+        export_file=export_file,
+        auto_options=Auto_Options(fps_budget=fps_budget),
+    )
+    print(result)
+
+
+def process_stream(args: argparse.Namespace):
+    # A number is a camera device index, anything else a file or URL.
+    source = int(args.source) if args.source.isdigit() else args.source
+    renderer = Frame_Renderer(offset_y=0)
+    for stream_frame in stream.process_stream(
+        source=source,
+        tracker_type=args.tracker,
+        options=stream.Stream_Options(
+            latency_budget=args.latency_budget,
+            drop_policy=args.drop_policy,
+            is_real_time=args.real_time,
+        ),
+        export_file=args.export_file,
+        # A live stream may run for hours, so only the export keeps its trajectory.
+        export_options=Export_Options(keep_trajectories=False),
+        auto_options=Auto_Options(fps_budget=args.fps_budget),
+    ):
+        canvas = stream_frame.frame.copy()
+        renderer.render(canvas, stream_frame.state)
+        cv2.imshow("Detection + Tracking", canvas)
+        if cv2.waitKey(1) == 27:
+            break
+    cv2.destroyAllWindows()
+
+
+def process_chunked(args: argparse.Namespace):
+    # The process pool is only imported by the subcommands that use it, for a fast startup.
+    from src.processor.chunked_processing import process_video_chunked
+
+    result = process_video_chunked(
+        input_file=args.input_file,
+        tracker_type=args.tracker,
+        output_mode=(
+            output_constants.OUTPUT_VIDEO
+            if args.write_video
+            else output_constants.OUTPUT_NONE
+        ),
+        max_workers=args.workers,
+        overlap_seconds=args.overlap_seconds,
     )
     print(result)
 
 
-def evaluate_video(input_file: Path, tracker_type: str):
+def evaluate_video(
+    input_file: Path, tracker_type: str, tracking_scales: Optional[List[float]] = None
+):
+    if tracking_scales:
+        results = evaluate.evaluate_tracking_scales(
+            input_file=input_file,
+            tracker_type=tracker_type,
+            tracking_scales=tracking_scales,
+        )
+        for result in results:
+            print(result)
+        return
+
     result = evaluate.evaluate_tracker(input_file=input_file, tracker_type=tracker_type)
     print(result)
 
 
+def calibrate(input_file: Path):
+    results = evaluate.calibrate_trackers(input_file=input_file)
+    for result in results:
+        print(result)
+
+
 def evaluate_all(input_file: Path):
     results = evaluate.evaluate_all_trackers(
         input_file=input_file, trackers_list=tracker_constants.TRACKERS_ALL
@@ -25,8 +134,295 @@ def evaluate_all(input_file: Path):
     print(results)
 
 
+def batch(args: argparse.Namespace):
+    from src.processor.batch_runner import run_batch
+
+    jobs_count = run_batch(
+        source=args.source,
+        results_file=args.results,
+        parameter_grid={
+            "tracker_type": args.trackers,
+            "detection_interval": args.detection_intervals,
+            "miss_threshold": args.miss_thresholds,
+        },
+        max_workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        use_detection_cache=args.use_detection_cache,
+    )
+    print(f"Ran {jobs_count} jobs, results in {args.results}")
+
+
+def benchmark(args: argparse.Namespace) -> int:
+    options = benchmarks.Benchmark_Options(
+        resolutions=[
+            tuple(int(value) for value in resolution.split("x"))
+            for resolution in args.resolutions
+        ],
+        frame_count=args.frame_count,
+        iterations=args.iterations,
+        repeat=args.repeat,
+    )
+    detector = get_detector()
+    results = benchmarks.run_benchmarks(options, detector)
+    benchmarks.write_results(
+        args.output, results, options, benchmarks.get_environment(detector)
+    )
+    print(f"Wrote {len(results)} benchmark results to {args.output}")
+
+    if args.save_baseline:
+        benchmarks.write_results(
+            args.baseline, results, options, benchmarks.get_environment(detector)
+        )
+        print(f"Saved the results as the baseline {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}, nothing to compare with")
+        return 0
+
+    regressions = benchmarks.compare_results(
+        results, benchmarks.read_results(args.baseline), args.tolerance
+    )
+    for regression in regressions:
+        print(
+            "REGRESSION {name}: {median:.6f}s vs {baseline_median:.6f}s "
+            "({ratio:.2f}x)".format(**regression)
+        )
+    if regressions:
+        return 1
+    print("No regressions against the baseline")
+    return 0
+
+
+def parse_args(default_input_file: Path) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Soccer ball detection & tracking")
+    subparsers = parser.add_subparsers(dest="command")
+
+    process_parser = subparsers.add_parser("process", help="Process a video live")
+    process_parser.add_argument("input_file", type=Path)
+    process_parser.add_argument(
+        "--tracker",
+        default=tracker_constants.TRACKER_MOSSE,
+        choices=tracker_constants.TRACKER_CHOICES_ALL,
+    )
+    process_parser.add_argument(
+        "--trace-file",
+        type=Path,
+        default=None,
+        help="Profile the stages and write their timeline to this Chrome trace JSON file",
+    )
+    process_parser.add_argument(
+        "--detection-budget",
+        type=float,
+        default=None,
+        help="Schedule detections from the tracking health, detecting at most this "
+        "fraction of the frames, e.g. 0.1",
+    )
+    process_parser.add_argument(
+        "--max-balls",
+        type=int,
+        default=None,
+        help="Track up to this many balls, following the primary ball in the output",
+    )
+    process_parser.add_argument(
+        "--motion-gate",
+        action="store_true",
+        help="Skip the detections where nothing moved near the ball since the last one",
+    )
+    process_parser.add_argument(
+        "--tracking-scale",
+        type=float,
+        default=1.0,
+        help="Track on frames downscaled by this factor, e.g. 0.5",
+    )
+    process_parser.add_argument(
+        "--export-file",
+        type=Path,
+        default=None,
+        help="Write the boundary of every frame while processing, to a .jsonl or "
+        ".csv file or, for any other path, a memory-mappable binary directory",
+    )
+    process_parser.add_argument(
+        "--fps-budget",
+        type=float,
+        default=None,
+        help="With --tracker AUTO, the frame rate to keep up with. "
+        "The frame rate of the video by default",
+    )
+
+    stream_parser = subparsers.add_parser(
+        "stream", help="Process a camera, URL or video as a live stream"
+    )
+    stream_parser.add_argument(
+        "source", help="A camera device index, a stream URL or a video file"
+    )
+    stream_parser.add_argument(
+        "--tracker",
+        default=tracker_constants.TRACKER_MOSSE,
+        choices=tracker_constants.TRACKER_CHOICES_ALL,
+    )
+    stream_parser.add_argument(
+        "--latency-budget",
+        type=float,
+        default=None,
+        help="Drop frames that waited longer than this many seconds",
+    )
+    stream_parser.add_argument(
+        "--drop-policy", default=stream.DROP_LATE, choices=stream.DROP_POLICIES_ALL
+    )
+    stream_parser.add_argument(
+        "--real-time",
+        action="store_true",
+        help="Read a video file at its frame rate, as if it was live",
+    )
+    stream_parser.add_argument(
+        "--export-file",
+        type=Path,
+        default=None,
+        help="Write the boundary of every frame while processing, to a .jsonl or "
+        ".csv file or, for any other path, a memory-mappable binary directory",
+    )
+    stream_parser.add_argument(
+        "--fps-budget",
+        type=float,
+        default=None,
+        help="With --tracker AUTO, the frame rate to keep up with. "
+        "The frame rate of the video by default",
+    )
+
+    chunked_parser = subparsers.add_parser(
+        "process-chunked",
+        help="Process a long video in parallel segments",
+    )
+    chunked_parser.add_argument("input_file", type=Path)
+    chunked_parser.add_argument(
+        "--tracker",
+        default=tracker_constants.TRACKER_MOSSE,
+        choices=tracker_constants.TRACKER_CHOICES_ALL,
+    )
+    chunked_parser.add_argument("--workers", type=int, default=None)
+    chunked_parser.add_argument("--overlap-seconds", type=float, default=2.0)
+    chunked_parser.add_argument("--write-video", action="store_true")
+
+    evaluate_parser = subparsers.add_parser("evaluate", help="Evaluate one tracker")
+    evaluate_parser.add_argument("input_file", type=Path)
+    evaluate_parser.add_argument(
+        "--tracker",
+        default=tracker_constants.TRACKER_MOSSE,
+        choices=tracker_constants.TRACKER_CHOICES_ALL,
+    )
+    evaluate_parser.add_argument(
+        "--tracking-scales",
+        nargs="+",
+        type=float,
+        default=None,
+        help="Compare the accuracy and FPS of tracking at these scales, e.g. 1 0.5 0.25",
+    )
+
+    evaluate_all_parser = subparsers.add_parser(
+        "evaluate-all", help="Evaluate all the trackers"
+    )
+    evaluate_all_parser.add_argument(
+        "input_file", type=Path, nargs="?", default=default_input_file
+    )
+
+    calibrate_parser = subparsers.add_parser(
+        "calibrate",
+        help="Measure the cost and accuracy of every tracker on this host, for AUTO",
+    )
+    calibrate_parser.add_argument(
+        "input_file", type=Path, nargs="?", default=default_input_file
+    )
+
+    batch_parser = subparsers.add_parser(
+        "batch", help="Sweep parameters over many videos on a process pool"
+    )
+    batch_parser.add_argument(
+        "source", type=Path, help="A directory of videos or a manifest of video paths"
+    )
+    batch_parser.add_argument(
+        "--results",
+        type=Path,
+        default=Path("output") / "batch_results.jsonl",
+        help="JSONL or CSV results file. Completed jobs in it are skipped.",
+    )
+    batch_parser.add_argument(
+        "--trackers",
+        nargs="+",
+        default=tracker_constants.TRACKERS_ALL,
+        choices=tracker_constants.TRACKERS_ALL,
+    )
+    batch_parser.add_argument(
+        "--detection-intervals", nargs="+", type=int, default=[10]
+    )
+    batch_parser.add_argument("--miss-thresholds", nargs="+", type=int, default=[5])
+    batch_parser.add_argument("--workers", type=int, default=None)
+    batch_parser.add_argument("--threads-per-worker", type=int, default=None)
+    batch_parser.add_argument("--use-detection-cache", action="store_true")
+
+    benchmark_parser = subparsers.add_parser(
+        "benchmark",
+        help="Benchmark the detector, trackers and pipeline on synthetic videos",
+    )
+    benchmark_parser.add_argument(
+        "--resolutions",
+        nargs="+",
+        default=[f"{width}x{height}" for width, height in RESOLUTIONS_ALL],
+    )
+    benchmark_parser.add_argument("--frame-count", type=int, default=150)
+    benchmark_parser.add_argument("--iterations", type=int, default=50)
+    benchmark_parser.add_argument("--repeat", type=int, default=3)
+    benchmark_parser.add_argument(
+        "--output", type=Path, default=benchmarks.DEFAULT_RESULTS_FILE
+    )
+    benchmark_parser.add_argument(
+        "--baseline", type=Path, default=benchmarks.DEFAULT_BASELINE_FILE
+    )
+    benchmark_parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Save the results as the baseline instead of comparing with it",
+    )
+    benchmark_parser.add_argument(
+        "--tolerance", type=float, default=benchmarks.REGRESSION_TOLERANCE
+    )
+
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
     FILE = Path(__file__).resolve()
     ROOT = FILE.parent
     input_file = ROOT / "input" / "input1.mp4"
-    evaluate_all(input_file=input_file)
+    args = parse_args(input_file)
+
+    if args.command == "process":
+        process(
+            input_file=args.input_file,
+            tracker_type=args.tracker,
+            trace_file=args.trace_file,
+            detection_budget=args.detection_budget,
+            max_balls=args.max_balls,
+            motion_gate=args.motion_gate,
+            tracking_scale=args.tracking_scale,
+            export_file=args.export_file,
+            fps_budget=args.fps_budget,
+        )
+    elif args.command == "stream":
+        process_stream(args)
+    elif args.command == "process-chunked":
+        process_chunked(args)
+    elif args.command == "evaluate":
+        evaluate_video(
+            input_file=args.input_file,
+            tracker_type=args.tracker,
+            tracking_scales=args.tracking_scales,
+        )
+    elif args.command == "calibrate":
+        calibrate(input_file=args.input_file)
+    elif args.command == "batch":
+        batch(args)
+    elif args.command == "benchmark":
+        sys.exit(benchmark(args))
+    else:
+        evaluate_all(input_file=getattr(args, "input_file", input_file))
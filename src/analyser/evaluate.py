@@ -1,71 +1,214 @@
-from typing import Tuple, List
+from typing import List, Optional, Sequence
 from pathlib import Path
-
+from logger import logger
 import math
 
-from src.processor.process_video import process_video
+import src.analyser.metrics as metrics
+from src.detector.soccer_ball_detector import Soccer_Ball_Detector
+from src.processor.process_video import (
+    process_video,
+    process_video_shared_detections,
+)
+from src.processor.result import Process_Result
+import src.processor.output_constants as output_constants
+import src.tracker.tracker_registry as tracker_registry
+import src.utils.profiler as profiler_utils
 
 
-def calculate_iou(
-    bbox_A: Tuple[int, int, int, int], bbox_B: Tuple[int, int, int, int]
-) -> float:
-    xA = max(bbox_A[0], bbox_B[0])
-    yA = max(bbox_A[1], bbox_B[1])
-    xB = min(bbox_A[0] + bbox_A[2], bbox_B[0] + bbox_B[2])
-    yB = min(bbox_A[1] + bbox_A[3], bbox_B[1] + bbox_B[3])
+def summarise_results(results: Sequence[Process_Result]) -> List[dict]:
+    """
+    summarise_results compares the detected and tracked boundaries of evaluation
+    mode runs and returns the metrics of each, computed for all the runs at once.
+    Metrics that cannot be computed, e.g. the mean IoU of a run where the
+    tracker never agreed with a detection, or the tracker FPS of a run that did
+    not share its decoding and detection, are NaN.
 
-    intersection_area = max(0, xB - xA) * max(0, yB - yA)
-    bbox_A_area = bbox_A[2] * bbox_A[3]
-    bbox_B_area = bbox_B[2] * bbox_B[3]
-    return intersection_area / float(bbox_A_area + bbox_B_area - intersection_area)
+    :param results: The results of evaluation mode runs.
+    :type results: Sequence[Process_Result]
+    """
+    if len(results) == 0:
+        return []
 
+    run_metrics = metrics.calculate_result_metrics(results)
+    summaries = []
+    for i, result in enumerate(results):
+        tracker_time = result.processing_time - result.shared_processing_time
+        summary = {
+            "tracker_type": result.tracker_type,
+            "tracking_scale": result.tracking_scale,
+            "input_path": str(result.input_path),
+            "input_fps": result.input_fps,
+            "output_fps": result.frame_count / result.processing_time,
+            # Only runs with shared detections time the tracker on its own.
+            "tracker_fps": (
+                result.frame_count / tracker_time
+                if result.shared_processing_time > 0
+                else float("nan")
+            ),
+            # How often a detection made the tracker start over, and what correcting cost.
+            "tracker_reinit_rate": (
+                result.tracker_reinit_count / result.correction_call_count
+                if result.correction_call_count > 0
+                else float("nan")
+            ),
+            "mean_correction_time": (
+                result.correction_time / result.correction_call_count
+                if result.correction_call_count > 0
+                else float("nan")
+            ),
+        }
+        for name, values in run_metrics.items():
+            # The curves are left out, use `metrics.calculate_result_metrics` for them.
+            if values.ndim == 1:
+                summary[name] = values[i].item()
+        summaries.append(summary)
+    return summaries
 
-def calculate_euclidean_distance(
-    bbox_A: Tuple[int, int, int, int], bbox_B: Tuple[int, int, int, int]
-) -> float:
-    ax, ay, aw, ah = bbox_A
-    bx, by, bw, bh = bbox_B
-    center_A = (ax + aw / 2, ay + ah / 2)
-    center_B = (bx + bw / 2, by + bh / 2)
-    return math.sqrt(
-        (center_A[0] - center_B[0]) ** 2 + (center_A[1] - center_B[1]) ** 2
-    )
 
+def summarise_result(result: Process_Result) -> dict:
+    """
+    summarise_result compares the detected and tracked boundaries of an
+    evaluation mode run and returns its metrics, see `summarise_results`.
+
+    :param result: The result of an evaluation mode run.
+    :type result: Process_Result
+    """
+    return summarise_results([result])[0]
 
-def evaluate_tracker(input_file: Path, tracker_type: str):
+
+def evaluate_tracker(
+    input_file: Path, tracker_type: str, use_detection_cache: bool = False
+):
     result = process_video(
         input_file=input_file,
         tracker_type=tracker_type,
-        should_show_live_output=False,
         is_in_evaluation_mode=True,
+        output_mode=output_constants.OUTPUT_NONE,
+        use_detection_cache=use_detection_cache,
     )
+    return summarise_result(result)
 
-    ious = []
-    distances = []
-    for detected_bbox, tracked_bbox in zip(
-        result.detected_bbox_list, result.tracked_bbox_list
-    ):
-        if detected_bbox is None or tracked_bbox is None:
-            continue
 
-        ious.append(calculate_iou(detected_bbox, tracked_bbox))
-        distances.append(calculate_euclidean_distance(detected_bbox, tracked_bbox))
+def evaluate_all_trackers(
+    input_file: Path,
+    trackers_list: List[str],
+    share_detections: bool = True,
+    use_detection_cache: bool = False,
+):
+    """
+    evaluate_all_trackers evaluates every tracker in the list on the video.
+
+    :param input_file: Path to the input video
+    :type input_file: Path
+    :param trackers_list: Types of the trackers to evaluate
+    :type trackers_list: List[str]
+    :param share_detections: Whether to decode and detect every frame once and feed
+    the same detections to all the trackers, instead of one full run per tracker.
+    :type share_detections: bool
+    :param use_detection_cache: Whether to read detections from the on-disk detection cache.
+    :type use_detection_cache: bool
+    """
+    if not share_detections:
+        return [
+            evaluate_tracker(
+                input_file=input_file,
+                tracker_type=tracker,
+                use_detection_cache=use_detection_cache,
+            )
+            for tracker in trackers_list
+        ]
+
+    results = process_video_shared_detections(
+        input_file=input_file,
+        tracker_types=trackers_list,
+        use_detection_cache=use_detection_cache,
+    )
+    return summarise_results(results)
+
+
+def evaluate_tracking_scales(
+    input_file: Path,
+    tracker_type: str,
+    tracking_scales: Sequence[float],
+    use_detection_cache: bool = False,
+):
+    """
+    evaluate_tracking_scales evaluates the tracker at each tracking scale on the
+    video, in a single pass with shared detections, to compare the accuracy and
+    FPS of tracking on downscaled frames.
+
+    :param input_file: Path to the input video
+    :type input_file: Path
+    :param tracker_type: Type of the tracker to evaluate
+    :type tracker_type: str
+    :param tracking_scales: The scales of the frames the tracker works on, e.g. [1, 0.5, 0.25]
+    :type tracking_scales: Sequence[float]
+    :param use_detection_cache: Whether to read detections from the on-disk detection cache.
+    :type use_detection_cache: bool
+    """
+    results = process_video_shared_detections(
+        input_file=input_file,
+        tracker_types=[tracker_type] * len(tracking_scales),
+        use_detection_cache=use_detection_cache,
+        tracking_scales=list(tracking_scales),
+    )
+    return summarise_results(results)
 
-    mean_iou = sum(ious) / len(ious)
-    mean_distance = sum(distances) / len(distances)
 
-    return {
-        "tracker_type": result.tracker_type,
-        "input_path": str(result.input_path),
-        "input_fps": result.input_fps,
-        "output_fps": result.frame_count / result.processing_time,
-        "mean_iou": mean_iou,
-        "mean_distance": mean_distance,
-    }
+def calibrate_trackers(
+    input_file: Path,
+    tracker_types: Optional[List[str]] = None,
+    use_detection_cache: bool = False,
+    profile_file: Path = tracker_registry.DEFAULT_PROFILE_FILE,
+    detector: Optional[Soccer_Ball_Detector] = None,
+):
+    """
+    calibrate_trackers evaluates the trackers on the video, with shared detections,
+    and sets their profiles to the measured time per update and mean IoU, the
+    quantities `Auto_Tracker` follows. The profiles are saved for this host, so
+    that later runs of the automatic tracker use them.
 
+    :param input_file: Path to the input video
+    :type input_file: Path
+    :param tracker_types: Types of the trackers to calibrate. All the registered ones by default.
+    :type tracker_types: Optional[List[str]]
+    :param use_detection_cache: Whether to read detections from the on-disk detection cache.
+    :type use_detection_cache: bool
+    :param profile_file: The file of the calibrated profiles.
+    :type profile_file: Path
+    :param detector: The detector to use, see `process_video_shared_detections`.
+    :type detector: Optional[Soccer_Ball_Detector]
+    """
+    if tracker_types is None:
+        tracker_types = tracker_registry.get_tracker_types()
+
+    results = process_video_shared_detections(
+        input_file=input_file,
+        tracker_types=tracker_types,
+        detector=detector,
+        use_detection_cache=use_detection_cache,
+        profile=True,
+    )
+    summaries = summarise_results(results)
+    for result, summary in zip(results, summaries):
+        # The tracker is only updated once a detection started it.
+        track_stats = result.stage_stats.get(profiler_utils.STAGE_TRACK)
+        if track_stats is None or track_stats.count == 0:
+            logger.warning(
+                "The %s tracker never ran, its profile is not calibrated",
+                result.tracker_type,
+            )
+            continue
 
-def evaluate_all_trackers(input_file: Path, trackers_list: List[str]):
-    return [
-        evaluate_tracker(input_file=input_file, tracker_type=tracker)
-        for tracker in trackers_list
-    ]
+        # A tracker that never agreed with a detection has no mean IoU.
+        accuracy = summary["mean_iou"]
+        tracker_registry.set_tracker_profile(
+            result.tracker_type,
+            tracker_registry.Tracker_Profile(
+                frame_cost=track_stats.total_time / track_stats.count,
+                accuracy=0.0 if math.isnan(accuracy) else accuracy,
+                is_calibrated=True,
+            ),
+        )
+    tracker_registry.save_tracker_profiles(profile_file)
+    return summaries
@@ -0,0 +1,281 @@
+from typing import Dict, Optional, Sequence
+
+import warnings
+
+import numpy as np
+
+from src.processor.result import Process_Result
+from src.utils.boundary_utils import calculate_center_errors, calculate_ious
+
+# The center errors, in pixels, at which the precision curve is evaluated.
+DISTANCE_THRESHOLDS = np.arange(0, 51, dtype=np.float64)
+# The IoUs at which the success curve is evaluated.
+IOU_THRESHOLDS = np.linspace(0, 1, 21)
+# The center error, in pixels, at which the precision is reported.
+PRECISION_DISTANCE = 20.0
+# A compared frame whose IoU is at most this means the tracker follows another object.
+IDENTITY_SWITCH_IOU = 0.0
+LATENCY_PERCENTILES = (50, 95, 99)
+
+
+def _nanmean(values: np.ndarray) -> np.ndarray:
+    """
+    _nanmean is the mean over the last axis ignoring NaNs, NaN when there are
+    no values, without warning.
+    """
+    is_valid = ~np.isnan(values)
+    counts = is_valid.sum(axis=-1)
+    totals = np.where(is_valid, values, 0).sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(counts > 0, totals / counts, np.nan)
+
+
+def _count_bins(bin_indices: np.ndarray, bins_count: int) -> np.ndarray:
+    """
+    _count_bins counts the occurrences of each bin index in every row,
+    returning an array of shape (..., bins_count).
+    """
+    # Rows without any frame cannot be reshaped, and have no occurrences.
+    if bin_indices.shape[-1] == 0:
+        return np.zeros(bin_indices.shape[:-1] + (bins_count,), dtype=np.int64)
+    rows = bin_indices.reshape(-1, bin_indices.shape[-1])
+    offsets = np.arange(len(rows))[:, None] * bins_count
+    counts = np.bincount(
+        (rows + offsets).ravel(), minlength=len(rows) * bins_count
+    ).reshape(len(rows), bins_count)
+    return counts.reshape(bin_indices.shape[:-1] + (bins_count,))
+
+
+def calculate_precision_curve(
+    center_errors: np.ndarray, thresholds: np.ndarray = DISTANCE_THRESHOLDS
+) -> np.ndarray:
+    """
+    calculate_precision_curve returns, for each threshold, the fraction of the
+    compared frames whose center error is at most the threshold.
+
+    :param center_errors: The center errors, shape (..., frames), NaN where not compared.
+    :type center_errors: np.ndarray
+    :param thresholds: The increasing distance thresholds, in pixels.
+    :type thresholds: np.ndarray
+    :return: The curves, shape (..., thresholds). NaN for runs without compared frames.
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    # An error is at most the k-th threshold iff its index is at most k.
+    # NaN errors are sorted after every threshold, so they are never counted.
+    bin_indices = np.searchsorted(thresholds, center_errors, side="left")
+    counts = _count_bins(bin_indices, len(thresholds) + 1)
+    hits = np.cumsum(counts, axis=-1)[..., :-1]
+    compared_counts = (~np.isnan(center_errors)).sum(axis=-1)[..., None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(compared_counts > 0, hits / compared_counts, np.nan)
+
+
+def calculate_success_curve(
+    ious: np.ndarray, thresholds: np.ndarray = IOU_THRESHOLDS
+) -> np.ndarray:
+    """
+    calculate_success_curve returns, for each threshold, the fraction of the
+    compared frames whose IoU is above the threshold.
+
+    :param ious: The IoUs, shape (..., frames), NaN where not compared.
+    :type ious: np.ndarray
+    :param thresholds: The increasing IoU thresholds.
+    :type thresholds: np.ndarray
+    :return: The curves, shape (..., thresholds). NaN for runs without compared frames.
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    is_compared = ~np.isnan(ious)
+    # An IoU is above the k-th threshold iff its index is above k.
+    bin_indices = np.where(
+        is_compared, np.searchsorted(thresholds, ious, side="left"), 0
+    )
+    counts = _count_bins(bin_indices, len(thresholds) + 1)
+    hits = np.cumsum(counts[..., ::-1], axis=-1)[..., ::-1][..., 1:]
+    compared_counts = is_compared.sum(axis=-1)[..., None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(compared_counts > 0, hits / compared_counts, np.nan)
+
+
+def calculate_run_lengths(mask: np.ndarray) -> np.ndarray:
+    """
+    calculate_run_lengths returns, for every frame, the number of consecutive
+    frames up to and including it where the mask is set, 0 where it is not.
+
+    :param mask: The mask, shape (..., frames).
+    :type mask: np.ndarray
+    """
+    counts = np.cumsum(mask, axis=-1)
+    # The count at the last unset frame, carried forward.
+    counts_at_reset = np.maximum.accumulate(np.where(mask, 0, counts), axis=-1)
+    return counts - counts_at_reset
+
+
+def count_run_starts(mask: np.ndarray) -> np.ndarray:
+    """
+    count_run_starts returns the number of runs of consecutive set frames.
+
+    :param mask: The mask, shape (..., frames).
+    :type mask: np.ndarray
+    """
+    previous = np.zeros_like(mask)
+    previous[..., 1:] = mask[..., :-1]
+    return (mask & ~previous).sum(axis=-1)
+
+
+def count_identity_switches(
+    ious: np.ndarray, iou_threshold: float = IDENTITY_SWITCH_IOU
+) -> np.ndarray:
+    """
+    count_identity_switches counts the compared frames where the tracked box stops
+    agreeing with the detection, i.e. its IoU drops to at most the threshold
+    while it was above it at the previous compared frame.
+
+    :param ious: The IoUs, shape (..., frames), NaN where not compared.
+    :type ious: np.ndarray
+    :param iou_threshold: The IoU at or below which the boxes disagree.
+    :type iou_threshold: float
+    """
+    is_compared = ~np.isnan(ious)
+    does_agree = ious > iou_threshold
+
+    # The agreement at the last compared frame before each frame.
+    frame_indices = np.arange(ious.shape[-1])
+    last_compared = np.maximum.accumulate(
+        np.where(is_compared, frame_indices, -1), axis=-1
+    )
+    previous_compared = np.full_like(last_compared, -1)
+    previous_compared[..., 1:] = last_compared[..., :-1]
+    previous_agreement = np.take_along_axis(
+        does_agree, np.clip(previous_compared, 0, None), axis=-1
+    ) & (previous_compared >= 0)
+
+    return (is_compared & ~does_agree & previous_agreement).sum(axis=-1)
+
+
+def calculate_latency_percentiles(
+    frame_latencies: np.ndarray, percentiles: Sequence[float] = LATENCY_PERCENTILES
+) -> np.ndarray:
+    """
+    calculate_latency_percentiles returns the percentiles of the per-frame latencies.
+
+    :param frame_latencies: The latencies, shape (..., frames), NaN for padding.
+    :type frame_latencies: np.ndarray
+    :param percentiles: The percentiles to compute, between 0 and 100.
+    :type percentiles: Sequence[float]
+    :return: The percentiles, shape (..., percentiles). NaN for runs without latencies.
+    """
+    if frame_latencies.shape[-1] == 0:
+        return np.full(frame_latencies.shape[:-1] + (len(percentiles),), np.nan)
+    with warnings.catch_warnings():
+        # Runs without latencies are all-NaN slices, which give NaN.
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.moveaxis(
+            np.nanpercentile(frame_latencies, percentiles, axis=-1), 0, -1
+        )
+
+
+def stack_columns(columns: Sequence[np.ndarray], fill_value=np.nan) -> np.ndarray:
+    """
+    stack_columns stacks per-run columns of different lengths into one array,
+    padding the shorter runs with the fill value.
+
+    :param columns: One column per run, each of shape (frames, ...).
+    :type columns: Sequence[np.ndarray]
+    :param fill_value: The value of the padding.
+    :return: The stacked columns, shape (runs, max frames, ...).
+    """
+    length = max((len(column) for column in columns), default=0)
+    trailing_shape = columns[0].shape[1:] if len(columns) > 0 else ()
+    stacked = np.full(
+        (len(columns), length) + trailing_shape, fill_value, dtype=np.float64
+    )
+    for i, column in enumerate(columns):
+        stacked[i, : len(column)] = column
+    return stacked
+
+
+def calculate_metrics(
+    detected_boxes: np.ndarray,
+    tracked_boxes: np.ndarray,
+    frame_counts: Optional[np.ndarray] = None,
+    frame_latencies: Optional[np.ndarray] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    calculate_metrics compares the tracked boxes with the detected boxes, taken as
+    the ground truth, of any number of runs at once.
+
+    :param detected_boxes: The detected boxes, shape (..., frames, 4), NaN where missing.
+    :type detected_boxes: np.ndarray
+    :param tracked_boxes: The tracked boxes, shape (..., frames, 4), NaN where missing.
+    :type tracked_boxes: np.ndarray
+    :param frame_counts: The number of frames of each run, shape (...). Defaults to
+    the number of frames of the arrays, i.e. runs without padding.
+    :type frame_counts: Optional[np.ndarray]
+    :param frame_latencies: The latency of each frame, shape (..., frames), NaN for padding.
+    :type frame_latencies: Optional[np.ndarray]
+    :return: The metrics, each of shape (...), or (..., thresholds) for the curves.
+    """
+    ious = calculate_ious(detected_boxes, tracked_boxes)
+    center_errors = calculate_center_errors(detected_boxes, tracked_boxes)
+    is_tracked = ~np.isnan(tracked_boxes).any(axis=-1)
+    if frame_counts is None:
+        frame_counts = np.full(is_tracked.shape[:-1], is_tracked.shape[-1])
+
+    compared_counts = (~np.isnan(ious)).sum(axis=-1)
+    success_curve = calculate_success_curve(ious)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(
+            compared_counts > 0,
+            (center_errors <= PRECISION_DISTANCE).sum(axis=-1) / compared_counts,
+            np.nan,
+        )
+        longest_track_ratio = (
+            calculate_run_lengths(is_tracked).max(axis=-1, initial=0) / frame_counts
+        )
+        tracked_ratio = is_tracked.sum(axis=-1) / frame_counts
+
+    fragment_counts = count_run_starts(is_tracked)
+    metrics = {
+        "compared_frame_count": compared_counts,
+        "mean_iou": _nanmean(ious),
+        "mean_distance": _nanmean(center_errors),
+        "precision": precision,
+        "precision_curve": calculate_precision_curve(center_errors),
+        "success_auc": success_curve.mean(axis=-1),
+        "success_curve": success_curve,
+        "tracked_ratio": tracked_ratio,
+        "longest_track_ratio": longest_track_ratio,
+        "track_fragment_count": fragment_counts,
+        # Every fragment after the first is the ball being found again after
+        # the tracker lost it.
+        "reacquisition_count": np.clip(fragment_counts - 1, 0, None),
+        "identity_switch_count": count_identity_switches(ious),
+    }
+    if frame_latencies is not None:
+        latency_percentiles = calculate_latency_percentiles(frame_latencies)
+        for i, percentile in enumerate(LATENCY_PERCENTILES):
+            metrics[f"latency_p{percentile}"] = latency_percentiles[..., i]
+    return metrics
+
+
+def calculate_result_metrics(
+    results: Sequence[Process_Result],
+) -> Dict[str, np.ndarray]:
+    """
+    calculate_result_metrics computes the metrics of many runs at once.
+
+    :param results: The results of the runs, ideally in evaluation mode so that
+    every frame has a detection to compare with.
+    :type results: Sequence[Process_Result]
+    :return: The metrics, indexed by run first, see `calculate_metrics`.
+    """
+    return calculate_metrics(
+        detected_boxes=stack_columns(
+            [result.detected_trajectory.boxes for result in results]
+        ),
+        tracked_boxes=stack_columns(
+            [result.tracked_trajectory.boxes for result in results]
+        ),
+        frame_counts=np.array([result.frame_count for result in results]),
+        frame_latencies=stack_columns([result.frame_latencies for result in results]),
+    )
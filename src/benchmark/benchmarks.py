@@ -0,0 +1,458 @@
+from pathlib import Path
+from dataclasses import asdict, dataclass, field
+from logger import logger
+import functools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from src.benchmark.synthetic_video import (
+    RESOLUTIONS_ALL,
+    Synthetic_Video_Options,
+    generate_synthetic_video,
+    get_ball_boxes,
+    render_background,
+    render_frame,
+)
+from src.detector.detect_soccer_ball import detect_soccer_ball
+from src.detector.model_registry import get_detector
+from src.detector.soccer_ball_detector import Soccer_Ball_Detector
+import src.processor.output_constants as output_constants
+from src.processor.process_video import process_video
+import src.tracker.tracker_constants as tracker_constants
+from src.tracker.tracker_creator import create_tracker
+from src.utils.banner_utils import add_banner
+
+# Define common PATHs
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[2]
+
+DEFAULT_RESULTS_FILE = ROOT / "output" / "benchmark.json"
+DEFAULT_BASELINE_FILE = ROOT / "benchmark" / "baseline.json"
+
+# A benchmark regresses when its median is this much slower than the baseline.
+REGRESSION_TOLERANCE = 0.15
+
+RESULTS_VERSION = 1
+
+# The subcommands of app.py whose startup is timed, see `benchmark_startup`.
+STARTUP_COMMANDS = [
+    "process",
+    "stream",
+    "process-chunked",
+    "evaluate",
+    "evaluate-all",
+    "batch",
+    "benchmark",
+]
+
+
+@dataclass
+class Benchmark_Options:
+    """
+    Benchmark_Options selects what the benchmark suite runs.
+    """
+
+    resolutions: List[Tuple[int, int]] = field(
+        default_factory=lambda: list(RESOLUTIONS_ALL)
+    )
+    # The frames of each synthetic video.
+    frame_count: int = 150
+    # The calls timed by each microbenchmark, after the warm-up calls.
+    iterations: int = 50
+    warmup_iterations: int = 5
+    # The runs of the full `process_video` loop timed per tracker and output mode.
+    repeat: int = 3
+    trackers: List[str] = field(
+        default_factory=lambda: list(tracker_constants.TRACKERS_ALL)
+    )
+    output_modes: List[str] = field(
+        default_factory=lambda: [
+            output_constants.OUTPUT_NONE,
+            output_constants.OUTPUT_VIDEO,
+        ]
+    )
+    # The app.py subcommands whose startup is timed, `repeat` times each.
+    startup_commands: List[str] = field(default_factory=lambda: list(STARTUP_COMMANDS))
+
+
+@dataclass
+class Benchmark_Result:
+    """
+    Benchmark_Result holds the timings of one benchmark, in seconds per call.
+    """
+
+    name: str
+    iterations: int
+    median: float
+    mean: float
+    minimum: float
+    p95: float
+    # The frames processed by one call, e.g. all the frames of a video for a full run.
+    frames_per_call: int = 1
+
+    @property
+    def fps(self) -> float:
+        return self.frames_per_call / self.median if self.median > 0 else float("inf")
+
+
+def summarise_times(
+    name: str, times: Sequence[float], frames_per_call: int = 1
+) -> Benchmark_Result:
+    """
+    summarise_times summarises the durations of the calls of a benchmark.
+
+    :param name: The name of the benchmark.
+    :type name: str
+    :param times: The duration of each call, in seconds.
+    :type times: Sequence[float]
+    :param frames_per_call: The frames processed by one call.
+    :type frames_per_call: int
+    """
+    times = np.asarray(times, dtype=np.float64)
+    return Benchmark_Result(
+        name=name,
+        iterations=len(times),
+        median=float(np.median(times)),
+        mean=float(times.mean()),
+        minimum=float(times.min()),
+        p95=float(np.percentile(times, 95)),
+        frames_per_call=frames_per_call,
+    )
+
+
+def time_calls(
+    function: Callable, arguments: Sequence[tuple], warmup_iterations: int = 0
+) -> List[float]:
+    """
+    time_calls calls the function once with each of the arguments and returns
+    the duration of each call. The first calls are warm-up calls and are not returned.
+
+    :param function: The function to time.
+    :type function: Callable
+    :param arguments: The positional arguments of each call.
+    :type arguments: Sequence[tuple]
+    :param warmup_iterations: The number of first calls that are not returned.
+    :type warmup_iterations: int
+    """
+    times = []
+    for args in arguments:
+        start_time = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start_time)
+    return times[warmup_iterations:]
+
+
+def benchmark_detector(
+    detector: Soccer_Ball_Detector, frames: List[np.ndarray], options: Benchmark_Options
+) -> List[Benchmark_Result]:
+    """
+    benchmark_detector times the detection of a single frame, through the
+    detector and through `detect_soccer_ball` for the OpenCV backend.
+    """
+    count = options.warmup_iterations + options.iterations
+    arguments = [(frames[i % len(frames)],) for i in range(count)]
+    results = [
+        summarise_times(
+            "detector.detect",
+            time_calls(detector.detect, arguments, options.warmup_iterations),
+        )
+    ]
+
+    net = getattr(detector, "net", None)
+    if net is not None:
+        height, width = frames[0].shape[:2]
+        results.append(
+            summarise_times(
+                "detect_soccer_ball",
+                time_calls(
+                    detect_soccer_ball,
+                    [
+                        (frame, net, width, height, detector.output_layer_names)
+                        for (frame,) in arguments
+                    ],
+                    options.warmup_iterations,
+                ),
+            )
+        )
+    return results
+
+
+def benchmark_tracker(
+    tracker_type: str,
+    frames: List[np.ndarray],
+    boxes: np.ndarray,
+    fps: int,
+    options: Benchmark_Options,
+) -> List[Benchmark_Result]:
+    """
+    benchmark_tracker times the `update` and `correct` of the tracker on
+    consecutive frames, starting from the ground truth box of the first frame.
+    `correct` is given the ground truth box of each frame.
+    """
+    count = 1 + options.warmup_iterations + options.iterations
+    frames = frames[:count]
+    boxes = [tuple(int(value) for value in box) for box in boxes[:count]]
+
+    tracker = create_tracker(tracker_type)
+    tracker.init(frames[0], boxes[0], fps)
+    update_times = time_calls(
+        tracker.update,
+        [(frame,) for frame in frames[1:]],
+        options.warmup_iterations,
+    )
+
+    tracker = create_tracker(tracker_type)
+    tracker.init(frames[0], boxes[0], fps)
+    correct_times = time_calls(
+        tracker.correct,
+        [(frame, box, fps) for frame, box in zip(frames[1:], boxes[1:])],
+        options.warmup_iterations,
+    )
+    return [
+        summarise_times(f"tracker.update[{tracker_type}]", update_times),
+        summarise_times(f"tracker.correct[{tracker_type}]", correct_times),
+    ]
+
+
+def benchmark_banner(
+    frames: List[np.ndarray], options: Benchmark_Options
+) -> Benchmark_Result:
+    """
+    benchmark_banner times `add_banner` on single frames.
+    """
+    count = options.warmup_iterations + options.iterations
+    return summarise_times(
+        "add_banner",
+        time_calls(
+            add_banner,
+            [(frames[i % len(frames)],) for i in range(count)],
+            options.warmup_iterations,
+        ),
+    )
+
+
+def benchmark_detector_load(
+    detector: Soccer_Ball_Detector, options: Benchmark_Options
+) -> Benchmark_Result:
+    """
+    benchmark_detector_load times loading a new detector with the backend, target
+    and input size of the detector, i.e. what the first `get_detector` of a process costs.
+    """
+    return summarise_times(
+        "detector.load",
+        time_calls(
+            Soccer_Ball_Detector,
+            [(detector.backend, detector.target, detector.input_size[0])]
+            * options.repeat,
+        ),
+    )
+
+
+def benchmark_startup(options: Benchmark_Options) -> List[Benchmark_Result]:
+    """
+    benchmark_startup times `python app.py <command> --help` in a new interpreter
+    for each subcommand: the imports and argument parsing that every run pays
+    before it starts working. The first run of each is a warm-up run.
+    """
+    results = []
+    for command in options.startup_commands:
+        times = time_calls(
+            functools.partial(
+                subprocess.run, stdout=subprocess.DEVNULL, cwd=ROOT, check=True
+            ),
+            [([sys.executable, str(ROOT / "app.py"), command, "--help"],)]
+            * (1 + options.repeat),
+            warmup_iterations=1,
+        )
+        results.append(summarise_times(f"startup[{command}]", times))
+    return results
+
+
+def benchmark_process_video(
+    video_file: Path, detector: Soccer_Ball_Detector, options: Benchmark_Options
+) -> List[Benchmark_Result]:
+    """
+    benchmark_process_video times the frame loop of full `process_video` runs of
+    each tracker and output mode, as reported in `Process_Result.processing_time`.
+    The first run of each is a warm-up run.
+    """
+    results = []
+    for output_mode in options.output_modes:
+        for tracker_type in options.trackers:
+            times = []
+            for _ in range(1 + options.repeat):
+                result = process_video(
+                    input_file=video_file,
+                    tracker_type=tracker_type,
+                    detector=detector,
+                    output_mode=output_mode,
+                )
+                times.append(result.processing_time)
+            results.append(
+                summarise_times(
+                    f"process_video[{tracker_type},{output_mode}]",
+                    times[1:],
+                    frames_per_call=result.frame_count,
+                )
+            )
+    return results
+
+
+def run_benchmarks(
+    options: Optional[Benchmark_Options] = None,
+    detector: Optional[Soccer_Ball_Detector] = None,
+) -> List[Benchmark_Result]:
+    """
+    run_benchmarks runs the microbenchmarks and the full pipeline benchmarks on
+    deterministic synthetic videos, at every resolution of the options. The name
+    of each result ends with the resolution, e.g. `add_banner@640x360`.
+
+    :param options: What to benchmark. Defaults to everything.
+    :type options: Optional[Benchmark_Options]
+    :param detector: The detector to benchmark. The default OpenCV CPU detector
+    of the process is used if not provided.
+    :type detector: Optional[Soccer_Ball_Detector]
+    """
+    if options is None:
+        options = Benchmark_Options()
+    if detector is None:
+        detector = get_detector()
+
+    results = [benchmark_detector_load(detector, options)]
+    results += benchmark_startup(options)
+    for result in results:
+        logger.info("%s: median %.3fms", result.name, result.median * 1e3)
+
+    for width, height in options.resolutions:
+        video_options = Synthetic_Video_Options(
+            width=width, height=height, frame_count=options.frame_count
+        )
+        video_file, _ = generate_synthetic_video(video_options)
+        boxes = get_ball_boxes(video_options)
+        # The microbenchmarks run on rendered frames, without a codec in the way.
+        background = render_background(video_options)
+        frames = [render_frame(background, box) for box in boxes]
+
+        resolution_results = benchmark_detector(detector, frames, options)
+        for tracker_type in options.trackers:
+            resolution_results += benchmark_tracker(
+                tracker_type, frames, boxes, video_options.fps, options
+            )
+        resolution_results.append(benchmark_banner(frames, options))
+        resolution_results += benchmark_process_video(video_file, detector, options)
+
+        for result in resolution_results:
+            result.name = f"{result.name}@{width}x{height}"
+            logger.info(
+                "%s: median %.3fms, p95 %.3fms, %.1f FPS",
+                result.name,
+                result.median * 1e3,
+                result.p95 * 1e3,
+                result.fps,
+            )
+        results += resolution_results
+    return results
+
+
+def get_environment(detector: Optional[Soccer_Ball_Detector] = None) -> dict:
+    """
+    get_environment describes the machine and libraries the benchmarks ran on,
+    so that results from different machines are not mistaken for regressions.
+    """
+    environment = {
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+    if detector is not None:
+        environment["detector"] = {
+            "backend": getattr(detector, "backend", None),
+            "target": getattr(detector, "target", None),
+            "input_size": list(getattr(detector, "input_size", ())),
+        }
+    return environment
+
+
+def write_results(
+    results_file: Path,
+    results: List[Benchmark_Result],
+    options: Benchmark_Options,
+    environment: dict,
+):
+    """
+    write_results writes the results, the options and the environment to a JSON file.
+    """
+    results_file = Path(results_file)
+    results_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(results_file, "w") as file:
+        json.dump(
+            {
+                "version": RESULTS_VERSION,
+                "environment": environment,
+                "options": asdict(options),
+                "results": [dict(asdict(result), fps=result.fps) for result in results],
+            },
+            file,
+            indent=2,
+        )
+
+
+def read_results(results_file: Path) -> Dict[str, Benchmark_Result]:
+    """
+    read_results reads the results written by `write_results`, by name.
+    """
+    with open(results_file) as file:
+        data = json.load(file)
+    results = {}
+    for result in data["results"]:
+        result.pop("fps", None)
+        results[result["name"]] = Benchmark_Result(**result)
+    return results
+
+
+def compare_results(
+    results: List[Benchmark_Result],
+    baseline: Dict[str, Benchmark_Result],
+    tolerance: float = REGRESSION_TOLERANCE,
+) -> List[dict]:
+    """
+    compare_results compares the median of each benchmark with the baseline and
+    returns the regressions, i.e. the benchmarks more than `tolerance` slower.
+    Benchmarks missing from the baseline are not compared.
+
+    :param results: The results of this run.
+    :type results: List[Benchmark_Result]
+    :param baseline: The results of the baseline run, by name.
+    :type baseline: Dict[str, Benchmark_Result]
+    :param tolerance: The relative slowdown allowed, e.g. 0.15 for 15%.
+    :type tolerance: float
+    """
+    regressions = []
+    for result in results:
+        baseline_result = baseline.get(result.name)
+        if baseline_result is None or baseline_result.median <= 0:
+            continue
+
+        ratio = result.median / baseline_result.median
+        if ratio > 1 + tolerance:
+            regressions.append(
+                {
+                    "name": result.name,
+                    "baseline_median": baseline_result.median,
+                    "median": result.median,
+                    "ratio": ratio,
+                }
+            )
+    return regressions
@@ -0,0 +1,197 @@
+from pathlib import Path
+from dataclasses import dataclass
+from logger import logger
+
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Define common PATHs
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[2]
+
+SYNTHETIC_VIDEO_DIR = ROOT / "benchmark" / "videos"
+
+# The (width, height) of the synthetic videos benchmarked by default.
+RESOLUTIONS_ALL = [(640, 360), (1280, 720), (1920, 1080)]
+
+GRASS_COLOUR = (40, 120, 40)
+LINE_COLOUR = (230, 230, 230)
+BALL_COLOUR = (245, 245, 245)
+PATCH_COLOUR = (30, 30, 30)
+
+
+@dataclass
+class Synthetic_Video_Options:
+    """
+    Synthetic_Video_Options describes a synthetic video of a ball moving over a
+    textured pitch. The same options always render the same frames.
+    """
+
+    width: int = 640
+    height: int = 360
+    frame_count: int = 150
+    fps: int = 30
+    # The radius of the ball, as a fraction of the frame height.
+    ball_radius: float = 0.025
+    seed: int = 0
+
+    @property
+    def name(self) -> str:
+        return (
+            f"synthetic_{self.width}x{self.height}_{self.frame_count}f"
+            f"_{self.fps}fps_r{self.ball_radius}_s{self.seed}"
+        )
+
+
+def render_background(options: Synthetic_Video_Options) -> np.ndarray:
+    """
+    render_background renders the pitch: mown grass stripes with noise and
+    the lines of the pitch.
+
+    :param options: The options of the video.
+    :type options: Synthetic_Video_Options
+    """
+    rng = np.random.default_rng(options.seed)
+    background = np.empty((options.height, options.width, 3), np.uint8)
+    background[:] = GRASS_COLOUR
+
+    stripe_width = max(1, options.width // 12)
+    stripes = (np.arange(options.width) // stripe_width) % 2 == 1
+    background[:, stripes] = np.clip(
+        background[:, stripes].astype(np.int16) + 25, 0, 255
+    ).astype(np.uint8)
+
+    noise = rng.integers(-20, 21, size=background.shape, dtype=np.int16)
+    background = np.clip(background.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+    thickness = max(1, options.height // 180)
+    margin = options.height // 12
+    cv2.rectangle(
+        background,
+        (margin, margin),
+        (options.width - margin, options.height - margin),
+        LINE_COLOUR,
+        thickness,
+    )
+    cv2.line(
+        background,
+        (options.width // 2, margin),
+        (options.width // 2, options.height - margin),
+        LINE_COLOUR,
+        thickness,
+    )
+    cv2.circle(
+        background,
+        (options.width // 2, options.height // 2),
+        options.height // 6,
+        LINE_COLOUR,
+        thickness,
+    )
+    return background
+
+
+def get_ball_boxes(options: Synthetic_Video_Options) -> np.ndarray:
+    """
+    get_ball_boxes returns the (x, y, width, height) box of the ball in every frame.
+    The ball crosses the pitch while bouncing, so that it changes direction and speed.
+
+    :param options: The options of the video.
+    :type options: Synthetic_Video_Options
+    """
+    radius = max(4, int(options.ball_radius * options.height))
+    t = np.arange(options.frame_count) / options.fps
+
+    # Back and forth across the pitch, about once every 4 seconds.
+    span_x = options.width - 4 * radius
+    phase_x = (t / 4.0) % 2
+    center_x = 2 * radius + span_x * np.where(phase_x < 1, phase_x, 2 - phase_x)
+
+    # Bounces of decreasing height, restarting every 3 seconds.
+    bounce_t = t % 3.0
+    height = (options.height - 4 * radius) * np.exp(-bounce_t / 2)
+    center_y = options.height - 2 * radius - height * np.abs(np.sin(np.pi * t))
+
+    boxes = np.empty((options.frame_count, 4), np.float32)
+    boxes[:, 0] = np.round(center_x) - radius
+    boxes[:, 1] = np.round(center_y) - radius
+    boxes[:, 2:] = 2 * radius
+    return boxes
+
+
+def render_frame(
+    background: np.ndarray, box: np.ndarray, frame: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    render_frame draws the ball, a white ball with dark patches, on the background.
+
+    :param background: The background from `render_background`.
+    :type background: np.ndarray
+    :param box: The (x, y, width, height) box of the ball.
+    :type box: np.ndarray
+    :param frame: If provided, the frame is rendered into it instead of a new array.
+    :type frame: Optional[np.ndarray]
+    """
+    if frame is None:
+        frame = np.empty_like(background)
+    np.copyto(frame, background)
+
+    x, y, width, _ = (int(value) for value in box)
+    radius = width // 2
+    center = (x + radius, y + radius)
+    cv2.circle(frame, center, radius, BALL_COLOUR, -1, cv2.LINE_AA)
+    patch_radius = max(1, radius // 4)
+    # The patches rotate with the horizontal position, like a rolling ball.
+    angle = x / max(1, radius)
+    for i in range(5):
+        patch_angle = angle + i * 2 * np.pi / 5
+        patch_center = (
+            int(center[0] + 0.6 * radius * np.cos(patch_angle)),
+            int(center[1] + 0.6 * radius * np.sin(patch_angle)),
+        )
+        cv2.circle(frame, patch_center, patch_radius, PATCH_COLOUR, -1, cv2.LINE_AA)
+    cv2.circle(frame, center, radius, PATCH_COLOUR, 1, cv2.LINE_AA)
+    return frame
+
+
+def generate_synthetic_video(
+    options: Synthetic_Video_Options, video_dir: Path = SYNTHETIC_VIDEO_DIR
+) -> Tuple[Path, np.ndarray]:
+    """
+    generate_synthetic_video writes the synthetic video described by the options,
+    unless it was already generated. Returns its path and the ground truth
+    box of the ball in every frame.
+
+    :param options: The options of the video.
+    :type options: Synthetic_Video_Options
+    :param video_dir: The directory of the generated videos.
+    :type video_dir: Path
+    """
+    boxes = get_ball_boxes(options)
+    video_file = Path(video_dir) / f"{options.name}.mp4"
+    if video_file.exists():
+        return video_file, boxes
+
+    video_file.parent.mkdir(parents=True, exist_ok=True)
+    # Written to a temporary file first, so that an interrupted run does not
+    # leave a truncated video behind.
+    temp_file = video_file.with_suffix(".tmp.mp4")
+    video_writer = cv2.VideoWriter(
+        temp_file,
+        cv2.VideoWriter.fourcc(*"mp4v"),
+        options.fps,
+        (options.width, options.height),
+    )
+    if not video_writer.isOpened():
+        raise RuntimeError(f"Unable to write the synthetic video {video_file}")
+
+    background = render_background(options)
+    frame = np.empty_like(background)
+    for box in boxes:
+        video_writer.write(render_frame(background, box, frame))
+    video_writer.release()
+    temp_file.replace(video_file)
+
+    logger.info("Generated the synthetic video %s", video_file)
+    return video_file, boxes
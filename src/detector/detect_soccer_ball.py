@@ -1,6 +1,6 @@
 import cv2
 import numpy as np
-from typing import Tuple
+from typing import List, Optional, Sequence, Tuple
 
 # The constants used when creating a blob
 OBJECTNESS_THRESHOLD = 0.5
@@ -14,11 +14,18 @@ INPUT_SIZE = (INPUT_DIMENSION, INPUT_DIMENSION)
 # ClassID of the "sports ball" which will detect the soccer ball in the video.
 CLASSID_SPORTS_BALL = 32
 
+# Layout of each row of the YOLO output: cx, cy, w, h, objectness, class scores...
+CLASS_SCORES_OFFSET = 5
 
-def get_output_layer_names(net: cv2.dnn.Net):
+# Columns of the candidates array returned by `decode_detections`.
+CANDIDATE_COLUMNS = ("left", "top", "width", "height", "confidence")
+
+
+def get_output_layer_names(net: cv2.dnn.Net) -> List[str]:
     """
     getOutputLayerNames gets the names of the output layers which is
-    important when using DarNet models.
+    important when using DarNet models. Look them up once per net, e.g. when it
+    is loaded, see `Soccer_Ball_Detector`.
 
     :param net: The DNN on which the output layers names need to be retrieved.
     :type net: cv2.dnn.Net
@@ -29,18 +36,100 @@ def get_output_layer_names(net: cv2.dnn.Net):
     return [layerNames[i - 1] for i in net.getUnconnectedOutLayers()]
 
 
-def detect_soccer_ball(
+def empty_candidates() -> np.ndarray:
+    """
+    empty_candidates returns a candidates array with no rows.
+    """
+    return np.zeros((0, len(CANDIDATE_COLUMNS)), dtype=np.float32)
+
+
+def decode_detections(
+    outputs: Sequence[np.ndarray],
+    frameWidth: int,
+    frameHeight: int,
+) -> np.ndarray:
+    """
+    decode_detections decodes the raw YOLO outputs of a single frame into the
+    soccer ball candidates that survive the objectness, class, confidence and NMS
+    filters. All output heads are decoded together as one NumPy batch.
+
+    The candidates are returned as a float32 array of shape (N, 5) with the columns
+    (left, top, width, height, confidence), sorted by descending confidence.
+
+    :param outputs: The YOLO output of each head, each of shape (rows, 5 + classes).
+    :type outputs: Sequence[np.ndarray]
+    :param frameWidth: The width of the frame.
+    :type frameWidth: int
+    :param frameHeight: The height of the frame.
+    :type frameHeight: int
+    """
+    if len(outputs) == 0:
+        return empty_candidates()
+
+    detections = np.concatenate(
+        [np.asarray(output).reshape(-1, output.shape[-1]) for output in outputs]
+    )
+
+    # Filter on objectness first so that argmax only runs over the likely candidates.
+    detections = detections[detections[:, 4] > OBJECTNESS_THRESHOLD]
+    if len(detections) == 0:
+        return empty_candidates()
+
+    scores = detections[:, CLASS_SCORES_OFFSET:]
+    detections = detections[np.argmax(scores, axis=1) == CLASSID_SPORTS_BALL]
+    if len(detections) == 0:
+        return empty_candidates()
+
+    confidences = detections[:, CLASS_SCORES_OFFSET + CLASSID_SPORTS_BALL]
+
+    # Truncate towards zero in the same places the per-box computation did.
+    frameSize = np.array([frameWidth, frameHeight], dtype=np.float64)
+    centers = (detections[:, 0:2] * frameSize).astype(np.int32)
+    sizes = (detections[:, 2:4] * frameSize).astype(np.int32)
+    corners = (centers - sizes / 2).astype(np.int32)
+    boxes = np.hstack((corners, sizes))
+
+    indices = cv2.dnn.NMSBoxes(
+        boxes, confidences.astype(np.float32), CONFIDENCE_THREHSOLD, NMS_THRESHOLD
+    )
+    if len(indices) == 0:
+        return empty_candidates()
+
+    indices = np.asarray(indices).reshape(-1)
+    candidates = np.empty((len(indices), len(CANDIDATE_COLUMNS)), dtype=np.float32)
+    candidates[:, :4] = boxes[indices]
+    candidates[:, 4] = confidences[indices]
+    return candidates[np.argsort(-candidates[:, 4], kind="stable")]
+
+
+def best_boundary(candidates: np.ndarray) -> None | Tuple[int, int, int, int]:
+    """
+    best_boundary returns the boundary box of the most confident candidate,
+    or `None` if there are no candidates.
+
+    :param candidates: The candidates returned by `decode_detections`.
+    :type candidates: np.ndarray
+    """
+    if len(candidates) == 0:
+        return None
+
+    left, top, width, height = (int(value) for value in candidates[0, :4])
+    return (left, top, width, height)
+
+
+def detect_soccer_balls(
     frame: cv2.typing.MatLike,
     net: cv2.dnn.Net,
     frameWidth: int,
     frameHeight: int,
-) -> None | Tuple[int, int, int, int]:
+    output_layer_names: Optional[List[str]] = None,
+) -> np.ndarray:
     """
-    detect_soccer_ball will detect soccer/sports balls in the provided frame.
-    If a soccer ball is found, returns the boundary box dimensions of the soccer ball.
-    If a soccer ball is not found, `None` is returned.
+    detect_soccer_balls will detect every soccer/sports ball candidate in the provided frame.
+    Returns the candidates as an (N, 5) array of (left, top, width, height, confidence)
+    sorted by descending confidence.
 
-    :param frame: The frame on which the soccer ball is detected.
+    :param frame: The frame on which the soccer balls are detected.
     :type frame: cv2.typing.MatLike
     :param net: The DNN used for soccer ball detection.
     :type net: cv2.dnn.Net
@@ -48,6 +137,8 @@ def detect_soccer_ball(
     :type frameWidth: int
     :param frameHeight: The height of the frame.
     :type frameHeight: int
+    :param output_layer_names: The output layer names of the net, looked up if not provided.
+    :type output_layer_names: Optional[List[str]]
     """
 
     blob = cv2.dnn.blobFromImage(
@@ -60,38 +151,37 @@ def detect_soccer_ball(
     )
 
     net.setInput(blob)
-    outputs = net.forward(get_output_layer_names(net))
-
-    boxes = []
-    confidenceList = []
-    for output in outputs:
-        for detection in output:
-            if detection[4] > OBJECTNESS_THRESHOLD:
-                scores = detection[5:]
-                classID = np.argmax(scores)
-
-                if classID == CLASSID_SPORTS_BALL:
-                    centerX = int(detection[0] * frameWidth)
-                    centerY = int(detection[1] * frameHeight)
-                    width = int(detection[2] * frameWidth)
-                    height = int(detection[3] * frameHeight)
+    if output_layer_names is None:
+        output_layer_names = get_output_layer_names(net)
+    outputs = net.forward(output_layer_names)
+    return decode_detections(outputs, frameWidth, frameHeight)
 
-                    left = int(centerX - width / 2)
-                    top = int(centerY - height / 2)
-                    boxes.append([left, top, width, height])
 
-                    confidenceList.append(float(scores[classID]))
-
-    if len(boxes) == 0:
-        return None
-
-    if len(boxes) == 1:
-        return (left, top, width, height)
+def detect_soccer_ball(
+    frame: cv2.typing.MatLike,
+    net: cv2.dnn.Net,
+    frameWidth: int,
+    frameHeight: int,
+    output_layer_names: Optional[List[str]] = None,
+) -> None | Tuple[int, int, int, int]:
+    """
+    detect_soccer_ball will detect soccer/sports balls in the provided frame.
+    If a soccer ball is found, returns the boundary box dimensions of the most
+    confident soccer ball. If a soccer ball is not found, `None` is returned.
+    Pass the output layer names looked up once per net, e.g. those of
+    `Soccer_Ball_Detector`, when detecting many frames.
 
-    indices = cv2.dnn.NMSBoxes(
-        boxes, confidenceList, CONFIDENCE_THREHSOLD, NMS_THRESHOLD
+    :param frame: The frame on which the soccer ball is detected.
+    :type frame: cv2.typing.MatLike
+    :param net: The DNN used for soccer ball detection.
+    :type net: cv2.dnn.Net
+    :param frameWidth: The width of the frame.
+    :type frameWidth: int
+    :param frameHeight: The height of the frame.
+    :type frameHeight: int
+    :param output_layer_names: The output layer names of the net, looked up if not provided.
+    :type output_layer_names: Optional[List[str]]
+    """
+    return best_boundary(
+        detect_soccer_balls(frame, net, frameWidth, frameHeight, output_layer_names)
     )
-    if len(indices) == 0:
-        return None
-
-    return tuple(boxes[indices[0]])
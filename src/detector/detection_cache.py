@@ -0,0 +1,266 @@
+from pathlib import Path
+from logger import logger
+import hashlib
+import os
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+import src.detector.detect_soccer_ball as detect_soccer_ball
+from src.detector.detect_soccer_ball import CANDIDATE_COLUMNS
+from src.detector.soccer_ball_detector import Soccer_Ball_Detector
+from src.utils.profiler import NULL_PROFILER, Profiler
+
+# Define common PATHs
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[2]
+
+DEFAULT_CACHE_DIR = ROOT / "cache"
+
+# Bump when the layout of the cache file or the frames given to the detector change.
+CACHE_VERSION = 2
+
+# Per-frame status stored in the cache.
+STATUS_NOT_DETECTED = -1
+STATUS_NO_BALL = 0
+STATUS_BALL = 1
+
+_HASH_CHUNK_SIZE = 1 << 20
+
+# File hashes are computed once per process, keyed by (path, size, mtime).
+_file_hash_cache: Dict[Tuple[str, int, int], str] = {}
+
+
+def hash_file(file: Path) -> str:
+    """
+    hash_file returns the SHA-256 of the content of the file.
+
+    :param file: The file to hash.
+    :type file: Path
+    """
+    stat = os.stat(file)
+    key = (str(Path(file).resolve()), stat.st_size, stat.st_mtime_ns)
+    if key in _file_hash_cache:
+        return _file_hash_cache[key]
+
+    digest = hashlib.sha256()
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    _file_hash_cache[key] = digest.hexdigest()
+    return _file_hash_cache[key]
+
+
+def get_cache_key(input_file: Path, detector: Soccer_Ball_Detector) -> str:
+    """
+    get_cache_key returns the key of the detections of the video by the detector.
+    It changes whenever the video, the model files, the backend, its target device,
+    the input size or the detection thresholds change.
+
+    :param input_file: Path to the input video
+    :type input_file: Path
+    :param detector: The detector the detections come from.
+    :type detector: Soccer_Ball_Detector
+    """
+    parts = [
+        f"version={CACHE_VERSION}",
+        f"video={hash_file(input_file)}",
+        *(f"model={hash_file(file)}" for file in detector.model_files),
+        f"backend={detector.backend}",
+        f"target={detector.target}",
+        f"input_size={detector.input_size}",
+        f"objectness={detect_soccer_ball.OBJECTNESS_THRESHOLD}",
+        f"confidence={detect_soccer_ball.CONFIDENCE_THREHSOLD}",
+        f"nms={detect_soccer_ball.NMS_THRESHOLD}",
+        f"class={detect_soccer_ball.CLASSID_SPORTS_BALL}",
+    ]
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:32]
+
+
+class Detection_Cache:
+    """
+    Detection_Cache stores the detections of every frame of one video by one detector.
+    Frames that are not cached yet are detected and added lazily.
+
+    On disk it is an uncompressed `.npz` with columnar arrays: a per-frame `status`,
+    per-frame `offsets` into `candidates`, and the (N, 5) `candidates` themselves.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.status = np.full(0, STATUS_NOT_DETECTED, dtype=np.int8)
+        self.candidates: Dict[int, np.ndarray] = {}
+        self.is_modified = False
+        self.hit_count = 0
+        self.miss_count = 0
+
+        if self.path.exists():
+            self._load()
+
+    @classmethod
+    def for_video(
+        cls,
+        input_file: Path,
+        detector: Soccer_Ball_Detector,
+        cache_dir: Path = DEFAULT_CACHE_DIR,
+    ) -> "Detection_Cache":
+        """
+        for_video returns the cache of the detections of the video by the detector.
+
+        :param input_file: Path to the input video
+        :type input_file: Path
+        :param detector: The detector the detections come from.
+        :type detector: Soccer_Ball_Detector
+        :param cache_dir: The directory in which cache files are stored.
+        :type cache_dir: Path
+        """
+        key = get_cache_key(input_file, detector)
+        return cls(Path(cache_dir) / f"{Path(input_file).stem}_{key}.npz")
+
+    def _load(self):
+        with np.load(self.path) as data:
+            status = data["status"]
+            offsets = data["offsets"]
+            candidates = data["candidates"]
+
+        self.status = status.astype(np.int8)
+        for frame_index in np.flatnonzero(status == STATUS_BALL):
+            start, end = offsets[frame_index], offsets[frame_index + 1]
+            self.candidates[int(frame_index)] = candidates[start:end]
+        logger.info(
+            "Loaded %s cached detections from %s",
+            int(np.count_nonzero(status != STATUS_NOT_DETECTED)),
+            self.path,
+        )
+
+    def save(self):
+        """
+        save writes the cache to disk if it was modified.
+        """
+        if not self.is_modified:
+            return
+
+        counts = np.zeros(len(self.status), dtype=np.int64)
+        for frame_index, candidates in self.candidates.items():
+            counts[frame_index] = len(candidates)
+        offsets = np.zeros(len(self.status) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        if len(self.candidates) > 0:
+            candidates = np.concatenate(
+                [self.candidates[i] for i in sorted(self.candidates)]
+            )
+        else:
+            candidates = np.zeros((0, len(CANDIDATE_COLUMNS)), dtype=np.float32)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Processes sharing the cache each write their own temporary file.
+        temp_path = self.path.with_name(f"{self.path.stem}.{os.getpid()}.tmp.npz")
+        np.savez(temp_path, status=self.status, offsets=offsets, candidates=candidates)
+        os.replace(temp_path, self.path)
+        self.is_modified = False
+        logger.info("Saved detection cache to %s", self.path)
+
+    def get(self, frame_index: int) -> Optional[np.ndarray]:
+        """
+        get returns the cached candidates of the frame, or `None` if the frame
+        was never detected.
+
+        :param frame_index: The index of the frame.
+        :type frame_index: int
+        """
+        if frame_index >= len(self.status):
+            return None
+
+        status = self.status[frame_index]
+        if status == STATUS_NOT_DETECTED:
+            return None
+        if status == STATUS_NO_BALL:
+            return detect_soccer_ball.empty_candidates()
+        return self.candidates[frame_index]
+
+    def put(self, frame_index: int, candidates: np.ndarray):
+        """
+        put adds the candidates of the frame to the cache.
+
+        :param frame_index: The index of the frame.
+        :type frame_index: int
+        :param candidates: The candidates detected in the frame.
+        :type candidates: np.ndarray
+        """
+        if frame_index >= len(self.status):
+            status = np.full(
+                max(frame_index + 1, 2 * len(self.status)),
+                STATUS_NOT_DETECTED,
+                dtype=np.int8,
+            )
+            status[: len(self.status)] = self.status
+            self.status = status
+
+        if len(candidates) == 0:
+            self.status[frame_index] = STATUS_NO_BALL
+            self.candidates.pop(frame_index, None)
+        else:
+            self.status[frame_index] = STATUS_BALL
+            self.candidates[frame_index] = np.asarray(candidates, dtype=np.float32)
+        self.is_modified = True
+
+    def detect(
+        self,
+        detector: Soccer_Ball_Detector,
+        frame: cv2.typing.MatLike,
+        frame_index: int,
+        profiler: Profiler = NULL_PROFILER,
+    ) -> np.ndarray:
+        """
+        detect returns the cached candidates of the frame, running the detector
+        and caching its result if the frame was never detected.
+
+        :param detector: The detector to run on a cache miss.
+        :type detector: Soccer_Ball_Detector
+        :param frame: The frame on which the soccer balls are detected.
+        :type frame: cv2.typing.MatLike
+        :param frame_index: The index of the frame.
+        :type frame_index: int
+        :param profiler: Times the detection stages on a cache miss.
+        :type profiler: Profiler
+        """
+        return self.detect_batch(detector, [frame], frame_index, profiler)[0]
+
+    def detect_batch(
+        self,
+        detector: Soccer_Ball_Detector,
+        frames: Sequence[cv2.typing.MatLike],
+        first_frame_index: int,
+        profiler: Profiler = NULL_PROFILER,
+    ) -> List[np.ndarray]:
+        """
+        detect_batch returns the candidates of consecutive frames. The frames that
+        were never detected are detected together with one forward pass and cached.
+
+        :param detector: The detector to run on the cache misses.
+        :type detector: Soccer_Ball_Detector
+        :param frames: The consecutive frames on which the soccer balls are detected.
+        :type frames: Sequence[cv2.typing.MatLike]
+        :param first_frame_index: The index of the first frame.
+        :type first_frame_index: int
+        :param profiler: Times the detection stages of the cache misses.
+        :type profiler: Profiler
+        """
+        candidates_list = [self.get(first_frame_index + i) for i in range(len(frames))]
+        missing = [
+            i for i, candidates in enumerate(candidates_list) if candidates is None
+        ]
+        self.hit_count += len(frames) - len(missing)
+        self.miss_count += len(missing)
+        if len(missing) == 0:
+            return candidates_list
+
+        detected = detector.detect_batch([frames[i] for i in missing], profiler)
+        for i, candidates in zip(missing, detected):
+            self.put(first_frame_index + i, candidates)
+            candidates_list[i] = candidates
+        return candidates_list
@@ -0,0 +1,23 @@
+BACKEND_OPENCV = "OPENCV"
+BACKEND_ONNXRUNTIME = "ONNXRUNTIME"
+
+BACKENDS_ALL = [BACKEND_OPENCV, BACKEND_ONNXRUNTIME]
+
+
+TARGET_CPU = "CPU"
+TARGET_OPENCL = "OPENCL"
+TARGET_OPENCL_FP16 = "OPENCL_FP16"
+TARGET_CUDA = "CUDA"
+TARGET_CUDA_FP16 = "CUDA_FP16"
+
+TARGETS_ALL = [
+    TARGET_CPU,
+    TARGET_OPENCL,
+    TARGET_OPENCL_FP16,
+    TARGET_CUDA,
+    TARGET_CUDA_FP16,
+]
+
+
+# The network input sizes that yolov4-tiny supports well. Smaller is faster.
+INPUT_DIMENSIONS_ALL = [416, 320, 256]
@@ -0,0 +1,111 @@
+from logger import logger
+import threading
+import time
+
+from typing import Dict, Set, Tuple
+
+import numpy as np
+
+import src.detector.detector_constants as detector_constants
+from src.detector.detect_soccer_ball import INPUT_DIMENSION
+from src.detector.soccer_ball_detector import Soccer_Ball_Detector
+
+Detector_Key = Tuple[str, str, int]
+
+# The detectors loaded in this process, by (backend, target, input dimension).
+_detectors: Dict[Detector_Key, Soccer_Ball_Detector] = {}
+# The detectors that already ran their first forward pass.
+_warmed_up: Set[Detector_Key] = set()
+_lock = threading.Lock()
+
+
+def get_detector(
+    backend: str = detector_constants.BACKEND_OPENCV,
+    target: str = detector_constants.TARGET_CPU,
+    input_dimension: int = INPUT_DIMENSION,
+) -> Soccer_Ball_Detector:
+    """
+    get_detector returns the detector of this process for the backend, target and
+    input size, loading the model on the first call. Later calls, from any thread,
+    share the same instance, so the model is loaded at most once per process.
+
+    :param backend: The inference backend, one of `detector_constants.BACKENDS_ALL`.
+    :type backend: str
+    :param target: The device the backend runs on, one of `detector_constants.TARGETS_ALL`.
+    :type target: str
+    :param input_dimension: The width and height of the network input.
+    :type input_dimension: int
+    """
+    key = (backend, target, input_dimension)
+    detector = _detectors.get(key)
+    if detector is not None:
+        return detector
+
+    with _lock:
+        detector = _detectors.get(key)
+        if detector is None:
+            start_time = time.perf_counter()
+            detector = Soccer_Ball_Detector(
+                backend=backend, target=target, input_dimension=input_dimension
+            )
+            logger.info(
+                "Loaded the %s detector in %.3fs",
+                backend,
+                time.perf_counter() - start_time,
+            )
+            _detectors[key] = detector
+    return detector
+
+
+def warm_up_detector(
+    backend: str = detector_constants.BACKEND_OPENCV,
+    target: str = detector_constants.TARGET_CPU,
+    input_dimension: int = INPUT_DIMENSION,
+) -> Soccer_Ball_Detector:
+    """
+    warm_up_detector loads the detector, see `get_detector`, and runs its first
+    forward pass on a blank frame. The first pass allocates the buffers of the
+    network and, on OpenCL and CUDA, compiles its kernels, so warming up ahead of
+    time keeps that cost out of the first real frame.
+
+    :param backend: See `get_detector`.
+    :type backend: str
+    :param target: See `get_detector`.
+    :type target: str
+    :param input_dimension: See `get_detector`.
+    :type input_dimension: int
+    """
+    detector = get_detector(backend, target, input_dimension)
+    key = (backend, target, input_dimension)
+    with _lock:
+        if key not in _warmed_up:
+            start_time = time.perf_counter()
+            detector.detect(np.zeros((*detector.input_size, 3), np.uint8))
+            logger.info(
+                "Warmed up the %s detector in %.3fs",
+                backend,
+                time.perf_counter() - start_time,
+            )
+            _warmed_up.add(key)
+    return detector
+
+
+def is_detector_loaded(
+    backend: str = detector_constants.BACKEND_OPENCV,
+    target: str = detector_constants.TARGET_CPU,
+    input_dimension: int = INPUT_DIMENSION,
+) -> bool:
+    """
+    is_detector_loaded returns whether the detector was loaded in this process.
+    """
+    return (backend, target, input_dimension) in _detectors
+
+
+def clear_detectors():
+    """
+    clear_detectors forgets the loaded detectors, so that their memory is freed
+    once nothing else holds them and the next `get_detector` loads the model again.
+    """
+    with _lock:
+        _detectors.clear()
+        _warmed_up.clear()
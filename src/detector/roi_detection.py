@@ -0,0 +1,169 @@
+from dataclasses import dataclass
+
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.detector.detect_soccer_ball import INPUT_DIMENSION
+from src.detector.soccer_ball_detector import Soccer_Ball_Detector
+from src.utils.profiler import NULL_PROFILER, Profiler
+
+
+@dataclass
+class ROI_Options:
+    """
+    ROI_Options tunes the region of interest detection around the tracked ball.
+    """
+
+    # The smallest side of the region. At the network input size the ball is not downscaled.
+    min_size: int = INPUT_DIMENSION
+    # The side of the region as a multiple of the side of the ball.
+    size_factor: float = 4.0
+    # Extra margin on each side per pixel/frame of ball speed, per frame since the ball was seen.
+    velocity_factor: float = 2.0
+    # Weight of the newest motion in the smoothed velocity.
+    velocity_smoothing: float = 0.5
+    # The number of region detections in a row without a ball, after which
+    # the next detection runs on the full frame.
+    max_misses: int = 2
+
+
+def get_roi(
+    center: Tuple[float, float],
+    size: int,
+    frame_width: int,
+    frame_height: int,
+) -> Tuple[int, int, int, int]:
+    """
+    get_roi returns the (left, top, width, height) square region of the given size
+    around the center, shifted to stay inside the frame.
+
+    :param center: The (x, y) center of the region.
+    :type center: Tuple[float, float]
+    :param size: The side of the square region.
+    :type size: int
+    :param frame_width: The width of the frame.
+    :type frame_width: int
+    :param frame_height: The height of the frame.
+    :type frame_height: int
+    """
+    width = min(size, frame_width)
+    height = min(size, frame_height)
+    left = int(round(center[0] - width / 2))
+    top = int(round(center[1] - height / 2))
+    left = min(max(0, left), frame_width - width)
+    top = min(max(0, top), frame_height - height)
+    return (left, top, width, height)
+
+
+class ROI_Detector:
+    """
+    ROI_Detector detects the soccer ball in a crop around its last known position
+    instead of in the full frame. The crop grows with the speed of the ball and
+    the time since it was last seen, and is resized to the network input by the
+    detector, which makes a small ball larger for the network.
+    """
+
+    def __init__(self, options: Optional[ROI_Options] = None):
+        self.options = options if options is not None else ROI_Options()
+
+        self.center: Optional[np.ndarray] = None
+        self.ball_size = 0.0
+        self.velocity = np.zeros(2)
+        self.frames_since_seen = 0
+        self.miss_count = 0
+
+        self.roi_detection_count = 0
+        self.full_detection_count = 0
+
+    def observe(self, boundary: Optional[Tuple[int, int, int, int]]):
+        """
+        observe updates the known position and velocity of the ball with the
+        boundary tracked or detected in the current frame. Call it once per frame,
+        with `None` if the ball was not found.
+
+        :param boundary: The boundary of the ball in the current frame, if found.
+        :type boundary: Optional[Tuple[int, int, int, int]]
+        """
+        if boundary is None:
+            self.frames_since_seen += 1
+            return
+
+        x, y, width, height = boundary
+        center = np.array([x + width / 2, y + height / 2])
+        if self.center is not None:
+            motion = (center - self.center) / (self.frames_since_seen + 1)
+            smoothing = self.options.velocity_smoothing
+            self.velocity = smoothing * motion + (1 - smoothing) * self.velocity
+
+        self.center = center
+        self.ball_size = max(width, height)
+        self.frames_since_seen = 0
+
+    def get_roi(
+        self, frame_width: int, frame_height: int
+    ) -> Optional[Tuple[int, int, int, int]]:
+        """
+        get_roi returns the region in which the ball is expected, or `None` if the
+        next detection should run on the full frame.
+
+        :param frame_width: The width of the frame.
+        :type frame_width: int
+        :param frame_height: The height of the frame.
+        :type frame_height: int
+        """
+        if self.center is None or self.miss_count >= self.options.max_misses:
+            return None
+
+        # Extrapolate the position to the current frame.
+        frames_ahead = self.frames_since_seen + 1
+        center = self.center + self.velocity * frames_ahead
+
+        speed = float(np.hypot(*self.velocity))
+        size = max(
+            self.options.min_size,
+            self.options.size_factor * self.ball_size
+            + 2 * self.options.velocity_factor * speed * frames_ahead,
+        )
+        if size >= frame_width and size >= frame_height:
+            return None
+
+        return get_roi(center, int(size), frame_width, frame_height)
+
+    def detect(
+        self,
+        detector: Soccer_Ball_Detector,
+        frame: cv2.typing.MatLike,
+        profiler: Profiler = NULL_PROFILER,
+    ) -> Optional[np.ndarray]:
+        """
+        detect detects the soccer ball candidates in the region of interest of the frame,
+        in frame coordinates. Returns `None` if the full frame should be detected instead.
+
+        :param detector: The detector to run on the region.
+        :type detector: Soccer_Ball_Detector
+        :param frame: The frame on which the soccer ball is detected.
+        :type frame: cv2.typing.MatLike
+        :param profiler: Times the detection stages.
+        :type profiler: Profiler
+        """
+        roi = self.get_roi(frame.shape[1], frame.shape[0])
+        if roi is None:
+            self.miss_count = 0
+            self.full_detection_count += 1
+            return None
+
+        left, top, width, height = roi
+        candidates = detector.detect(
+            frame[top : top + height, left : left + width], profiler
+        )
+        candidates[:, 0] += left
+        candidates[:, 1] += top
+
+        self.roi_detection_count += 1
+        if len(candidates) == 0:
+            self.miss_count += 1
+        else:
+            self.miss_count = 0
+        return candidates
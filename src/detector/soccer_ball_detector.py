@@ -0,0 +1,207 @@
+from pathlib import Path
+from logger import logger
+
+from typing import List, Sequence
+
+import cv2
+import numpy as np
+
+import src.detector.detector_constants as detector_constants
+from src.detector.detect_soccer_ball import (
+    INPUT_DIMENSION,
+    MEAN,
+    SCALE_FACTOR,
+    best_boundary,
+    decode_detections,
+    get_output_layer_names,
+)
+import src.utils.profiler as profiler_utils
+from src.utils.profiler import NULL_PROFILER, Profiler
+
+# Define common PATHs
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[2]
+
+DEFAULT_CFG_FILE = ROOT / "models" / "yolov4-tiny.cfg"
+DEFAULT_WEIGHTS_FILE = ROOT / "models" / "yolov4-tiny.weights"
+DEFAULT_ONNX_FILE = ROOT / "models" / "yolov4-tiny.onnx"
+
+_OPENCV_TARGETS = {
+    detector_constants.TARGET_CPU: cv2.dnn.DNN_TARGET_CPU,
+    detector_constants.TARGET_OPENCL: cv2.dnn.DNN_TARGET_OPENCL,
+    detector_constants.TARGET_OPENCL_FP16: cv2.dnn.DNN_TARGET_OPENCL_FP16,
+    detector_constants.TARGET_CUDA: cv2.dnn.DNN_TARGET_CUDA,
+    detector_constants.TARGET_CUDA_FP16: cv2.dnn.DNN_TARGET_CUDA_FP16,
+}
+
+_ONNXRUNTIME_PROVIDERS = {
+    detector_constants.TARGET_CPU: "CPUExecutionProvider",
+    detector_constants.TARGET_CUDA: "CUDAExecutionProvider",
+}
+
+
+class Soccer_Ball_Detector:
+    """
+    Soccer_Ball_Detector owns the YOLOv4-tiny network and detects soccer balls
+    in one frame or in a batch of frames with a single forward pass.
+
+    The OpenCV backend reads the Darknet cfg/weights. The ONNX Runtime backend
+    expects a yolov4-tiny export whose outputs keep the Darknet layout of one
+    (batch, rows, 5 + classes) tensor per head, with normalised box coordinates.
+    """
+
+    def __init__(
+        self,
+        backend: str = detector_constants.BACKEND_OPENCV,
+        target: str = detector_constants.TARGET_CPU,
+        input_dimension: int = INPUT_DIMENSION,
+        cfg_file: Path = DEFAULT_CFG_FILE,
+        weights_file: Path = DEFAULT_WEIGHTS_FILE,
+        onnx_file: Path = DEFAULT_ONNX_FILE,
+    ):
+        """
+        :param backend: The inference backend, one of `detector_constants.BACKENDS_ALL`.
+        :type backend: str
+        :param target: The device the backend runs on, one of `detector_constants.TARGETS_ALL`.
+        :type target: str
+        :param input_dimension: The width and height of the network input.
+        :type input_dimension: int
+        :param cfg_file: The Darknet cfg used by the OpenCV backend.
+        :type cfg_file: Path
+        :param weights_file: The Darknet weights used by the OpenCV backend.
+        :type weights_file: Path
+        :param onnx_file: The ONNX export used by the ONNX Runtime backend.
+        :type onnx_file: Path
+        """
+        if input_dimension % 32 != 0:
+            raise ValueError(
+                f"Input dimension must be a multiple of 32, got {input_dimension}"
+            )
+
+        self.backend = backend
+        self.target = target
+        self.input_size = (input_dimension, input_dimension)
+
+        if backend == detector_constants.BACKEND_OPENCV:
+            self.model_files = [Path(cfg_file), Path(weights_file)]
+            self._load_opencv(cfg_file, weights_file)
+        elif backend == detector_constants.BACKEND_ONNXRUNTIME:
+            self.model_files = [Path(onnx_file)]
+            self._load_onnxruntime(onnx_file)
+        else:
+            raise ValueError(f"Unknown detector backend {backend}")
+
+        logger.info(
+            "Using %s detector on %s with input size %s",
+            backend,
+            target,
+            input_dimension,
+        )
+
+    def _load_opencv(self, cfg_file: Path, weights_file: Path):
+        if self.target not in _OPENCV_TARGETS:
+            raise ValueError(f"Unknown target {self.target} for {self.backend}")
+
+        self.net = cv2.dnn.readNetFromDarknet(
+            cfgFile=str(cfg_file), darknetModel=str(weights_file)
+        )
+        if self.target in (
+            detector_constants.TARGET_CUDA,
+            detector_constants.TARGET_CUDA_FP16,
+        ):
+            self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
+        else:
+            self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(_OPENCV_TARGETS[self.target])
+        self.output_layer_names = get_output_layer_names(self.net)
+
+    def _load_onnxruntime(self, onnx_file: Path):
+        if self.target not in _ONNXRUNTIME_PROVIDERS:
+            raise ValueError(f"Unknown target {self.target} for {self.backend}")
+
+        try:
+            import onnxruntime
+        except ImportError as error:
+            raise ImportError(
+                "The ONNXRUNTIME detector backend requires the onnxruntime package"
+            ) from error
+
+        self.session = onnxruntime.InferenceSession(
+            str(onnx_file), providers=[_ONNXRUNTIME_PROVIDERS[self.target]]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _forward(self, blob: np.ndarray) -> Sequence[np.ndarray]:
+        if self.backend == detector_constants.BACKEND_ONNXRUNTIME:
+            return self.session.run(None, {self.input_name: blob})
+
+        self.net.setInput(blob)
+        return self.net.forward(self.output_layer_names)
+
+    def detect_batch(
+        self,
+        frames: Sequence[cv2.typing.MatLike],
+        profiler: Profiler = NULL_PROFILER,
+    ) -> List[np.ndarray]:
+        """
+        detect_batch detects soccer balls in all the frames with one forward pass.
+        Returns the candidates of each frame, see `decode_detections`.
+
+        :param frames: The frames on which the soccer balls are detected.
+        :type frames: Sequence[cv2.typing.MatLike]
+        :param profiler: Times the pre-processing, forward pass and post-processing.
+        :type profiler: Profiler
+        """
+        if len(frames) == 0:
+            return []
+
+        with profiler.stage(profiler_utils.STAGE_PREPROCESS):
+            blob = cv2.dnn.blobFromImages(
+                frames,
+                scalefactor=SCALE_FACTOR,
+                size=self.input_size,
+                mean=MEAN,
+                swapRB=True,
+                crop=False,
+            )
+        with profiler.stage(profiler_utils.STAGE_FORWARD):
+            outputs = self._forward(blob)
+
+        with profiler.stage(profiler_utils.STAGE_POSTPROCESS):
+            # Every head is split per frame, whether it comes back as
+            # (batch * rows, columns) or as (batch, rows, columns).
+            batch_outputs = [
+                np.asarray(output).reshape(len(frames), -1, output.shape[-1])
+                for output in outputs
+            ]
+            return [
+                decode_detections(
+                    [output[i] for output in batch_outputs],
+                    frame.shape[1],
+                    frame.shape[0],
+                )
+                for i, frame in enumerate(frames)
+            ]
+
+    def detect(
+        self, frame: cv2.typing.MatLike, profiler: Profiler = NULL_PROFILER
+    ) -> np.ndarray:
+        """
+        detect detects every soccer ball candidate in a single frame.
+
+        :param frame: The frame on which the soccer balls are detected.
+        :type frame: cv2.typing.MatLike
+        :param profiler: Times the detection stages, see `detect_batch`.
+        :type profiler: Profiler
+        """
+        return self.detect_batch([frame], profiler)[0]
+
+    def detect_boundary(self, frame: cv2.typing.MatLike):
+        """
+        detect_boundary returns the boundary box of the most confident soccer ball
+        in the frame, or `None` if no soccer ball is found.
+
+        :param frame: The frame on which the soccer ball is detected.
+        :type frame: cv2.typing.MatLike
+        """
+        return best_boundary(self.detect(frame))
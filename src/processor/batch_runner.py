@@ -0,0 +1,308 @@
+from pathlib import Path
+from logger import logger
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import csv
+import itertools
+import json
+import os
+
+from typing import Dict, Iterable, List, Optional
+
+import cv2
+
+from src.detector.detect_soccer_ball import INPUT_DIMENSION
+import src.detector.detector_constants as detector_constants
+from src.detector.model_registry import get_detector, warm_up_detector
+import src.processor.output_constants as output_constants
+from src.processor.process_video import process_video
+
+import src.tracker.tracker_constants as tracker_constants
+
+VIDEO_SUFFIXES = [".mp4", ".avi", ".mov", ".mkv"]
+
+# The parameters of process_video that can be swept, with their default values.
+DEFAULT_PARAMETER_GRID = {
+    "tracker_type": tracker_constants.TRACKERS_ALL,
+    "detection_interval": [10],
+    "miss_threshold": [5],
+}
+
+
+def find_videos(source: Path) -> List[Path]:
+    """
+    find_videos returns the videos to process. The source is either a directory,
+    whose videos are used, or a manifest file listing one video path per line.
+    Relative paths in a manifest are relative to the manifest.
+
+    :param source: A directory of videos or a manifest file.
+    :type source: Path
+    """
+    source = Path(source)
+    if source.is_dir():
+        return sorted(
+            path for path in source.iterdir() if path.suffix.lower() in VIDEO_SUFFIXES
+        )
+
+    videos = []
+    for line in source.read_text().splitlines():
+        line = line.strip()
+        if line == "" or line.startswith("#"):
+            continue
+        path = Path(line)
+        videos.append(path if path.is_absolute() else source.parent / path)
+    return videos
+
+
+def create_jobs(videos: Iterable[Path], parameter_grid: Dict[str, list]) -> List[dict]:
+    """
+    create_jobs returns one job per video and combination of the parameters.
+
+    :param videos: The videos to process.
+    :type videos: Iterable[Path]
+    :param parameter_grid: The values of each process_video parameter to sweep.
+    :type parameter_grid: Dict[str, list]
+    """
+    names = list(parameter_grid)
+    jobs = []
+    for video in videos:
+        for values in itertools.product(*(parameter_grid[name] for name in names)):
+            parameters = dict(zip(names, values))
+            job_id = "|".join(
+                [str(video)] + [f"{name}={parameters[name]}" for name in names]
+            )
+            jobs.append(
+                {"job_id": job_id, "input_path": str(video), "parameters": parameters}
+            )
+    return jobs
+
+
+def read_completed_job_ids(results_file: Path) -> set:
+    """
+    read_completed_job_ids returns the ids of the jobs that already have a
+    successful result in the results file, so that a sweep can resume.
+
+    :param results_file: The JSONL or CSV results file.
+    :type results_file: Path
+    """
+    results_file = Path(results_file)
+    if not results_file.exists():
+        return set()
+
+    with open(results_file, newline="") as f:
+        if results_file.suffix.lower() == ".csv":
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    return {row["job_id"] for row in rows if not row.get("error")}
+
+
+def init_worker(
+    num_threads: int,
+    backend: str = detector_constants.BACKEND_OPENCV,
+    target: str = detector_constants.TARGET_CPU,
+    input_dimension: int = INPUT_DIMENSION,
+):
+    """
+    init_worker initialises a worker process of a pool: it limits the OpenCV
+    threads of the worker and loads and warms up the detector the worker's jobs
+    share, see `model_registry`.
+
+    :param num_threads: The number of OpenCV threads of the worker.
+    :type num_threads: int
+    :param backend: The detector backend.
+    :type backend: str
+    :param target: The detector target.
+    :type target: str
+    :param input_dimension: The detector input size.
+    :type input_dimension: int
+    """
+    # Every worker gets a share of the cores instead of one thread per core each.
+    cv2.setNumThreads(num_threads)
+    warm_up_detector(backend, target, input_dimension)
+
+
+def run_job(
+    job: dict,
+    use_detection_cache: bool = False,
+    backend: str = detector_constants.BACKEND_OPENCV,
+    target: str = detector_constants.TARGET_CPU,
+    input_dimension: int = INPUT_DIMENSION,
+) -> dict:
+    """
+    run_job processes one video with the parameters of the job, using the
+    detector of the worker process. Errors are returned in the result
+    instead of being raised, so one broken video does not stop a sweep.
+
+    :param job: The job, see `create_jobs`.
+    :type job: dict
+    :param use_detection_cache: Whether to use the on-disk detection cache.
+    :type use_detection_cache: bool
+    :param backend: The detector backend, see `init_worker`.
+    :type backend: str
+    :param target: The detector target, see `init_worker`.
+    :type target: str
+    :param input_dimension: The detector input size, see `init_worker`.
+    :type input_dimension: int
+    """
+    result = {"job_id": job["job_id"], "input_path": job["input_path"]}
+    result.update(job["parameters"])
+    try:
+        process_result = process_video(
+            input_file=Path(job["input_path"]),
+            detector=get_detector(backend, target, input_dimension),
+            output_mode=output_constants.OUTPUT_NONE,
+            use_detection_cache=use_detection_cache,
+            **job["parameters"],
+        )
+    except Exception as error:
+        logger.error("Job %s failed: %s", job["job_id"], error)
+        result["error"] = repr(error)
+        return result
+
+    result.update(
+        {
+            "input_fps": process_result.input_fps,
+            "frame_count": process_result.frame_count,
+            "processing_time": process_result.processing_time,
+            "output_fps": process_result.frame_count / process_result.processing_time,
+            "detected_frame_count": process_result.detected_frame_count,
+            "tracked_frame_count": process_result.tracked_frame_count,
+            "tracking_missed_count": process_result.tracking_missed_count,
+            "error": "",
+        }
+    )
+    return result
+
+
+class Results_Writer:
+    """
+    Results_Writer appends results to a JSONL or CSV file as they complete,
+    flushing after each one so that an interrupted sweep loses nothing.
+    """
+
+    def __init__(self, results_file: Path, columns: List[str]):
+        self.results_file = Path(results_file)
+        self.is_csv = self.results_file.suffix.lower() == ".csv"
+        self.results_file.parent.mkdir(parents=True, exist_ok=True)
+
+        is_new = not self.results_file.exists() or self.results_file.stat().st_size == 0
+        self.file = open(self.results_file, "a", newline="")
+        self.csv_writer = None
+        if self.is_csv:
+            self.csv_writer = csv.DictWriter(
+                self.file, fieldnames=columns, extrasaction="ignore"
+            )
+            if is_new:
+                self.csv_writer.writeheader()
+
+    def write(self, result: dict):
+        if self.is_csv:
+            self.csv_writer.writerow(result)
+        else:
+            self.file.write(json.dumps(result) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def run_batch(
+    source: Path,
+    results_file: Path,
+    parameter_grid: Optional[Dict[str, list]] = None,
+    max_workers: Optional[int] = None,
+    threads_per_worker: Optional[int] = None,
+    backend: str = detector_constants.BACKEND_OPENCV,
+    target: str = detector_constants.TARGET_CPU,
+    input_dimension: int = INPUT_DIMENSION,
+    use_detection_cache: bool = False,
+) -> int:
+    """
+    run_batch processes every video of the source with every combination of the
+    parameter grid on a pool of worker processes. Results are appended to the
+    results file as they complete, and jobs that already have a result are skipped,
+    so an interrupted sweep resumes where it stopped.
+    Returns the number of jobs that were run.
+
+    :param source: A directory of videos or a manifest file, see `find_videos`.
+    :type source: Path
+    :param results_file: The results file. CSV if its suffix is ".csv", JSONL otherwise.
+    :type results_file: Path
+    :param parameter_grid: The values of each process_video parameter to sweep.
+    :type parameter_grid: Optional[Dict[str, list]]
+    :param max_workers: The number of worker processes. Defaults to the number of cores.
+    :type max_workers: Optional[int]
+    :param threads_per_worker: The OpenCV threads of each worker. Defaults to an
+    even share of the cores.
+    :type threads_per_worker: Optional[int]
+    :param backend: The detector backend of the workers.
+    :type backend: str
+    :param target: The detector target of the workers.
+    :type target: str
+    :param input_dimension: The detector input size of the workers.
+    :type input_dimension: int
+    :param use_detection_cache: Whether the workers use the on-disk detection cache.
+    :type use_detection_cache: bool
+    """
+    if parameter_grid is None:
+        parameter_grid = DEFAULT_PARAMETER_GRID
+
+    jobs = create_jobs(find_videos(source), parameter_grid)
+    completed_job_ids = read_completed_job_ids(results_file)
+    jobs = [job for job in jobs if job["job_id"] not in completed_job_ids]
+    logger.info(
+        "Running %s jobs, skipping %s completed jobs",
+        len(jobs),
+        len(completed_job_ids),
+    )
+    if len(jobs) == 0:
+        return 0
+
+    cpu_count = os.cpu_count() or 1
+    if max_workers is None:
+        max_workers = cpu_count
+    max_workers = max(1, min(max_workers, len(jobs)))
+    if threads_per_worker is None:
+        threads_per_worker = max(1, cpu_count // max_workers)
+
+    columns = (
+        ["job_id", "input_path"]
+        + list(parameter_grid)
+        + [
+            "input_fps",
+            "frame_count",
+            "processing_time",
+            "output_fps",
+            "detected_frame_count",
+            "tracked_frame_count",
+            "tracking_missed_count",
+            "error",
+        ]
+    )
+    writer = Results_Writer(results_file, columns)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=init_worker,
+            initargs=(threads_per_worker, backend, target, input_dimension),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    run_job,
+                    job,
+                    use_detection_cache,
+                    backend,
+                    target,
+                    input_dimension,
+                )
+                for job in jobs
+            ]
+            for completed, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                writer.write(result)
+                logger.info(
+                    "Completed %s/%s: %s", completed, len(jobs), result["job_id"]
+                )
+    finally:
+        writer.close()
+    return len(jobs)
@@ -0,0 +1,353 @@
+from pathlib import Path
+from logger import logger
+from concurrent.futures import ProcessPoolExecutor
+import os
+import time
+
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+import src.processor.output_constants as output_constants
+from src.detector.model_registry import get_detector
+from src.processor.batch_runner import init_worker
+from src.processor.frame_processor import Frame_Processor
+from src.processor.frame_renderer import Frame_Renderer
+from src.processor.process_video import get_output_file, open_video
+from src.processor.result import Process_Result
+from src.processor.trajectory import Trajectory
+from src.utils.frame_buffer import Frame_Buffer_Ring
+
+import src.tracker.tracker_constants as tracker_constants
+
+# How long each segment is processed before its start, so that the tracker is
+# detected and warmed up by the time the segment starts.
+DEFAULT_OVERLAP_SECONDS = 2.0
+
+
+def plan_segments(
+    frame_count: int,
+    segment_count: int,
+    overlap_frames: int,
+    keyframe_interval: Optional[int] = None,
+) -> List[Tuple[int, int, int]]:
+    """
+    plan_segments splits the frames into consecutive segments.
+    Returns the (warm_up_start, start, end) frame indices of each segment.
+    The frames from `warm_up_start` to `start` are processed but not reported.
+
+    :param frame_count: The number of frames to split.
+    :type frame_count: int
+    :param segment_count: The number of segments.
+    :type segment_count: int
+    :param overlap_frames: The number of warm-up frames before each segment.
+    :type overlap_frames: int
+    :param keyframe_interval: If the keyframe interval (GOP size) of the video is known,
+    the warm-up starts are moved back to keyframes, which makes seeking cheaper.
+    Frame index 0 is the second frame of the video, see `process_segment`, so the
+    warm-up starts are one frame before a multiple of the interval.
+    :type keyframe_interval: Optional[int]
+    """
+    segment_count = max(1, min(segment_count, frame_count))
+    bounds = [round(i * frame_count / segment_count) for i in range(segment_count + 1)]
+
+    segments = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        warm_up_start = max(0, start - overlap_frames)
+        if keyframe_interval:
+            video_frame = warm_up_start + 1
+            warm_up_start = max(0, video_frame - video_frame % keyframe_interval - 1)
+        segments.append((warm_up_start, start, end))
+    return segments
+
+
+def process_segment(
+    input_file: Path,
+    segment: Tuple[int, int, int],
+    tracker_type: str,
+    detection_interval: int,
+    miss_threshold: int,
+    is_in_evaluation_mode: bool,
+    output_file: Optional[Path],
+) -> dict:
+    """
+    process_segment runs the detection + tracking pipeline on one segment of the
+    video in a worker process. Frame indices are the ones used by `process_video`,
+    so the detection schedule is the same as in a sequential run.
+
+    :param input_file: Path to the input video
+    :type input_file: Path
+    :param segment: The (warm_up_start, start, end) frame indices of the segment.
+    :type segment: Tuple[int, int, int]
+    :param tracker_type: Type of tracker to use for tracking
+    :type tracker_type: str
+    :param detection_interval: The frames count after which the app should re-detect
+    :type detection_interval: int
+    :param miss_threshold: The max number of missed tracker predictions after
+    which the app should re-detect the soccer ball
+    :type miss_threshold: int
+    :param is_in_evaluation_mode: Whether to detect and track every frame.
+    :type is_in_evaluation_mode: bool
+    :param output_file: If provided, the annotated frames of the segment are written to it.
+    :type output_file: Optional[Path]
+    """
+    warm_up_start, start, end = segment
+
+    cap, frame_width, frame_height, input_fps = open_video(input_file)
+    # Released in `finally`, also when processing fails.
+    video_writer = None
+    try:
+        # `process_video` uses the first frame of the video to find its size, so
+        # frame index 0 is the second frame of the video.
+        if warm_up_start > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, warm_up_start + 1)
+
+        buffers = Frame_Buffer_Ring(1, frame_height, frame_width)
+        canvas_height, canvas_width = buffers.buffers[0].canvas.shape[:2]
+
+        renderer = None
+        if output_file is not None:
+            renderer = Frame_Renderer(offset_y=canvas_height - frame_height)
+            video_writer = cv2.VideoWriter(
+                output_file,
+                cv2.VideoWriter.fourcc(*"mp4v"),
+                input_fps,
+                (canvas_width, canvas_height),
+            )
+
+        processor = Frame_Processor(
+            tracker_type=tracker_type,
+            detector=get_detector(),
+            input_fps=input_fps,
+            detection_interval=detection_interval,
+            miss_threshold=miss_threshold,
+            is_in_evaluation_mode=is_in_evaluation_mode,
+            first_frame_index=warm_up_start,
+        )
+
+        for frame_index in range(warm_up_start, end):
+            if frame_index == start:
+                processor.reset_results()
+
+            buffer = buffers.next()
+            if not buffer.read(cap):
+                break
+
+            state = processor.process_frame(buffer.image, None)
+            if video_writer is not None and frame_index >= start:
+                buffer.drawn_boxes.extend(renderer.render(buffer.canvas, state))
+                video_writer.write(buffer.canvas)
+
+        processor.finish()
+    finally:
+        cap.release()
+        if video_writer is not None:
+            video_writer.release()
+
+    return {
+        "input_fps": input_fps,
+        "frame_count": max(0, processor.frame_index - start),
+        "detected_frame_count": processor.detected_frames_count,
+        "tracked_frame_count": processor.tracked_frames_count,
+        "tracking_missed_count": processor.tracking_missed_count,
+        "detected_trajectory": processor.detected_trajectory,
+        "tracked_trajectory": processor.tracked_trajectory,
+        "frame_latencies": np.asarray(processor.frame_latencies),
+        "detection_call_count": processor.detection_calls_count,
+        "tracking_call_count": processor.tracking_calls_count,
+        "correction_call_count": processor.correction_calls_count,
+        "tracker_reinit_count": processor.reinit_count,
+        "correction_time": processor.correction_time,
+    }
+
+
+def concatenate_videos(segment_files: List[Path], output_file: Path):
+    """
+    concatenate_videos writes the frames of the segment videos, in order,
+    to one output video. The segment videos are deleted afterwards.
+
+    :param segment_files: The segment videos, in order.
+    :type segment_files: List[Path]
+    :param output_file: The output video.
+    :type output_file: Path
+    """
+    video_writer = None
+    for segment_file in segment_files:
+        cap = cv2.VideoCapture(segment_file)
+        while True:
+            has_frame, frame = cap.read()
+            if not has_frame:
+                break
+            if video_writer is None:
+                video_writer = cv2.VideoWriter(
+                    output_file,
+                    cv2.VideoWriter.fourcc(*"mp4v"),
+                    cap.get(cv2.CAP_PROP_FPS),
+                    (frame.shape[1], frame.shape[0]),
+                )
+            video_writer.write(frame)
+        cap.release()
+        os.remove(segment_file)
+
+    if video_writer is not None:
+        video_writer.release()
+
+
+def process_video_chunked(
+    input_file: Path,
+    tracker_type: str = tracker_constants.TRACKER_MOSSE,
+    detection_interval: int = 10,
+    miss_threshold: int = 5,
+    is_in_evaluation_mode: bool = False,
+    output_mode: str = output_constants.OUTPUT_NONE,
+    max_workers: Optional[int] = None,
+    segment_count: Optional[int] = None,
+    overlap_seconds: float = DEFAULT_OVERLAP_SECONDS,
+    keyframe_interval: Optional[int] = None,
+) -> Process_Result:
+    """
+    Runs the detection + tracking pipeline of `process_video` on a long video by
+    splitting it into time segments processed in parallel worker processes.
+    Each segment starts with a short overlap with the previous one, in which the
+    tracker is detected and warmed up, and the segment results are stitched back
+    into one result.
+
+    Results can differ slightly from a sequential run around segment starts,
+    since each segment starts with a fresh tracker.
+
+    :param input_file: Path to the input video
+    :type input_file: Path
+    :param tracker_type: Type of tracker to use for tracking
+    :type tracker_type: str
+    :param detection_interval: The frames count after which the app should re-detect
+    :type detection_interval: int
+    :param miss_threshold: The max number of missed tracker predictions after
+    which the app should re-detect the soccer ball
+    :type miss_threshold: int
+    :param is_in_evaluation_mode: Whether to detect and track every frame.
+    :type is_in_evaluation_mode: bool
+    :param output_mode: `OUTPUT_NONE`, or `OUTPUT_VIDEO` to concatenate the annotated
+    segments into one output video.
+    :type output_mode: str
+    :param max_workers: The number of worker processes. Defaults to the number of cores.
+    :type max_workers: Optional[int]
+    :param segment_count: The number of segments. Defaults to the number of workers.
+    :type segment_count: Optional[int]
+    :param overlap_seconds: How long each segment is warmed up before its start.
+    :type overlap_seconds: float
+    :param keyframe_interval: The keyframe interval of the video, if known.
+    :type keyframe_interval: Optional[int]
+    :return: Returns the stitched result of all the segments
+    :rtype: Result
+    """
+    if output_mode not in [output_constants.OUTPUT_NONE, output_constants.OUTPUT_VIDEO]:
+        raise ValueError(f"Output mode {output_mode} is not supported when chunked")
+
+    cap = cv2.VideoCapture(input_file)
+    if not cap.isOpened():
+        logger.error("Unable to open file at %s", input_file)
+        raise FileNotFoundError(f"Unable to open file {input_file}")
+    # The first frame is only used to find the size of the frames.
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) - 1
+    input_fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if segment_count is None:
+        segment_count = max_workers
+    segments = plan_segments(
+        frame_count, segment_count, int(overlap_seconds * input_fps), keyframe_interval
+    )
+    # The frame count of a video is an estimate, so the last segment reads to the end.
+    warm_up_start, start, _ = segments[-1]
+    segments[-1] = (warm_up_start, start, frame_count + int(input_fps) + 1)
+
+    output_file = None
+    segment_files = [None] * len(segments)
+    if output_mode == output_constants.OUTPUT_VIDEO:
+        output_file = get_output_file(input_file, tracker_type, ".mp4")
+        segment_files = [
+            get_output_file(input_file, tracker_type, f".part{i}.mp4")
+            for i in range(len(segments))
+        ]
+
+    logger.info(
+        "Processing %s frames in %s segments with %s workers",
+        frame_count,
+        len(segments),
+        max_workers,
+    )
+    threads_per_worker = max(1, (os.cpu_count() or 1) // max_workers)
+    start_time = time.time()
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=init_worker,
+        initargs=(threads_per_worker,),
+    ) as executor:
+        futures = [
+            executor.submit(
+                process_segment,
+                input_file,
+                segment,
+                tracker_type,
+                detection_interval,
+                miss_threshold,
+                is_in_evaluation_mode,
+                segment_file,
+            )
+            for segment, segment_file in zip(segments, segment_files)
+        ]
+        segment_results = [future.result() for future in futures]
+
+    if output_file is not None:
+        concatenate_videos(segment_files, output_file)
+    elapsed_time = time.time() - start_time
+
+    frame_count = sum(result["frame_count"] for result in segment_results)
+    logger.info(
+        "Processed %s frames in %ss. FPS: %s",
+        frame_count,
+        elapsed_time,
+        frame_count / elapsed_time,
+    )
+    return Process_Result(
+        input_path=input_file,
+        output_path=output_file,
+        tracker_type=tracker_type,
+        input_fps=segment_results[0]["input_fps"],
+        frame_count=frame_count,
+        processing_time=elapsed_time,
+        detected_frame_count=sum(
+            result["detected_frame_count"] for result in segment_results
+        ),
+        tracked_frame_count=sum(
+            result["tracked_frame_count"] for result in segment_results
+        ),
+        tracking_missed_count=sum(
+            result["tracking_missed_count"] for result in segment_results
+        ),
+        detected_trajectory=Trajectory.concatenate(
+            [result["detected_trajectory"] for result in segment_results]
+        ),
+        tracked_trajectory=Trajectory.concatenate(
+            [result["tracked_trajectory"] for result in segment_results]
+        ),
+        frame_latencies=np.concatenate(
+            [result["frame_latencies"] for result in segment_results]
+        ),
+        detection_call_count=sum(
+            result["detection_call_count"] for result in segment_results
+        ),
+        tracking_call_count=sum(
+            result["tracking_call_count"] for result in segment_results
+        ),
+        correction_call_count=sum(
+            result["correction_call_count"] for result in segment_results
+        ),
+        tracker_reinit_count=sum(
+            result["tracker_reinit_count"] for result in segment_results
+        ),
+        correction_time=sum(result["correction_time"] for result in segment_results),
+    )
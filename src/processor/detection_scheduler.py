@@ -0,0 +1,192 @@
+from dataclasses import dataclass
+from logger import logger
+
+from typing import Dict, Optional, Tuple
+
+import math
+
+from src.tracker.tracker_health import Tracker_Health
+
+# Why a detection was wanted, see `Detection_Scheduler.risk_reasons`.
+REASON_LOST = "lost"
+REASON_APPEARANCE = "appearance"
+REASON_INNOVATION = "innovation"
+REASON_UNCERTAINTY = "uncertainty"
+REASON_SPEED = "speed"
+REASON_SIZE_CHANGE = "size_change"
+REASON_INTERVAL = "interval"
+
+
+@dataclass
+class Scheduler_Options:
+    """
+    Scheduler_Options tunes the adaptive detection scheduler.
+
+    Every tracked frame adds its risk to the risk accumulated since the last
+    detection, and a detection is wanted once it reaches 1. The risk of a frame is
+    its worst health signal divided by its limit below, so one frame at a limit, or
+    several frames halfway to it, trigger a detection. The limits are the accuracy
+    floor: without a budget, the ball is detected whenever they are reached.
+    """
+
+    # The largest fraction of the frames that may be detected, e.g. 0.1 for 10%.
+    # `None` to detect whenever a detection is wanted.
+    detection_budget: Optional[float] = 0.1
+    # The detections that can be saved up while the tracking is healthy and
+    # spent in a row when it is not. Only the first detection is available at the start.
+    burst_size: int = 5
+    # The most frames in a row without a detection while tracking.
+    max_interval: int = 30
+    # The appearance score of the correlation trackers below which the ball may be lost.
+    min_appearance_score: float = 0.5
+    # The Kalman innovation, as a fraction of the ball size, at which the motion model is off.
+    max_innovation: float = 0.5
+    # The uncertainty of the predicted position, as a fraction of the ball size.
+    max_uncertainty: float = 0.5
+    # The distance moved in one frame, as a fraction of the ball size.
+    max_speed: float = 0.5
+    # The change of the box size in one frame, as a fraction of the size.
+    max_size_change: float = 0.2
+
+
+def get_center_and_size(
+    boundary: Tuple[int, int, int, int],
+) -> Tuple[float, float, float]:
+    x, y, width, height = boundary
+    return x + width / 2, y + height / 2, max(1.0, (width + height) / 2)
+
+
+class Detection_Scheduler:
+    """
+    Detection_Scheduler decides which frames are detected from the health of the
+    tracking: the tracker's own signals, the speed of the ball and the change of
+    its size. The detections are rationed by a token bucket that fills at the
+    detection budget, so the share of detected frames stays within the budget.
+    """
+
+    def __init__(self, options: Scheduler_Options):
+        self.options = options
+        self.tokens = 1.0
+        self.accumulated_risk = 0.0
+        self.previous_boundary = None
+
+        # The frames on which a detection was wanted, whether or not it ran.
+        self.wanted_count = 0
+        # Detections wanted but postponed because the budget was spent.
+        self.deferred_count = 0
+        # The number of wanted detections by the signal that contributed the most.
+        self.risk_reasons: Dict[str, int] = {}
+        self._reason = None
+        self._reason_risk = 0.0
+
+    def get_risk(
+        self, boundary: Tuple[int, int, int, int], health: Tracker_Health
+    ) -> Tuple[float, str]:
+        """
+        get_risk returns the risk of the tracked frame and the signal it comes from.
+
+        :param boundary: The tracked boundary.
+        :type boundary: Tuple[int, int, int, int]
+        :param health: The health of the tracker after the update.
+        :type health: Tracker_Health
+        """
+        options = self.options
+        risks = {REASON_INTERVAL: 1 / max(1, options.max_interval)}
+        if health.appearance_score is not None:
+            risks[REASON_APPEARANCE] = (1 - health.appearance_score) / max(
+                1e-6, 1 - options.min_appearance_score
+            )
+        if health.innovation is not None:
+            risks[REASON_INNOVATION] = health.innovation / options.max_innovation
+        if health.uncertainty is not None:
+            risks[REASON_UNCERTAINTY] = health.uncertainty / options.max_uncertainty
+        if self.previous_boundary is not None:
+            x, y, size = get_center_and_size(boundary)
+            previous_x, previous_y, previous_size = get_center_and_size(
+                self.previous_boundary
+            )
+            risks[REASON_SPEED] = (
+                math.hypot(x - previous_x, y - previous_y)
+                / previous_size
+                / options.max_speed
+            )
+            risks[REASON_SIZE_CHANGE] = (
+                abs(size - previous_size) / previous_size / options.max_size_change
+            )
+
+        reason = max(risks, key=risks.get)
+        return risks[reason], reason
+
+    def should_detect(
+        self,
+        tracked_boundary: Optional[Tuple[int, int, int, int]],
+        health: Optional[Tracker_Health],
+    ) -> bool:
+        """
+        should_detect adds the risk of the frame and returns whether it should be
+        detected. Call it once per frame, after the tracker update.
+
+        :param tracked_boundary: The tracked boundary, `None` if the ball is not tracked.
+        :type tracked_boundary: Optional[Tuple[int, int, int, int]]
+        :param health: The health of the tracker, `None` if there is no tracker.
+        :type health: Optional[Tracker_Health]
+        """
+        options = self.options
+        if options.detection_budget is not None:
+            self.tokens = min(
+                float(options.burst_size), self.tokens + options.detection_budget
+            )
+
+        if tracked_boundary is None or health is None:
+            risk, reason = math.inf, REASON_LOST
+        else:
+            risk, reason = self.get_risk(tracked_boundary, health)
+            self.previous_boundary = tracked_boundary
+        self.accumulated_risk += risk
+        if risk >= self._reason_risk:
+            self._reason, self._reason_risk = reason, risk
+
+        if self.accumulated_risk < 1:
+            return False
+
+        self.wanted_count += 1
+        if options.detection_budget is not None and self.tokens < 1:
+            self.deferred_count += 1
+            return False
+        return True
+
+    def observe_detection(self, detected_boundary: Optional[Tuple[int, int, int, int]]):
+        """
+        observe_detection spends a detection and resets the accumulated risk.
+        Call it for every detected frame.
+
+        :param detected_boundary: The detected boundary, `None` if the ball was not found.
+        :type detected_boundary: Optional[Tuple[int, int, int, int]]
+        """
+        if self.options.detection_budget is not None:
+            self.tokens -= 1
+        if self._reason is not None:
+            self.risk_reasons[self._reason] = self.risk_reasons.get(self._reason, 0) + 1
+        self.accumulated_risk = 0.0
+        self._reason = None
+        self._reason_risk = 0.0
+        if detected_boundary is not None:
+            self.previous_boundary = detected_boundary
+
+    def postpone(self):
+        """
+        postpone resets the accumulated risk without spending a detection, for a
+        wanted detection that was not needed, e.g. because nothing moved since the
+        last one.
+        """
+        self.accumulated_risk = 0.0
+        self._reason = None
+        self._reason_risk = 0.0
+
+    def log_stats(self):
+        logger.info(
+            "Scheduled detections wanted: %s, deferred by the budget: %s, reasons: %s",
+            self.wanted_count,
+            self.deferred_count,
+            self.risk_reasons,
+        )
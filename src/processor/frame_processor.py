@@ -0,0 +1,522 @@
+from logger import logger
+
+from typing import Dict, List, Optional, Tuple
+
+import time
+
+import cv2
+import numpy as np
+
+from src.detector.detect_soccer_ball import best_boundary
+from src.detector.detection_cache import Detection_Cache
+from src.detector.roi_detection import ROI_Detector, ROI_Options
+from src.detector.soccer_ball_detector import Soccer_Ball_Detector
+
+from src.tracker.auto_tracker import Auto_Options, Auto_Tracker
+from src.tracker.kalman_tracker import Kalman_Options
+from src.tracker.multi_ball_tracker import Multi_Ball_Options, Multi_Ball_Tracker
+import src.tracker.tracker_constants as tracker_constants
+from src.tracker.tracker_creator import create_tracker
+import src.tracker.tracker_registry as tracker_registry
+
+from src.processor.detection_scheduler import Detection_Scheduler, Scheduler_Options
+from src.processor.motion_gate import Motion_Gate, Motion_Options
+from src.processor.result import Frame_State
+import src.utils.profiler as profiler_utils
+from src.utils.profiler import NULL_PROFILER, Profiler
+import src.processor.trajectory as trajectory
+from src.processor.trajectory import Trajectory
+from src.processor.trajectory_exporter import Trajectory_Exporter, get_health_row
+
+
+class Frame_Processor:
+    """
+    Frame_Processor holds the detection + tracking state of one video and
+    processes it one frame at a time. It works on the source frames and does not
+    draw on them, see `Frame_Renderer` for the annotation.
+    """
+
+    def __init__(
+        self,
+        tracker_type: str,
+        detector: Soccer_Ball_Detector,
+        input_fps: float,
+        detection_interval: int = 10,
+        miss_threshold: int = 5,
+        is_in_evaluation_mode: bool = False,
+        detection_cache: Optional[Detection_Cache] = None,
+        roi_options: Optional[ROI_Options] = None,
+        first_frame_index: int = 0,
+        profiler: Profiler = NULL_PROFILER,
+        scheduler_options: Optional[Scheduler_Options] = None,
+        kalman_options: Optional[Kalman_Options] = None,
+        multi_ball_options: Optional[Multi_Ball_Options] = None,
+        motion_options: Optional[Motion_Options] = None,
+        tracking_scale: float = 1.0,
+        trajectory_exporter: Optional[Trajectory_Exporter] = None,
+        auto_options: Optional[Auto_Options] = None,
+    ):
+        # The tracker is created at the first detection, so its type is checked now.
+        if (
+            tracker_type != tracker_constants.TRACKER_AUTO
+            and tracker_type not in tracker_registry.get_tracker_types()
+        ):
+            raise ValueError(f"Unknown tracker type {tracker_type}")
+        self.tracker_type = tracker_type
+        self.detector = detector
+        self.input_fps = input_fps
+        self.detection_interval = detection_interval
+        self.miss_threshold = miss_threshold
+        self.is_in_evaluation_mode = is_in_evaluation_mode
+        self.detection_cache = detection_cache
+        self.roi_detector = ROI_Detector(roi_options) if roi_options else None
+        self.profiler = profiler
+        # Without a scheduler, detections run every `detection_interval` frames
+        # and after `miss_threshold` tracker misses.
+        self.scheduler = (
+            Detection_Scheduler(scheduler_options) if scheduler_options else None
+        )
+        # Every frame is detected in evaluation mode, so there is nothing to gate.
+        self.motion_gate = (
+            Motion_Gate(motion_options)
+            if motion_options and not is_in_evaluation_mode
+            else None
+        )
+
+        # Used when the tracker is a Kalman tracker. With `smooth`, the tracked
+        # trajectory is replaced by the smoothed one in `finish`.
+        self.kalman_options = kalman_options
+        # The scale of the frames the tracker works on, see `Base_Tracker`.
+        self.tracking_scale = tracking_scale
+        # Used when the tracker is the automatic tracker, e.g. for its FPS budget.
+        self.auto_options = auto_options
+        self.tracker = None
+        # In multi-ball mode, every ball is tracked and `tracker` is this tracker
+        # once a primary ball is found.
+        self.ball_tracker = (
+            Multi_Ball_Tracker(multi_ball_options) if multi_ball_options else None
+        )
+        self.detected_boundary = None
+        # Writes the trajectories as they grow, one chunk of frames at a time.
+        self.trajectory_exporter = trajectory_exporter
+        # The rows of the trajectories already exported.
+        self.exported_row_count = 0
+        # The tracker health of each frame not exported yet, see `get_health_row`.
+        self.pending_health_rows: List[Tuple[float, float, float]] = []
+
+        self.frame_index = first_frame_index
+        # The index of the frame among the processed frames, which schedules the
+        # detections every `detection_interval` frames. Unlike `frame_index`, it
+        # does not skip the frames dropped by a stream, see `process_stream`.
+        self.processed_frame_index = first_frame_index
+        self.detected_frames_count = 0
+        self.tracked_frames_count = 0
+        self.tracking_missed_count = 0
+        self.miss_count = 0
+        # The number of frames detected, whether or not a ball was found.
+        self.detection_calls_count = 0
+        # The number of tracker updates.
+        self.tracking_calls_count = 0
+        # The detections given to an existing tracker, and those it was re-initialised on.
+        self.correction_calls_count = 0
+        self.reinit_count = 0
+        # Seconds spent correcting the tracker with detections.
+        self.correction_time = 0.0
+        # The scheduled detections skipped by the motion gate.
+        self.motion_skipped_count = 0
+
+        self.detected_trajectory = Trajectory()
+        self.tracked_trajectory = Trajectory()
+        # The trajectory of each confirmed ball in multi-ball mode, by track id.
+        self.ball_trajectories: Dict[int, Trajectory] = {}
+        # Seconds spent in `process_frame` for each frame.
+        self.frame_latencies = []
+
+    def process_frame(
+        self, frame: cv2.typing.MatLike, candidates: Optional[np.ndarray] = None
+    ) -> Frame_State:
+        """
+        process_frame tracks and, when scheduled, detects the soccer ball in the frame.
+
+        :param frame: The source frame to process.
+        :type frame: cv2.typing.MatLike
+        :param candidates: Detections already computed for this frame, e.g. by a
+        batched detector. If `None`, the detector is run when a detection is scheduled.
+        :type candidates: Optional[np.ndarray]
+        :return: The outcome of processing the frame, in source frame coordinates.
+        """
+        start_time = time.perf_counter_ns()
+        should_detect = False
+        stage: Optional[str] = None
+        tracked_boundary = None
+        did_detect = False
+
+        if self.motion_gate is not None:
+            with self.profiler.stage(profiler_utils.STAGE_MOTION):
+                self.motion_gate.update(frame)
+
+        if self.tracker is not None:
+            stage = "TRACK"
+            with self.profiler.stage(profiler_utils.STAGE_TRACK):
+                did_track, tracked_boundary = self.tracker.update(frame)
+            self.tracking_calls_count += 1
+            if did_track:
+                self.tracked_frames_count += 1
+                self.tracked_trajectory.append(
+                    self.frame_index, tracked_boundary, trajectory.SOURCE_TRACKED
+                )
+            else:
+                tracked_boundary = None
+                self.tracked_trajectory.append(
+                    self.frame_index, None, trajectory.SOURCE_MISSED
+                )
+                self.miss_count += 1
+        else:
+            self.tracked_trajectory.append(
+                self.frame_index, None, trajectory.SOURCE_SKIPPED
+            )
+            should_detect = True
+
+        # The tracker health at the tracked boundary, for the scheduler and the export.
+        tracker_health = None
+        if self.tracker is not None and (
+            self.scheduler is not None or self.trajectory_exporter is not None
+        ):
+            tracker_health = self.tracker.get_health()
+        if self.trajectory_exporter is not None:
+            self.pending_health_rows.append(get_health_row(tracker_health))
+
+        if self.is_in_evaluation_mode:
+            is_detection_scheduled = True
+        elif self.scheduler is not None:
+            is_detection_scheduled = self.scheduler.should_detect(
+                tracked_boundary, tracker_health
+            )
+        else:
+            is_detection_scheduled = (
+                self.processed_frame_index % self.detection_interval == 0
+                or self.miss_count >= self.miss_threshold
+                or should_detect
+            )
+
+        if (
+            is_detection_scheduled
+            and candidates is None
+            and self.motion_gate is not None
+            and self.motion_gate.should_skip(self.detected_boundary)
+        ):
+            is_detection_scheduled = False
+            self.motion_skipped_count += 1
+            self.reuse_detection(frame)
+
+        if is_detection_scheduled:
+            self.tracking_missed_count += self.miss_count
+            self.miss_count = 0
+            if candidates is None:
+                with self.profiler.stage(profiler_utils.STAGE_DETECT):
+                    candidates = self.detect(frame, tracked_boundary is not None)
+            self.detection_calls_count += 1
+            if self.motion_gate is not None:
+                self.motion_gate.observe_detection()
+            candidate_index = self.select_candidate(frame, candidates)
+            self.detected_boundary = (
+                best_boundary(candidates[candidate_index:])
+                if candidate_index is not None
+                else None
+            )
+            if self.scheduler is not None:
+                self.scheduler.observe_detection(self.detected_boundary)
+            stage = "DETECT"
+            did_detect = True
+            if self.detected_boundary is not None:
+                # In multi-ball mode, the balls were corrected by `select_candidate`.
+                if self.ball_tracker is None:
+                    with self.profiler.stage(profiler_utils.STAGE_CORRECT):
+                        self.correct_tracker(frame)
+
+                self.detected_frames_count += 1
+                self.detected_trajectory.append(
+                    self.frame_index,
+                    self.detected_boundary,
+                    trajectory.SOURCE_DETECTED,
+                    float(candidates[candidate_index, 4]),
+                )
+            else:
+                self.detected_trajectory.append(
+                    self.frame_index, None, trajectory.SOURCE_MISSED
+                )
+        else:
+            self.detected_trajectory.append(
+                self.frame_index, None, trajectory.SOURCE_SKIPPED
+            )
+
+        other_ball_boundaries = []
+        if self.ball_tracker is not None:
+            other_ball_boundaries = self.record_ball_trajectories()
+
+        if self.roi_detector is not None:
+            if did_detect and self.detected_boundary is not None:
+                self.roi_detector.observe(self.detected_boundary)
+            else:
+                self.roi_detector.observe(tracked_boundary)
+
+        state = Frame_State(
+            frame_index=self.frame_index,
+            stage=stage,
+            tracked_boundary=tracked_boundary,
+            detected_boundary=self.detected_boundary if did_detect else None,
+            is_ball_lost=self.tracker is None and self.detected_boundary is None,
+            other_ball_boundaries=other_ball_boundaries,
+        )
+        self.frame_index += 1
+        self.processed_frame_index += 1
+        if self.trajectory_exporter is not None:
+            self.export_trajectories()
+        latency = time.perf_counter_ns() - start_time
+        self.frame_latencies.append(latency / 1e9)
+        self.profiler.record(profiler_utils.STAGE_FRAME, start_time, latency)
+        return state
+
+    def correct_tracker(self, frame: cv2.typing.MatLike):
+        """
+        correct_tracker initialises the tracker on the detected boundary, or
+        corrects it if it is already tracking.
+
+        :param frame: The detected frame.
+        :type frame: cv2.typing.MatLike
+        """
+        if self.tracker is None:
+            self.tracker = create_tracker(
+                self.tracker_type,
+                self.kalman_options,
+                self.tracking_scale,
+                self.auto_options,
+            )
+            self.tracker.init(frame, self.detected_boundary, self.input_fps)
+            return
+
+        correction_start_time = time.perf_counter()
+        if self.tracker.correct(frame, self.detected_boundary, self.input_fps):
+            self.reinit_count += 1
+        self.correction_calls_count += 1
+        self.correction_time += time.perf_counter() - correction_start_time
+
+    def reuse_detection(self, frame: cv2.typing.MatLike):
+        """
+        reuse_detection stands in for a detection skipped by the motion gate. Nothing
+        moved since the last detection, so its outcome still holds and the tracker
+        is corrected with the boundary it found.
+
+        :param frame: The current frame.
+        :type frame: cv2.typing.MatLike
+        """
+        self.tracking_missed_count += self.miss_count
+        self.miss_count = 0
+        if self.scheduler is not None:
+            self.scheduler.postpone()
+        # In multi-ball mode, the balls keep tracking until the next detection.
+        if self.detected_boundary is not None and self.ball_tracker is None:
+            with self.profiler.stage(profiler_utils.STAGE_CORRECT):
+                self.correct_tracker(frame)
+
+    def select_candidate(
+        self, frame: cv2.typing.MatLike, candidates: np.ndarray
+    ) -> Optional[int]:
+        """
+        select_candidate returns the index of the candidate of the ball, `None` if
+        there is none. In multi-ball mode, the candidates are first assigned to the
+        balls and the candidate of the primary ball is returned.
+
+        :param frame: The detected frame.
+        :type frame: cv2.typing.MatLike
+        :param candidates: The candidates of the frame, sorted by descending confidence.
+        :type candidates: np.ndarray
+        """
+        if self.ball_tracker is None:
+            return 0 if len(candidates) > 0 else None
+
+        with self.profiler.stage(profiler_utils.STAGE_CORRECT):
+            candidate_index = self.ball_tracker.observe(
+                frame, candidates, self.input_fps
+            )
+        if self.ball_tracker.primary_track is not None:
+            self.tracker = self.ball_tracker
+        return candidate_index
+
+    def record_ball_trajectories(self) -> List[Tuple[int, int, int, int]]:
+        """
+        record_ball_trajectories adds the current frame to the trajectory of every
+        confirmed ball in multi-ball mode. Returns the boundaries of the balls other
+        than the primary ball.
+        """
+        other_ball_boundaries = []
+        for track in self.ball_tracker.get_confirmed_tracks():
+            ball_trajectory = self.ball_trajectories.get(track.track_id)
+            if ball_trajectory is None:
+                ball_trajectory = Trajectory()
+                self.ball_trajectories[track.track_id] = ball_trajectory
+
+            if track.is_detected:
+                ball_trajectory.append(
+                    self.frame_index,
+                    track.boundary,
+                    trajectory.SOURCE_DETECTED,
+                    track.confidence,
+                )
+            elif track.is_tracked:
+                ball_trajectory.append(
+                    self.frame_index, track.boundary, trajectory.SOURCE_TRACKED
+                )
+            else:
+                ball_trajectory.append(self.frame_index, None, trajectory.SOURCE_MISSED)
+                continue
+
+            if track is not self.ball_tracker.primary_track:
+                other_ball_boundaries.append(track.boundary)
+        return other_ball_boundaries
+
+    def detect(
+        self, frame: cv2.typing.MatLike, is_ball_tracked: bool = True
+    ) -> np.ndarray:
+        """
+        detect returns the candidates of the current frame, from the detection
+        cache if it has them. Otherwise, with ROI detection, only the region around
+        the last known position of the ball is detected, and with the motion gate,
+        a lost ball is first looked for around the motion of the frame.
+
+        :param frame: The frame on which the soccer balls are detected.
+        :type frame: cv2.typing.MatLike
+        :param is_ball_tracked: Whether the tracker followed the ball in this frame.
+        :type is_ball_tracked: bool
+        """
+        if self.detection_cache is not None:
+            candidates = self.detection_cache.get(self.frame_index)
+            if candidates is not None:
+                return candidates
+
+        if self.roi_detector is not None:
+            candidates = self.roi_detector.detect(self.detector, frame, self.profiler)
+            if candidates is not None:
+                return candidates
+
+        if self.motion_gate is not None and not is_ball_tracked:
+            candidates = self.motion_gate.detect(self.detector, frame, self.profiler)
+            if candidates is not None:
+                return candidates
+
+        if self.detection_cache is None:
+            return self.detector.detect(frame, self.profiler)
+        return self.detection_cache.detect(
+            self.detector, frame, self.frame_index, self.profiler
+        )
+
+    def reset_results(self):
+        """
+        reset_results clears the counters and boundary lists while keeping the
+        tracker, e.g. at the end of the warm-up frames of a video segment.
+        """
+        self.detected_frames_count = 0
+        self.tracked_frames_count = 0
+        self.tracking_missed_count = 0
+        self.miss_count = 0
+        self.detection_calls_count = 0
+        self.tracking_calls_count = 0
+        self.correction_calls_count = 0
+        self.reinit_count = 0
+        self.correction_time = 0.0
+        self.motion_skipped_count = 0
+        self.detected_trajectory = Trajectory()
+        self.tracked_trajectory = Trajectory()
+        self.ball_trajectories = {}
+        self.frame_latencies = []
+        self.exported_row_count = 0
+        self.pending_health_rows = []
+
+    def export_trajectories(self, is_final: bool = False):
+        """
+        export_trajectories writes the rows of the trajectories that were not
+        exported yet once they fill a chunk, or all of them if `is_final`.
+        Unless the trajectories are kept, the exported rows are then dropped.
+
+        :param is_final: Whether this is the last export of the run.
+        :type is_final: bool
+        """
+        exporter = self.trajectory_exporter
+        pending_row_count = len(self.tracked_trajectory) - self.exported_row_count
+        if pending_row_count == 0 or (
+            not is_final and pending_row_count < exporter.options.chunk_size
+        ):
+            return
+
+        with self.profiler.stage(profiler_utils.STAGE_EXPORT):
+            exporter.write(
+                self.detected_trajectory,
+                self.tracked_trajectory,
+                self.exported_row_count,
+                np.array(self.pending_health_rows, np.float32),
+            )
+        self.pending_health_rows = []
+        if exporter.options.keep_trajectories or is_final:
+            self.exported_row_count = len(self.tracked_trajectory)
+        else:
+            self.detected_trajectory.clear()
+            self.tracked_trajectory.clear()
+            self.exported_row_count = 0
+
+    def finish(self):
+        """
+        finish accounts for the tracker misses since the last detection and
+        smooths the tracked trajectory if the tracker smooths.
+        Call it once after the last frame.
+        """
+        self.tracking_missed_count += self.miss_count
+        self.miss_count = 0
+
+        # The export holds the boundaries as they were tracked, before smoothing.
+        if self.trajectory_exporter is not None:
+            self.export_trajectories(is_final=True)
+
+        if self.tracker is not None:
+            self.smooth_tracked_trajectory()
+
+        if self.scheduler is not None:
+            self.scheduler.log_stats()
+
+        if self.ball_tracker is not None:
+            self.ball_tracker.log_stats()
+
+        if isinstance(self.tracker, Auto_Tracker):
+            self.tracker.log_stats()
+
+        if self.roi_detector is not None:
+            logger.info(
+                "ROI detections: %s, full frame fallbacks: %s",
+                self.roi_detector.roi_detection_count,
+                self.roi_detector.full_detection_count,
+            )
+
+        if self.motion_gate is not None:
+            logger.info(
+                "Detections skipped by the motion gate: %s, motion region detections: %s",
+                self.motion_gate.skipped_count,
+                self.motion_gate.region_detection_count,
+            )
+
+    def smooth_tracked_trajectory(self):
+        """
+        smooth_tracked_trajectory replaces the tracked boundaries with the smoothed
+        ones, if the tracker smooths. Frames where the ball was lost stay lost.
+        """
+        smoothed_boxes = self.tracker.smooth()
+        if smoothed_boxes is None:
+            return
+
+        source = self.tracked_trajectory.source
+        # Every frame that was not skipped was a tracker update. The first updates
+        # may belong to warm-up frames that were reset.
+        updated_rows = np.flatnonzero(source != trajectory.SOURCE_SKIPPED)
+        smoothed_boxes = smoothed_boxes[len(smoothed_boxes) - len(updated_rows) :]
+        is_tracked = source[updated_rows] == trajectory.SOURCE_TRACKED
+        self.tracked_trajectory.boxes[updated_rows[is_tracked]] = smoothed_boxes[
+            is_tracked
+        ]
@@ -0,0 +1,115 @@
+from typing import List, Tuple
+
+import cv2
+
+import src.utils.banner_utils as banner_utils
+import src.utils.boundary_utils as boundary_utils
+
+from src.processor.result import Frame_State
+
+# Colours for visualisation
+DETECTION_COLOUR = (255, 0, 0)
+DETECTION_FONT_COLOUR = (255, 100, 0)
+TRACKING_COLOUR = (0, 255, 0)
+OTHER_BALL_COLOUR = (0, 255, 255)
+LOST_FONT_COLOUR = (0, 0, 255)
+
+
+def offset_boundary(
+    boundary: Tuple[int, int, int, int], offset_y: int
+) -> Tuple[int, int, int, int]:
+    """
+    offset_boundary maps a boundary box from source frame coordinates to the
+    coordinates of the canvas the frame is drawn in.
+
+    :param boundary: The boundary box in the format of (left, top, width, height).
+    :type boundary: Tuple[int, int, int, int]
+    :param offset_y: The row of the canvas at which the source frame starts.
+    :type offset_y: int
+    """
+    x, y, width, height = boundary
+    return (x, y + offset_y, width, height)
+
+
+class Frame_Renderer:
+    """
+    Frame_Renderer annotates the canvas of a frame with the outcome of processing it:
+    the tracked (green) and detected (red) boundaries, the other balls (yellow)
+    in multi-ball mode and the banner text.
+    Boundaries are in source frame coordinates and are mapped onto the canvas.
+    """
+
+    def __init__(self, offset_y: int):
+        """
+        :param offset_y: The row of the canvas at which the source frame starts,
+        i.e. the height of the banner.
+        :type offset_y: int
+        """
+        self.offset_y = offset_y
+
+    def render(
+        self, canvas: cv2.typing.MatLike, state: Frame_State
+    ) -> List[Tuple[int, int, int, int]]:
+        """
+        render draws the outcome of processing a frame on its canvas.
+        Returns the (left, top, width, height) areas of the canvas that were drawn on.
+
+        :param canvas: The canvas made of the banner on top of the source frame.
+        :type canvas: cv2.typing.MatLike
+        :param state: The outcome of processing the frame.
+        :type state: Frame_State
+        """
+        drawn_boxes = []
+
+        for boundary in state.other_ball_boundaries:
+            drawn_boxes.append(
+                boundary_utils.draw_rectangle(
+                    canvas,
+                    offset_boundary(boundary, self.offset_y),
+                    OTHER_BALL_COLOUR,
+                )
+            )
+
+        if state.tracked_boundary is not None:
+            drawn_boxes.append(
+                boundary_utils.draw_rectangle(
+                    canvas,
+                    offset_boundary(state.tracked_boundary, self.offset_y),
+                    TRACKING_COLOUR,
+                )
+            )
+            drawn_boxes.append(
+                banner_utils.add_text(
+                    canvas,
+                    f"Tracked boundary: {state.tracked_boundary}",
+                    fontColour=TRACKING_COLOUR,
+                )
+            )
+
+        if state.detected_boundary is not None:
+            drawn_boxes.append(
+                boundary_utils.draw_rectangle(
+                    canvas,
+                    offset_boundary(state.detected_boundary, self.offset_y),
+                    DETECTION_COLOUR,
+                )
+            )
+            drawn_boxes.append(
+                banner_utils.add_text(
+                    canvas,
+                    f"Detected boundary: {state.detected_boundary}",
+                    fontColour=DETECTION_FONT_COLOUR,
+                )
+            )
+
+        if state.is_ball_lost:
+            drawn_boxes.append(
+                banner_utils.add_text(
+                    canvas,
+                    f"Unable to {state.stage} soccer ball!",
+                    location=(50, 50),
+                    fontColour=LOST_FONT_COLOUR,
+                )
+            )
+
+        return drawn_boxes
@@ -0,0 +1,255 @@
+from dataclasses import dataclass
+
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.detector.detect_soccer_ball import INPUT_DIMENSION
+from src.detector.roi_detection import get_roi
+from src.detector.soccer_ball_detector import Soccer_Ball_Detector
+from src.utils.profiler import NULL_PROFILER, Profiler
+
+# How the motion map is computed.
+# The difference with the frame of the last detection.
+MOTION_DIFFERENCE = "difference"
+# The foreground of a MOG2 background subtractor, accumulated since the last
+# detection, which also ignores repetitive motion such as a crowd, but costs more
+# per frame.
+MOTION_BACKGROUND = "background"
+
+MOTION_METHODS_ALL = [MOTION_DIFFERENCE, MOTION_BACKGROUND]
+
+
+@dataclass
+class Motion_Options:
+    """
+    Motion_Options tunes the motion gate, which skips scheduled detections when
+    nothing moved near the ball.
+    """
+
+    method: str = MOTION_DIFFERENCE
+    # The width of the motion map. The frames are downscaled to it, so a ball
+    # narrower than a few map pixels may be missed.
+    map_width: int = 320
+    # The change of a grayscale map pixel, out of 255, that counts as motion.
+    threshold: int = 20
+    # The side of the region checked around the detected ball, in ball sizes.
+    region_factor: float = 3.0
+    # The fraction of the region around the ball that must move for a detection to run.
+    min_motion: float = 0.02
+    # When the last detection did not find the ball, the moving map pixels in the
+    # whole frame needed for a detection to run. Also the smallest moving area
+    # suggested as a region.
+    min_moving_pixels: int = 4
+    # The most scheduled detections in a row that may be skipped, so that a ball
+    # that moved without being seen is still found.
+    max_skipped: int = 5
+    # The side of the region detected around the motion when the ball is lost,
+    # in sizes of the moving area, and its smallest side.
+    region_size_factor: float = 2.0
+    min_region_size: int = INPUT_DIMENSION
+    # The region detections in a row without a ball, after which the next
+    # detection runs on the full frame.
+    max_region_misses: int = 1
+
+
+class Motion_Gate:
+    """
+    Motion_Gate computes a cheap motion map of every frame, on a downscaled
+    grayscale copy, and uses it to skip the scheduled detections that cannot find
+    anything new: those where nothing moved since the last detection around the
+    ball it found or, if it found none, anywhere in the frame, e.g. during
+    stoppages. When the ball is lost, it suggests the moving regions of the frame
+    to detect in.
+    """
+
+    def __init__(self, options: Optional[Motion_Options] = None):
+        self.options = options if options is not None else Motion_Options()
+        if self.options.method not in MOTION_METHODS_ALL:
+            raise ValueError(f"Unknown motion method {self.options.method}")
+
+        self.background_subtractor = None
+        if self.options.method == MOTION_BACKGROUND:
+            self.background_subtractor = cv2.createBackgroundSubtractorMOG2(
+                detectShadows=False
+            )
+
+        # The map of the current frame and of the frame of the last detection.
+        self.map = None
+        self.reference_map = None
+        # The pixels of the current map that moved since the last detection, `None`
+        # until there is a reference.
+        self.motion_map: Optional[np.ndarray] = None
+        # Map pixels per frame pixel.
+        self.scale = 1.0
+        self.skipped_in_row = 0
+        self.region_miss_count = 0
+
+        # The detections skipped over the whole run, i.e. the detector calls saved.
+        self.skipped_count = 0
+        self.region_detection_count = 0
+
+    def update(self, frame: cv2.typing.MatLike):
+        """
+        update computes the motion map of the frame. Call it once per frame, before
+        `should_skip`.
+
+        :param frame: The source frame.
+        :type frame: cv2.typing.MatLike
+        """
+        frame_height, frame_width = frame.shape[:2]
+        map_width = min(self.options.map_width, frame_width)
+        self.scale = map_width / frame_width
+        map_size = (map_width, max(1, int(round(frame_height * self.scale))))
+
+        small_frame = cv2.resize(frame, map_size, interpolation=cv2.INTER_AREA)
+        if small_frame.ndim == 3:
+            small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY)
+        self.map = cv2.GaussianBlur(small_frame, (3, 3), 0)
+
+        if self.background_subtractor is not None:
+            foreground = self.background_subtractor.apply(self.map) > 0
+            if self.reference_map is None:
+                self.motion_map = None
+            elif self.motion_map is None:
+                self.motion_map = foreground
+            else:
+                # The foreground only holds what moves in this frame, so a ball that
+                # moved and stopped since the last detection would look still.
+                self.motion_map |= foreground
+        elif self.reference_map is not None:
+            difference = cv2.absdiff(self.map, self.reference_map)
+            self.motion_map = difference > self.options.threshold
+        else:
+            self.motion_map = None
+
+    def observe_detection(self):
+        """
+        observe_detection takes the current frame as the reference of the motion.
+        Call it for every detected frame.
+        """
+        self.reference_map = self.map
+        if self.background_subtractor is not None:
+            self.motion_map = None
+        self.skipped_in_row = 0
+
+    def should_skip(
+        self, detected_boundary: Optional[Tuple[int, int, int, int]]
+    ) -> bool:
+        """
+        should_skip returns whether the scheduled detection of the current frame can
+        be skipped because nothing moved since the last detection, so that its
+        outcome still holds: around the ball it found, or anywhere if it found none.
+
+        :param detected_boundary: The boundary found by the last detection, `None` if
+        it did not find the ball.
+        :type detected_boundary: Optional[Tuple[int, int, int, int]]
+        """
+        if self.motion_map is None or self.skipped_in_row >= self.options.max_skipped:
+            return False
+
+        if detected_boundary is None:
+            has_moved = (
+                np.count_nonzero(self.motion_map) >= self.options.min_moving_pixels
+            )
+        else:
+            has_moved = self.get_motion(detected_boundary) >= self.options.min_motion
+        if has_moved:
+            return False
+
+        self.skipped_in_row += 1
+        self.skipped_count += 1
+        return True
+
+    def get_motion(self, boundary: Tuple[int, int, int, int]) -> float:
+        """
+        get_motion returns the fraction of the region around the boundary that moved.
+
+        :param boundary: The (x, y, width, height) boundary of the ball in the frame.
+        :type boundary: Tuple[int, int, int, int]
+        """
+        x, y, width, height = boundary
+        map_height, map_width = self.motion_map.shape
+        size = max(width, height) * self.options.region_factor * self.scale
+        left, top, region_width, region_height = get_roi(
+            ((x + width / 2) * self.scale, (y + height / 2) * self.scale),
+            max(3, int(round(size))),
+            map_width,
+            map_height,
+        )
+        region = self.motion_map[top : top + region_height, left : left + region_width]
+        return float(region.mean()) if region.size > 0 else 0.0
+
+    def get_moving_regions(self) -> List[Tuple[int, int, int, int]]:
+        """
+        get_moving_regions returns the (x, y, width, height) boxes, in frame
+        coordinates, of the connected moving areas of the current frame, largest
+        first. Areas smaller than `min_moving_pixels` map pixels are left out.
+        """
+        if self.motion_map is None:
+            return []
+
+        _, _, stats, _ = cv2.connectedComponentsWithStats(
+            self.motion_map.astype(np.uint8), connectivity=8
+        )
+        # Label 0 is the still background.
+        stats = stats[1:]
+        stats = stats[stats[:, cv2.CC_STAT_AREA] >= self.options.min_moving_pixels]
+        stats = stats[np.argsort(-stats[:, cv2.CC_STAT_AREA], kind="stable")]
+        return [
+            tuple(int(round(value / self.scale)) for value in region[:4])
+            for region in stats
+        ]
+
+    def detect(
+        self,
+        detector: Soccer_Ball_Detector,
+        frame: cv2.typing.MatLike,
+        profiler: Profiler = NULL_PROFILER,
+    ) -> Optional[np.ndarray]:
+        """
+        detect detects the soccer ball candidates in a region around the largest
+        moving area of the frame, in frame coordinates, for when the ball is lost.
+        Returns `None` if the full frame should be detected instead: when nothing
+        moved or after `max_region_misses` region detections without a ball.
+
+        :param detector: The detector to run on the region.
+        :type detector: Soccer_Ball_Detector
+        :param frame: The frame on which the soccer ball is detected.
+        :type frame: cv2.typing.MatLike
+        :param profiler: Times the detection stages.
+        :type profiler: Profiler
+        """
+        regions = self.get_moving_regions()
+        if (
+            len(regions) == 0
+            or self.region_miss_count >= self.options.max_region_misses
+        ):
+            self.region_miss_count = 0
+            return None
+
+        frame_height, frame_width = frame.shape[:2]
+        x, y, width, height = regions[0]
+        size = max(
+            self.options.min_region_size,
+            self.options.region_size_factor * max(width, height),
+        )
+        if size >= frame_width and size >= frame_height:
+            return None
+
+        left, top, width, height = get_roi(
+            (x + width / 2, y + height / 2), int(size), frame_width, frame_height
+        )
+        candidates = detector.detect(
+            frame[top : top + height, left : left + width], profiler
+        )
+        candidates[:, 0] += left
+        candidates[:, 1] += top
+
+        self.region_detection_count += 1
+        if len(candidates) == 0:
+            self.region_miss_count += 1
+        else:
+            self.region_miss_count = 0
+        return candidates
@@ -0,0 +1,14 @@
+# No output besides the returned result. Nothing is drawn or encoded.
+OUTPUT_NONE = "NONE"
+# The boundaries of every frame are written to a CSV file. Nothing is drawn or encoded.
+OUTPUT_TRAJECTORY = "TRAJECTORY"
+# The annotated frames are encoded to an mp4 file.
+OUTPUT_VIDEO = "VIDEO"
+# The annotated frames are encoded to an mp4 file and shown live.
+OUTPUT_LIVE = "LIVE"
+
+
+OUTPUT_MODES_ALL = [OUTPUT_NONE, OUTPUT_TRAJECTORY, OUTPUT_VIDEO, OUTPUT_LIVE]
+
+# The output modes in which the frames are annotated.
+OUTPUT_MODES_RENDERED = [OUTPUT_VIDEO, OUTPUT_LIVE]
@@ -0,0 +1,146 @@
+from dataclasses import dataclass
+import queue
+import threading
+
+from typing import List
+
+import cv2
+
+from src.utils.frame_buffer import Frame_Buffer, Frame_Buffer_Ring
+import src.utils.profiler as profiler_utils
+from src.utils.profiler import NULL_PROFILER, Profiler
+
+# Marks the end of the frames in a queue.
+_END_OF_STREAM = None
+
+# How often a blocked stage re-checks whether the pipeline was stopped, in seconds.
+_POLL_INTERVAL = 0.1
+
+
+@dataclass
+class Pipeline_Options:
+    """
+    Pipeline_Options tunes the threaded decode -> process -> encode pipeline.
+    The queue sizes bound how far decoding may run ahead of processing and
+    how far processing may run ahead of encoding.
+    """
+
+    decode_queue_size: int = 8
+    encode_queue_size: int = 8
+
+
+class Frame_Decoder(threading.Thread):
+    """
+    Frame_Decoder decodes frames from the video on its own thread into the
+    buffers of the ring. Frames are handed over in order through a bounded queue,
+    so decoding blocks when processing falls behind.
+    """
+
+    def __init__(
+        self,
+        cap: cv2.VideoCapture,
+        buffers: Frame_Buffer_Ring,
+        queue_size: int,
+        profiler: Profiler = NULL_PROFILER,
+    ):
+        super().__init__(name="Frame_Decoder", daemon=True)
+        self.cap = cap
+        self.buffers = buffers
+        self.profiler = profiler
+        self.frames = queue.Queue(maxsize=max(1, queue_size))
+        self.stop_event = threading.Event()
+        self.error = None
+        self.is_finished = False
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                buffer = self.buffers.next()
+                if not buffer.read(self.cap, self.profiler):
+                    break
+                self._put(buffer)
+        except Exception as error:
+            self.error = error
+        finally:
+            self._put(_END_OF_STREAM)
+
+    def _put(self, frame):
+        while not self.stop_event.is_set():
+            try:
+                self.frames.put(frame, timeout=_POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+
+    def read(self, count: int) -> List[Frame_Buffer]:
+        """
+        read returns up to `count` decoded frames, blocking until they are available.
+        Fewer frames are returned at the end of the video.
+
+        :param count: The maximum number of frames to read.
+        :type count: int
+        """
+        frames = []
+        while len(frames) < count and not self.is_finished:
+            frame = self.frames.get()
+            if frame is _END_OF_STREAM:
+                self.is_finished = True
+                if self.error is not None:
+                    raise self.error
+                break
+            frames.append(frame)
+        return frames
+
+    def stop(self):
+        """
+        stop stops decoding and waits for the thread to finish.
+        """
+        self.stop_event.set()
+        self.join()
+
+
+class Frame_Encoder(threading.Thread):
+    """
+    Frame_Encoder writes frames to the video on its own thread, in the order
+    they were queued. It has the same `write`/`release` interface as `cv2.VideoWriter`.
+    """
+
+    def __init__(
+        self,
+        video_writer: cv2.VideoWriter,
+        queue_size: int,
+        profiler: Profiler = NULL_PROFILER,
+    ):
+        super().__init__(name="Frame_Encoder", daemon=True)
+        self.video_writer = video_writer
+        self.profiler = profiler
+        self.frames = queue.Queue(maxsize=max(1, queue_size))
+        self.error = None
+
+    def run(self):
+        while True:
+            frame = self.frames.get()
+            if frame is _END_OF_STREAM:
+                break
+            if self.error is None:
+                try:
+                    with self.profiler.stage(profiler_utils.STAGE_ENCODE):
+                        self.video_writer.write(frame)
+                except Exception as error:
+                    # Keep draining the queue so that `write` never blocks forever.
+                    self.error = error
+
+    def write(self, frame: cv2.typing.MatLike):
+        if self.error is not None:
+            raise self.error
+        self.frames.put(frame)
+
+    def release(self):
+        """
+        release waits for the queued frames to be written and releases the video writer.
+        """
+        self.frames.put(_END_OF_STREAM)
+        self.join()
+        self.video_writer.release()
+        if self.error is not None:
+            raise self.error
@@ -2,33 +2,191 @@ from pathlib import Path
 from logger import logger
 import time
 
-from typing import Tuple, Optional
+from typing import List, Optional, Tuple
 
 import cv2
+import numpy as np
 
-from src.detector.detect_soccer_ball import detect_soccer_ball
-import src.utils.banner_utils as banner_utils
-import src.utils.boundary_utils as boundary_utils
+from src.detector.detection_cache import Detection_Cache
+from src.detector.roi_detection import ROI_Options
+from src.detector.model_registry import get_detector
+from src.detector.soccer_ball_detector import Soccer_Ball_Detector
+from src.utils.frame_buffer import Frame_Buffer, Frame_Buffer_Ring
+import src.utils.profiler as profiler_utils
+from src.utils.profiler import NULL_PROFILER, Profiler
 
 import src.tracker.tracker_constants as tracker_constants
-from src.tracker.tracker_creator import create_tracker
+from src.tracker.auto_tracker import Auto_Options
+from src.tracker.kalman_tracker import Kalman_Options
+from src.tracker.multi_ball_tracker import Multi_Ball_Options
 
+from src.processor.detection_scheduler import Scheduler_Options
+from src.processor.motion_gate import Motion_Options
+from src.processor.frame_processor import Frame_Processor
+from src.processor.frame_renderer import Frame_Renderer
+import src.processor.output_constants as output_constants
+from src.processor.pipeline import Frame_Decoder, Frame_Encoder, Pipeline_Options
 from src.processor.result import Process_Result
-
-# Colours for visualisation
-DETECTION_COLOUR = (255, 0, 0)
-DETECTION_FONT_COLOUR = (255, 100, 0)
-TRACKING_COLOUR = (0, 255, 0)
+from src.processor.trajectory_exporter import Export_Options, Trajectory_Exporter
+from src.processor.trajectory_writer import write_trajectory_csv
 
 # Define common PATHs
 FILE = Path(__file__).resolve()
 ROOT = FILE.parents[2]
 
-# Load the YOLOv4-tiny detector
-net = cv2.dnn.readNetFromDarknet(
-    cfgFile=ROOT / "models" / "yolov4-tiny.cfg",
-    darknetModel=ROOT / "models" / "yolov4-tiny.weights",
-)
+# The number of frames detected with one forward pass in evaluation mode.
+DETECTION_BATCH_SIZE = 8
+
+
+def read_frames(
+    cap: cv2.VideoCapture,
+    buffers: Frame_Buffer_Ring,
+    count: int,
+    profiler: Profiler = NULL_PROFILER,
+) -> List[Frame_Buffer]:
+    """
+    read_frames decodes up to `count` frames from the video into the next buffers
+    of the ring, below their banner. Fewer frames are returned at the end of the video.
+
+    :param cap: The video to read from.
+    :type cap: cv2.VideoCapture
+    :param buffers: The ring of preallocated frame buffers to decode into.
+    :type buffers: Frame_Buffer_Ring
+    :param count: The maximum number of frames to read.
+    :type count: int
+    :param profiler: Times the banner restore and the decoding of each frame.
+    :type profiler: Profiler
+    """
+    frames = []
+    while len(frames) < count:
+        buffer = buffers.next()
+        if not buffer.read(cap, profiler):
+            break
+        frames.append(buffer)
+    return frames
+
+
+def detect_frames(
+    detector: Soccer_Ball_Detector,
+    frames: List[cv2.typing.MatLike],
+    first_frame_index: int,
+    detection_cache: Optional[Detection_Cache] = None,
+    profiler: Profiler = NULL_PROFILER,
+) -> List[np.ndarray]:
+    """
+    detect_frames detects soccer balls in consecutive frames with one forward pass,
+    skipping the frames whose detections are already in the cache.
+
+    :param detector: The detector to use.
+    :type detector: Soccer_Ball_Detector
+    :param frames: The consecutive frames on which the soccer balls are detected.
+    :type frames: List[cv2.typing.MatLike]
+    :param first_frame_index: The index of the first frame.
+    :type first_frame_index: int
+    :param detection_cache: The detection cache of the video, if any.
+    :type detection_cache: Optional[Detection_Cache]
+    :param profiler: Times the detection stages.
+    :type profiler: Profiler
+    """
+    if detection_cache is None:
+        return detector.detect_batch(frames, profiler)
+    return detection_cache.detect_batch(detector, frames, first_frame_index, profiler)
+
+
+def open_video(input_file: Path) -> Tuple[cv2.VideoCapture, int, int, int]:
+    """
+    open_video opens the input video and reads its first frame to find the
+    size of the frames.
+    Returns the capture, the frame width and height and the input FPS.
+
+    :param input_file: Path to the input video
+    :type input_file: Path
+    """
+    # Read input video
+    cap = cv2.VideoCapture(input_file)
+    if not cap.isOpened():
+        logger.error("Unable to open file at %s", input_file)
+        raise FileNotFoundError(f"Unable to open file {input_file}")
+
+    #  Read first frame and find the size of the frames
+    has_frame, frame = cap.read()
+    if not has_frame:
+        logger.error("Video has no frames %s", input_file)
+        raise RuntimeError(f"Video has no frames: {input_file}")
+
+    # Get details about input video that will be used for the output.
+    frame_height, frame_width = frame.shape[:2]
+    input_fps = int(cap.get(cv2.CAP_PROP_FPS))
+    logger.info(
+        "Input frame count: %s fps: %s",
+        int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        int(cap.get(cv2.CAP_PROP_FPS)),
+    )
+    return cap, frame_width, frame_height, input_fps
+
+
+def get_tracker_name(tracker_type: str, tracking_scale: float = 1.0) -> str:
+    """
+    get_tracker_name returns the name of the tracker in output file names, with
+    its tracking scale if it does not track at full resolution, e.g. "CSRT@0.5".
+
+    :param tracker_type: Type of the tracker
+    :type tracker_type: str
+    :param tracking_scale: The scale of the frames the tracker works on
+    :type tracking_scale: float
+    """
+    if tracking_scale == 1.0:
+        return tracker_type
+    return f"{tracker_type}@{tracking_scale:g}"
+
+
+def get_output_file(input_file: Path, tracker_type: str, suffix: str) -> Path:
+    """
+    get_output_file returns the path of an output file of the tracker,
+    creating the output directory if needed.
+
+    :param input_file: Path to the input video
+    :type input_file: Path
+    :param tracker_type: Type of tracker the output file is for
+    :type tracker_type: str
+    :param suffix: The suffix of the output file, e.g. ".mp4"
+    :type suffix: str
+    """
+    output_dir = ROOT / "output"
+    output_dir.mkdir(exist_ok=True)
+    return output_dir / f"{input_file.stem}_{tracker_type}{suffix}"
+
+
+def create_video_writer(
+    input_file: Path,
+    tracker_type: str,
+    input_fps: int,
+    frame_width: int,
+    frame_height: int,
+) -> Tuple[cv2.VideoWriter, Path]:
+    """
+    create_video_writer makes the VideoWriter used to write the output video
+    of the tracker. Returns the writer and the path of the output video.
+
+    :param input_file: Path to the input video
+    :type input_file: Path
+    :param tracker_type: Type of tracker the output video is for
+    :type tracker_type: str
+    :param input_fps: The FPS of the input video
+    :type input_fps: int
+    :param frame_width: The width of the output frames
+    :type frame_width: int
+    :param frame_height: The height of the output frames
+    :type frame_height: int
+    """
+    output_file = get_output_file(input_file, tracker_type, ".mp4")
+    video_writer = cv2.VideoWriter(
+        output_file,
+        cv2.VideoWriter.fourcc(*"mp4v"),
+        input_fps,
+        (frame_width, frame_height),
+    )
+    return video_writer, output_file
 
 
 def process_video(
@@ -38,6 +196,22 @@ def process_video(
     miss_threshold: int = 5,
     should_show_live_output: bool = False,
     is_in_evaluation_mode: bool = False,
+    detector: Optional[Soccer_Ball_Detector] = None,
+    detection_batch_size: int = DETECTION_BATCH_SIZE,
+    pipeline: Optional[Pipeline_Options] = None,
+    use_detection_cache: bool = False,
+    roi_options: Optional[ROI_Options] = None,
+    output_mode: str = output_constants.OUTPUT_VIDEO,
+    profile: bool = False,
+    trace_file: Optional[Path] = None,
+    scheduler_options: Optional[Scheduler_Options] = None,
+    kalman_options: Optional[Kalman_Options] = None,
+    multi_ball_options: Optional[Multi_Ball_Options] = None,
+    motion_options: Optional[Motion_Options] = None,
+    tracking_scale: float = 1.0,
+    export_file: Optional[Path] = None,
+    export_options: Optional[Export_Options] = None,
+    auto_options: Optional[Auto_Options] = None,
 ) -> Process_Result:
     """
     Runs the single-object detection + tracking pipeline
@@ -53,163 +227,452 @@ def process_video(
     which the app should re-detect the soccer ball
     :type miss_threshold: int
     :param should_show_live_output: Whether to show the live output of the video being processed.
+    Same as `output_mode=OUTPUT_LIVE`.
     :type should_show_live_output: bool
     :param is_in_evaluation_mode: Whether in evaluation mode. If in evaluation mode,
     the app will detect and track every frame to get a better understanding of the performance of each tracker.
     :type is_in_evaluation_mode: bool
+    :param detector: The detector to use. The default OpenCV CPU detector of the
+    process is used if not provided, see `model_registry`.
+    :type detector: Optional[Soccer_Ball_Detector]
+    :param detection_batch_size: The number of frames detected with one forward pass
+    in evaluation mode, where every frame is detected.
+    :type detection_batch_size: int
+    :param pipeline: If provided, decoding and encoding run on their own threads,
+    connected to the processing stage by bounded queues. The output is identical to the serial run.
+    :type pipeline: Optional[Pipeline_Options]
+    :param use_detection_cache: Whether to read detections from the on-disk detection cache
+    of the video and detector, and to add the detections it is missing to it.
+    :type use_detection_cache: bool
+    :param roi_options: If provided, re-detections run on a region around the last known
+    position of the ball, falling back to the full frame after repeated misses.
+    Not used in evaluation mode, where full frames are detected in batches.
+    :type roi_options: Optional[ROI_Options]
+    :param output_mode: What to output, one of `output_constants.OUTPUT_MODES_ALL`.
+    Frames are only annotated and encoded in the video and live modes.
+    :type output_mode: str
+    :param profile: Whether to time every stage of every frame. The call counts and
+    latency percentiles of the stages are added to the result.
+    :type profile: bool
+    :param trace_file: If provided, profiles the run and writes the timeline of the
+    stages to this Chrome trace event JSON file, e.g. for Perfetto.
+    :type trace_file: Optional[Path]
+    :param scheduler_options: If provided, detections are scheduled adaptively from
+    the health of the tracking within a detection budget, instead of every
+    `detection_interval` frames. Not used in evaluation mode.
+    :type scheduler_options: Optional[Scheduler_Options]
+    :param kalman_options: The options of the Kalman tracker, e.g. its gating. With
+    `smooth`, the tracked trajectory is smoothed after the run; the annotated video
+    still shows the boundaries as they were tracked.
+    :type kalman_options: Optional[Kalman_Options]
+    :param multi_ball_options: If provided, every ball is tracked, see
+    `Multi_Ball_Tracker`, and their trajectories are added to the result. The
+    single-ball outputs follow the primary ball and `tracker_type` is only used
+    to name the output; the tracker of each ball is set in the options.
+    :type multi_ball_options: Optional[Multi_Ball_Options]
+    :param motion_options: If provided, a cheap motion map of every frame skips the
+    scheduled detections where nothing moved near the ball, and a lost ball is
+    looked for around the motion first. Not used in evaluation mode.
+    :type motion_options: Optional[Motion_Options]
+    :param tracking_scale: The scale of the frames the tracker works on, e.g. 0.5
+    to track at half the resolution. The boundaries stay in source frame coordinates.
+    :type tracking_scale: float
+    :param export_file: If provided, the tracked and detected boundary of every frame
+    is written to this JSONL or CSV file, or binary directory, a chunk of frames at
+    a time while the video is processed, see `Trajectory_Exporter`.
+    :type export_file: Optional[Path]
+    :param export_options: How to export, e.g. the format, the chunk size and
+    whether the result also keeps the trajectories in memory.
+    :type export_options: Optional[Export_Options]
+    :param auto_options: The options of the automatic tracker, `TRACKER_AUTO`, e.g.
+    its FPS budget, see `Auto_Tracker`.
+    :type auto_options: Optional[Auto_Options]
     :return: Returns the detection and tracking frame count along with output FPS
     :rtype: Result
     """
 
-    # Read input video
-    cap = cv2.VideoCapture(input_file)
-    if not cap.isOpened():
-        logger.error("Unable to open file at %s", input_file)
-        raise FileNotFoundError(f"Unable to open file {input_file}")
+    if should_show_live_output:
+        output_mode = output_constants.OUTPUT_LIVE
+    if output_mode not in output_constants.OUTPUT_MODES_ALL:
+        raise ValueError(f"Unknown output mode {output_mode}")
+    is_rendered = output_mode in output_constants.OUTPUT_MODES_RENDERED
+    tracker_name = get_tracker_name(tracker_type, tracking_scale)
 
-    #  Read first frame and find the height of the frame after adding the banner
-    has_frame, frame = cap.read()
-    if not has_frame:
-        logger.error("Video has no frames %s", input_file)
-        raise RuntimeError(f"Video has no frames: {input_file}")
+    cap, frame_width, frame_height, input_fps = open_video(input_file)
 
-    # Get details about input video that will be used for the output.
-    frame = banner_utils.add_banner(frame)
-    frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    frame_height = frame.shape[0]
-    input_fps = int(cap.get(cv2.CAP_PROP_FPS))
-    logger.info(
-        "Input frame count: %s fps: %s",
-        int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
-        int(cap.get(cv2.CAP_PROP_FPS)),
-    )
+    # Released in `finally`, also when processing fails.
+    decoder = None
+    video_writer = None
+    trajectory_exporter = None
+    try:
+        # Every frame is detected in evaluation mode, so the detections can be batched.
+        batch_size = max(1, detection_batch_size) if is_in_evaluation_mode else 1
 
-    # Make a VideoWriter to use to write the output video
-    output_dir = ROOT / "output"
-    output_dir.mkdir(exist_ok=True)
+        # Frames are decoded into a ring of preallocated buffers. It must hold every
+        # frame in flight: the batch being processed and, when pipelined, the frames
+        # queued or in progress in the decoder and encoder.
+        ring_size = batch_size
+        if pipeline is not None:
+            ring_size += pipeline.decode_queue_size + pipeline.encode_queue_size + 2
+        buffers = Frame_Buffer_Ring(ring_size, frame_height, frame_width)
+        canvas_height, canvas_width = buffers.buffers[0].canvas.shape[:2]
 
-    output_file = output_dir / f"{input_file.stem}_{tracker_type}.mp4"
-    video_writer = cv2.VideoWriter(
-        output_file,
-        cv2.VideoWriter.fourcc(*"mp4v"),
-        input_fps,
-        (frame_width, frame_height),
-    )
+        renderer = None
+        output_file = None
+        if is_rendered:
+            renderer = Frame_Renderer(offset_y=canvas_height - frame_height)
+            video_writer, output_file = create_video_writer(
+                input_file, tracker_name, input_fps, canvas_width, canvas_height
+            )
+        elif output_mode == output_constants.OUTPUT_TRAJECTORY:
+            output_file = get_output_file(input_file, tracker_name, ".csv")
 
-    tracker = None
-    banner_text: Optional[str] = None
-    detected_boundary = None
+        if detector is None:
+            detector = get_detector()
 
-    frame_index = 0
-    detected_frames_count = 0
-    tracked_frames_count = 0
-    tracking_misssed_count = 0
-    miss_count = 0
-    should_detect = False
+        detection_cache = None
+        if use_detection_cache:
+            detection_cache = Detection_Cache.for_video(input_file, detector)
 
-    detected_bbox_list = []
-    tracked_bbox_list = []
+        profiler = Profiler() if profile or trace_file is not None else NULL_PROFILER
 
-    start_time = time.time()
-    while cap.isOpened():
-        has_frame, frame = cap.read()
-        if not has_frame:
-            break
+        if export_file is not None:
+            trajectory_exporter = Trajectory_Exporter(
+                export_file, input_fps, export_options
+            )
+
+        processor = Frame_Processor(
+            tracker_type=tracker_type,
+            detector=detector,
+            input_fps=input_fps,
+            detection_interval=detection_interval,
+            miss_threshold=miss_threshold,
+            is_in_evaluation_mode=is_in_evaluation_mode,
+            detection_cache=detection_cache,
+            roi_options=roi_options,
+            profiler=profiler,
+            scheduler_options=scheduler_options,
+            kalman_options=kalman_options,
+            multi_ball_options=multi_ball_options,
+            motion_options=motion_options,
+            tracking_scale=tracking_scale,
+            trajectory_exporter=trajectory_exporter,
+            auto_options=auto_options,
+        )
 
-        frame = banner_utils.add_banner(frame)
-        should_detect = False
-        banner_text = None
-
-        if tracker is not None:
-            banner_text = "TRACK"
-            did_track, tracked_boundary = tracker.update(frame)
-            if did_track:
-                boundary_utils.draw_rectangle(frame, tracked_boundary, TRACKING_COLOUR)
-                banner_utils.add_text(
-                    frame,
-                    f"Tracked boundary: {tracked_boundary}",
-                    fontColour=TRACKING_COLOUR,
+        if pipeline is not None:
+            decoder = Frame_Decoder(cap, buffers, pipeline.decode_queue_size, profiler)
+            decoder.start()
+            read = decoder.read
+            if video_writer is not None:
+                video_writer = Frame_Encoder(
+                    video_writer, pipeline.encode_queue_size, profiler
                 )
-                tracked_frames_count += 1
-                tracked_bbox_list.append(tracked_boundary)
-            else:
-                tracked_bbox_list.append(None)
-                miss_count += 1
+                video_writer.start()
         else:
-            tracked_bbox_list.append(None)
-            should_detect = True
-
-        if (
-            frame_index % detection_interval == 0
-            or miss_count >= miss_threshold
-            or should_detect
-            or is_in_evaluation_mode
-        ):
-            tracking_misssed_count += miss_count
-            miss_count = 0
-            detected_boundary = detect_soccer_ball(
-                frame, net, frame_width, frame_height
-            )
-            banner_text = "DETECT"
-            if detected_boundary is not None:
-                if tracker is None:
-                    # Initialise the tracker
-                    tracker = create_tracker(tracker_type)
-                    tracker.init(frame, detected_boundary, input_fps)
-                else:
-                    tracker.correct(frame, detected_boundary, input_fps)
 
-                boundary_utils.draw_rectangle(
-                    frame, detected_boundary, DETECTION_COLOUR
-                )
-                banner_utils.add_text(
-                    frame,
-                    f"Detected boundary: {detected_boundary}",
-                    fontColour=DETECTION_FONT_COLOUR,
-                )
-                detected_frames_count += 1
-                detected_bbox_list.append(detected_boundary)
+            def read(count):
+                return read_frames(cap, buffers, count, profiler)
+
+        start_time = time.time()
+        should_stop = False
+        while not should_stop:
+            frames = read(batch_size)
+            if len(frames) == 0:
+                break
+
+            if is_in_evaluation_mode:
+                with profiler.stage(profiler_utils.STAGE_DETECT):
+                    candidates_list = detect_frames(
+                        detector,
+                        [buffer.image for buffer in frames],
+                        processor.frame_index,
+                        detection_cache,
+                        profiler,
+                    )
             else:
-                detected_bbox_list.append(None)
-
-        if tracker is None and detected_boundary is None:
-            banner_utils.add_text(
-                frame,
-                f"Unable to {banner_text} soccer ball!",
-                location=(50, 50),
-                fontColour=(0, 0, 255),
-            )
-            banner_text = None
+                candidates_list = [None] * len(frames)
 
-        frame_index += 1
-        video_writer.write(frame)
+            for buffer, candidates in zip(frames, candidates_list):
+                state = processor.process_frame(buffer.image, candidates)
+                if not is_rendered:
+                    continue
 
-        if should_show_live_output:
-            cv2.imshow("Detection + Tracking", frame)
-            if cv2.waitKey(1) == 27:
-                break
+                with profiler.stage(profiler_utils.STAGE_RENDER):
+                    buffer.drawn_boxes.extend(renderer.render(buffer.canvas, state))
+                if decoder is None:
+                    with profiler.stage(profiler_utils.STAGE_ENCODE):
+                        video_writer.write(buffer.canvas)
+                else:
+                    # The encoder thread times the encoding.
+                    video_writer.write(buffer.canvas)
+
+                if output_mode == output_constants.OUTPUT_LIVE:
+                    with profiler.stage(profiler_utils.STAGE_DISPLAY):
+                        cv2.imshow("Detection + Tracking", buffer.canvas)
+                        key = cv2.waitKey(1)
+                    if key == 27:
+                        should_stop = True
+                        break
+
+        processor.finish()
+        if output_mode == output_constants.OUTPUT_TRAJECTORY:
+            write_trajectory_csv(
+                output_file, processor.detected_trajectory, processor.tracked_trajectory
+            )
+    finally:
+        if decoder is not None:
+            decoder.stop()
+        cap.release()
+        if trajectory_exporter is not None:
+            trajectory_exporter.close()
+        # Last, as it raises the error of the encoder thread, if any.
+        if video_writer is not None:
+            video_writer.release()
+        if output_mode == output_constants.OUTPUT_LIVE:
+            cv2.destroyAllWindows()
+    if trajectory_exporter is not None:
+        logger.info(
+            "Exported %s frames to %s", trajectory_exporter.row_count, export_file
+        )
 
     elapsed_time = time.time() - start_time
-    fps_processed = frame_index / elapsed_time
+    fps_processed = processor.frame_index / elapsed_time
     logger.info(
-        "Processed %s frames in %ss. FPS: %s", frame_index, elapsed_time, fps_processed
+        "Processed %s frames in %ss. FPS: %s",
+        processor.frame_index,
+        elapsed_time,
+        fps_processed,
     )
-    tracking_misssed_count += miss_count
 
-    cap.release()
-    video_writer.release()
-    cv2.destroyAllWindows()
+    if detection_cache is not None:
+        detection_cache.save()
+
+    if trace_file is not None:
+        profiler.write_trace(trace_file)
+        logger.info("Wrote the trace to %s", trace_file)
 
     return Process_Result(
         input_path=input_file,
         output_path=output_file,
         tracker_type=tracker_type,
         input_fps=input_fps,
-        frame_count=frame_index,
+        frame_count=processor.frame_index,
         processing_time=elapsed_time,
-        detected_frame_count=detected_frames_count,
-        tracked_frame_count=tracked_frames_count,
-        tracking_missed_count=tracking_misssed_count,
-        detected_bbox_list=detected_bbox_list,
-        tracked_bbox_list=tracked_bbox_list,
+        detected_frame_count=processor.detected_frames_count,
+        tracked_frame_count=processor.tracked_frames_count,
+        tracking_missed_count=processor.tracking_missed_count,
+        detected_trajectory=processor.detected_trajectory,
+        tracked_trajectory=processor.tracked_trajectory,
+        frame_latencies=np.asarray(processor.frame_latencies),
+        detection_call_count=processor.detection_calls_count,
+        tracking_call_count=processor.tracking_calls_count,
+        correction_call_count=processor.correction_calls_count,
+        tracker_reinit_count=processor.reinit_count,
+        correction_time=processor.correction_time,
+        motion_skipped_detection_count=processor.motion_skipped_count,
+        tracking_scale=tracking_scale,
+        stage_stats=profiler.summary(),
+        ball_trajectories=processor.ball_trajectories,
+        export_path=export_file,
     )
+
+
+def process_video_shared_detections(
+    input_file: Path,
+    tracker_types: List[str],
+    detector: Optional[Soccer_Ball_Detector] = None,
+    detection_batch_size: int = DETECTION_BATCH_SIZE,
+    use_detection_cache: bool = False,
+    output_mode: str = output_constants.OUTPUT_NONE,
+    kalman_options: Optional[Kalman_Options] = None,
+    tracking_scales: Optional[List[float]] = None,
+    profile: bool = False,
+) -> List[Process_Result]:
+    """
+    Runs the evaluation mode pipeline for several trackers in a single pass.
+    Every frame is decoded and detected once, and the same frame and detections
+    are fed to each tracker.
+
+    The decode and detection time is measured once and shared by all the trackers.
+    The time spent in each tracker, including writing its output, is measured
+    separately. The `processing_time` of each result is the sum of both, so its
+    FPS is comparable to a standalone evaluation run.
+
+    :param input_file: Path to the input video
+    :type input_file: Path
+    :param tracker_types: Types of the trackers to evaluate
+    :type tracker_types: List[str]
+    :param detector: The detector to use. The default OpenCV CPU detector of the
+    process is used if not provided, see `model_registry`.
+    :type detector: Optional[Soccer_Ball_Detector]
+    :param detection_batch_size: The number of frames detected with one forward pass.
+    :type detection_batch_size: int
+    :param use_detection_cache: Whether to read detections from the on-disk detection cache
+    of the video and detector, and to add the detections it is missing to it.
+    :type use_detection_cache: bool
+    :param output_mode: What to output for each tracker. The live mode is not supported.
+    :type output_mode: str
+    :param kalman_options: The options of the Kalman tracker, see `process_video`.
+    :type kalman_options: Optional[Kalman_Options]
+    :param tracking_scales: The tracking scale of each tracker, see `process_video`.
+    Defaults to full resolution. The same tracker type may be listed several times
+    with different scales to compare them.
+    :type tracking_scales: Optional[List[float]]
+    :param profile: Whether to time the stages of each tracker, e.g. its updates.
+    The stages of each tracker are added to its result.
+    :type profile: bool
+    :return: Returns one result per tracker, in the order of `tracker_types`
+    :rtype: List[Result]
+    """
+    if output_mode not in output_constants.OUTPUT_MODES_ALL:
+        raise ValueError(f"Unknown output mode {output_mode}")
+    if output_mode == output_constants.OUTPUT_LIVE:
+        raise ValueError(
+            "Live output is not supported when evaluating several trackers"
+        )
+    is_rendered = output_mode in output_constants.OUTPUT_MODES_RENDERED
+
+    cap, frame_width, frame_height, input_fps = open_video(input_file)
+
+    # Released in `finally`, also when processing fails.
+    video_writers = []
+    try:
+        batch_size = max(1, detection_batch_size)
+        buffers = Frame_Buffer_Ring(batch_size, frame_height, frame_width)
+        canvas_height, canvas_width = buffers.buffers[0].canvas.shape[:2]
+        renderer = Frame_Renderer(offset_y=canvas_height - frame_height)
+
+        if detector is None:
+            detector = get_detector()
+
+        detection_cache = None
+        if use_detection_cache:
+            detection_cache = Detection_Cache.for_video(input_file, detector)
+
+        if tracking_scales is None:
+            tracking_scales = [1.0] * len(tracker_types)
+        if len(tracking_scales) != len(tracker_types):
+            raise ValueError("Expected one tracking scale per tracker")
+
+        processors = []
+        profilers = []
+        tracker_canvases = []
+        output_files = []
+        for tracker_type, tracking_scale in zip(tracker_types, tracking_scales):
+            profilers.append(Profiler() if profile else NULL_PROFILER)
+            processors.append(
+                Frame_Processor(
+                    tracker_type=tracker_type,
+                    detector=detector,
+                    input_fps=input_fps,
+                    is_in_evaluation_mode=True,
+                    kalman_options=kalman_options,
+                    tracking_scale=tracking_scale,
+                    profiler=profilers[-1],
+                )
+            )
+            tracker_name = get_tracker_name(tracker_type, tracking_scale)
+            output_file = None
+            if is_rendered:
+                video_writer, output_file = create_video_writer(
+                    input_file, tracker_name, input_fps, canvas_width, canvas_height
+                )
+                tracker_canvases.append(np.empty_like(buffers.buffers[0].canvas))
+                video_writers.append(video_writer)
+            elif output_mode == output_constants.OUTPUT_TRAJECTORY:
+                output_file = get_output_file(input_file, tracker_name, ".csv")
+            output_files.append(output_file)
+
+        shared_time = 0.0
+        tracker_times = [0.0] * len(tracker_types)
+        frame_index = 0
+        while True:
+            start_time = time.perf_counter()
+            frames = read_frames(cap, buffers, batch_size)
+            if len(frames) == 0:
+                shared_time += time.perf_counter() - start_time
+                break
+            candidates_list = detect_frames(
+                detector,
+                [buffer.image for buffer in frames],
+                frame_index,
+                detection_cache,
+            )
+            frame_index += len(frames)
+            shared_time += time.perf_counter() - start_time
+
+            for buffer, candidates in zip(frames, candidates_list):
+                for i, processor in enumerate(processors):
+                    start_time = time.perf_counter()
+                    state = processor.process_frame(buffer.image, candidates)
+                    tracker_times[i] += time.perf_counter() - start_time
+                    if not is_rendered:
+                        continue
+
+                    # Each tracker draws on its own copy of the frame. The copy is
+                    # not timed since a standalone run draws on the decoded frame.
+                    tracker_canvas = tracker_canvases[i]
+                    np.copyto(tracker_canvas, buffer.canvas)
+
+                    start_time = time.perf_counter()
+                    renderer.render(tracker_canvas, state)
+                    video_writers[i].write(tracker_canvas)
+                    tracker_times[i] += time.perf_counter() - start_time
+
+        if detection_cache is not None:
+            detection_cache.save()
+
+        results = []
+        for i, processor in enumerate(processors):
+            start_time = time.perf_counter()
+            if video_writers:
+                video_writers[i].release()
+            processor.finish()
+            if output_mode == output_constants.OUTPUT_TRAJECTORY:
+                write_trajectory_csv(
+                    output_files[i],
+                    processor.detected_trajectory,
+                    processor.tracked_trajectory,
+                )
+            tracker_times[i] += time.perf_counter() - start_time
+
+            elapsed_time = shared_time + tracker_times[i]
+            logger.info(
+                "Processed %s frames with %s in %ss (%ss shared). FPS: %s",
+                processor.frame_index,
+                get_tracker_name(processor.tracker_type, processor.tracking_scale),
+                elapsed_time,
+                shared_time,
+                processor.frame_index / elapsed_time,
+            )
+            results.append(
+                Process_Result(
+                    input_path=input_file,
+                    output_path=output_files[i],
+                    tracker_type=processor.tracker_type,
+                    input_fps=input_fps,
+                    frame_count=processor.frame_index,
+                    processing_time=elapsed_time,
+                    detected_frame_count=processor.detected_frames_count,
+                    tracked_frame_count=processor.tracked_frames_count,
+                    tracking_missed_count=processor.tracking_missed_count,
+                    detected_trajectory=processor.detected_trajectory,
+                    tracked_trajectory=processor.tracked_trajectory,
+                    shared_processing_time=shared_time,
+                    frame_latencies=np.asarray(processor.frame_latencies),
+                    detection_call_count=processor.detection_calls_count,
+                    tracking_call_count=processor.tracking_calls_count,
+                    correction_call_count=processor.correction_calls_count,
+                    tracker_reinit_count=processor.reinit_count,
+                    correction_time=processor.correction_time,
+                    tracking_scale=processor.tracking_scale,
+                    stage_stats=profilers[i].summary(),
+                )
+            )
+        return results
+    finally:
+        cap.release()
+        # Releasing a writer again is a no-op.
+        for video_writer in video_writers:
+            video_writer.release()
@@ -1,11 +1,19 @@
 from pathlib import Path
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.processor.trajectory import Trajectory
+from src.utils.profiler import Stage_Stats
 
 
 @dataclass
 class Process_Result:
     input_path: Path
-    output_path: Path
+    # The video or trajectory file written, if any.
+    output_path: Optional[Path]
     tracker_type: str
     input_fps: float
     frame_count: int
@@ -13,5 +21,67 @@ class Process_Result:
     detected_frame_count: int
     tracked_frame_count: int
     tracking_missed_count: int
-    detected_bbox_list: list
-    tracked_bbox_list: list
+    # One row per frame. Frames that were not detected are marked as skipped.
+    detected_trajectory: Trajectory
+    # One row per frame.
+    tracked_trajectory: Trajectory
+    # Time included in `processing_time` that was shared with other trackers
+    # evaluated in the same pass, e.g. decoding and detection.
+    shared_processing_time: float = 0.0
+    # Seconds spent processing each frame, excluding decoding, batched detection and rendering.
+    frame_latencies: np.ndarray = field(
+        default_factory=lambda: np.empty(0, dtype=np.float64)
+    )
+    # The number of frames detected, whether or not a ball was found.
+    detection_call_count: int = 0
+    # The number of tracker updates.
+    tracking_call_count: int = 0
+    # The detections given to an existing tracker, and those it was re-initialised on.
+    correction_call_count: int = 0
+    tracker_reinit_count: int = 0
+    # Seconds spent correcting the tracker with detections.
+    correction_time: float = 0.0
+    # The scheduled detections skipped by the motion gate because nothing moved,
+    # i.e. the detector calls it saved.
+    motion_skipped_detection_count: int = 0
+    # The scale of the frames the tracker worked on, see `Base_Tracker`.
+    tracking_scale: float = 1.0
+    # The calls and latency of each stage, see `profiler.STAGE_`. Empty unless profiled.
+    stage_stats: Dict[str, Stage_Stats] = field(default_factory=dict)
+    # The trajectory of each confirmed ball in multi-ball mode, by track id, from
+    # the frame it was confirmed until it was removed. Empty otherwise.
+    ball_trajectories: Dict[int, Trajectory] = field(default_factory=dict)
+    # The streaming trajectory export, if any, see `Trajectory_Exporter`.
+    export_path: Optional[Path] = None
+
+    @property
+    def detected_bbox_list(self) -> list:
+        """
+        The detected boundaries of the frames that were detected, `None` if nothing was found.
+        """
+        return self.detected_trajectory.to_bbox_list(include_skipped=False)
+
+    @property
+    def tracked_bbox_list(self) -> list:
+        """
+        The tracked boundaries of every frame, `None` if the ball was not tracked.
+        """
+        return self.tracked_trajectory.to_bbox_list()
+
+
+@dataclass
+class Frame_State:
+    """
+    Frame_State is the outcome of processing one frame, in the coordinates of
+    the source video. It is all the rendering stage needs to annotate the frame.
+    """
+
+    frame_index: int
+    # The stage the frame ended in, "TRACK" or "DETECT", or None before the first detection.
+    stage: Optional[str]
+    tracked_boundary: Optional[Tuple[int, int, int, int]]
+    detected_boundary: Optional[Tuple[int, int, int, int]]
+    # Whether no soccer ball has been found since the start of the video.
+    is_ball_lost: bool
+    # In multi-ball mode, the boundaries of the balls other than the primary ball.
+    other_ball_boundaries: List[Tuple[int, int, int, int]] = field(default_factory=list)
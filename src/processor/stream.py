@@ -0,0 +1,376 @@
+from pathlib import Path
+from dataclasses import dataclass
+from logger import logger
+import queue
+import threading
+import time
+
+from typing import AsyncIterator, Iterable, Iterator, Optional, Union
+
+import cv2
+import numpy as np
+
+from src.detector.roi_detection import ROI_Options
+from src.detector.model_registry import warm_up_detector
+from src.detector.soccer_ball_detector import Soccer_Ball_Detector
+from src.processor.detection_scheduler import Scheduler_Options
+from src.processor.frame_processor import Frame_Processor
+from src.processor.motion_gate import Motion_Options
+from src.processor.result import Frame_State
+from src.processor.trajectory_exporter import Export_Options, Trajectory_Exporter
+import src.tracker.tracker_constants as tracker_constants
+from src.tracker.auto_tracker import Auto_Options
+from src.tracker.kalman_tracker import Kalman_Options
+from src.tracker.multi_ball_tracker import Multi_Ball_Options
+
+# What to do with frames when processing falls behind the latency budget.
+# Never drop frames: the source waits for processing, e.g. for files.
+DROP_NONE = "none"
+# Skip the frames older than the latency budget while a newer frame is waiting.
+DROP_LATE = "late"
+# As DROP_LATE, and the source does not wait for late frames: when the queue is
+# full, the oldest queued frame is dropped once it is older than the latency
+# budget. For live feeds that must be drained in real time. Without a latency
+# budget, no frame is dropped.
+DROP_OLDEST = "oldest"
+
+DROP_POLICIES_ALL = [DROP_NONE, DROP_LATE, DROP_OLDEST]
+
+# The frame rate assumed for sources that do not report one, e.g. frame iterators.
+DEFAULT_STREAM_FPS = 30.0
+
+# Marks the end of the frames in the queue.
+_END_OF_STREAM = None
+
+# How often a blocked reader re-checks whether the stream was stopped, in seconds.
+_POLL_INTERVAL = 0.1
+
+Stream_Source = Union[Path, str, int, Iterable[np.ndarray]]
+
+
+@dataclass
+class Stream_Options:
+    """
+    Stream_Options tunes how frames flow from the source to processing.
+    """
+
+    # The most seconds a frame may wait between being read and being processed.
+    # `None` for no budget.
+    latency_budget: Optional[float] = None
+    drop_policy: str = DROP_LATE
+    # The frames read ahead of processing.
+    queue_size: int = 4
+    # Whether to read a file or iterator source at its frame rate, as if it was
+    # live. Devices and URLs are always read as fast as they deliver frames.
+    is_real_time: bool = False
+    # The frame rate of the source, if it does not report one.
+    fps: Optional[float] = None
+
+
+@dataclass
+class Stream_Frame:
+    """
+    Stream_Frame is the outcome of processing one frame of a stream.
+    """
+
+    # The index of the frame in the source, counting the dropped frames.
+    frame_index: int
+    # The source frame, not annotated, see `Frame_Renderer`.
+    frame: np.ndarray
+    state: Frame_State
+    # When the frame was read from the source, from `time.perf_counter`.
+    capture_time: float
+    # Seconds between reading the frame and the end of its processing.
+    latency: float
+    # The frames dropped since the start of the stream.
+    dropped_frame_count: int
+
+
+def is_live_source(source: Stream_Source) -> bool:
+    """
+    is_live_source returns whether the source is a camera device or a network URL,
+    which deliver frames in real time.
+    """
+    return isinstance(source, int) or (isinstance(source, str) and "://" in source)
+
+
+class Frame_Source:
+    """
+    Frame_Source reads frames from a video file, a camera device index, a URL
+    (e.g. RTSP) or an iterator of frames already decoded elsewhere.
+    """
+
+    def __init__(self, source: Stream_Source, fps: Optional[float] = None):
+        self.is_live = is_live_source(source)
+        self.cap = None
+        self.frames = None
+        if isinstance(source, (Path, str, int)):
+            self.cap = cv2.VideoCapture(
+                str(source) if isinstance(source, Path) else source
+            )
+            if not self.cap.isOpened():
+                logger.error("Unable to open the stream %s", source)
+                raise FileNotFoundError(f"Unable to open the stream {source}")
+            if fps is None:
+                fps = self.cap.get(cv2.CAP_PROP_FPS)
+        else:
+            self.frames = iter(source)
+        self.fps = fps if fps else DEFAULT_STREAM_FPS
+
+    def read(self) -> Optional[np.ndarray]:
+        """
+        read returns the next frame, or `None` at the end of the source.
+        """
+        if self.cap is not None:
+            has_frame, frame = self.cap.read()
+            return frame if has_frame else None
+        return next(self.frames, None)
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+class Stream_Reader(threading.Thread):
+    """
+    Stream_Reader reads the frames of the source on its own thread and hands them
+    over with their index and capture time through a bounded queue.
+    """
+
+    def __init__(self, frame_source: Frame_Source, options: Stream_Options):
+        super().__init__(name="Stream_Reader", daemon=True)
+        self.frame_source = frame_source
+        self.options = options
+        self.frames = queue.Queue(maxsize=max(1, options.queue_size))
+        self.stop_event = threading.Event()
+        self.error = None
+        # The frames dropped by the reader because the queue was full.
+        self.dropped_frame_count = 0
+        self.can_drop_oldest = (
+            options.drop_policy == DROP_OLDEST and options.latency_budget is not None
+        )
+
+    def run(self):
+        is_paced = self.options.is_real_time and not self.frame_source.is_live
+        start_time = time.perf_counter()
+        frame_index = 0
+        try:
+            while not self.stop_event.is_set():
+                if is_paced:
+                    delay = start_time + frame_index / self.frame_source.fps
+                    delay -= time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                frame = self.frame_source.read()
+                if frame is None:
+                    break
+                self._put((frame_index, time.perf_counter(), frame))
+                frame_index += 1
+        except Exception as error:
+            self.error = error
+        finally:
+            self._put(_END_OF_STREAM, can_drop=False)
+
+    def _put(self, item, can_drop: bool = True):
+        can_drop = can_drop and self.can_drop_oldest
+        timeout = 0.0 if can_drop else _POLL_INTERVAL
+        while not self.stop_event.is_set():
+            try:
+                self.frames.put(item, timeout=timeout)
+                return
+            except queue.Full:
+                if can_drop:
+                    timeout = min(_POLL_INTERVAL, self._drop_late_frame())
+
+    def _drop_late_frame(self) -> float:
+        """
+        _drop_late_frame drops the oldest queued frame if it is older than the
+        latency budget. Returns the seconds until it will be, 0 if it was dropped.
+        """
+        with self.frames.mutex:
+            if len(self.frames.queue) == 0:
+                return 0.0
+            _, capture_time, _ = self.frames.queue[0]
+            wait_time = capture_time + self.options.latency_budget - time.perf_counter()
+            if wait_time > 0:
+                return wait_time
+            self.frames.queue.popleft()
+            self.frames.not_full.notify()
+        self.dropped_frame_count += 1
+        return 0.0
+
+    def get(self):
+        """
+        get returns the next (frame index, capture time, frame), blocking until
+        it is available, or `None` at the end of the source.
+        """
+        item = self.frames.get()
+        if item is _END_OF_STREAM and self.error is not None:
+            raise self.error
+        return item
+
+    def stop(self):
+        """
+        stop stops reading and waits for the thread to finish.
+        """
+        self.stop_event.set()
+        self.join()
+
+
+def process_stream(
+    source: Stream_Source,
+    tracker_type: str = tracker_constants.TRACKER_MOSSE,
+    detector: Optional[Soccer_Ball_Detector] = None,
+    options: Optional[Stream_Options] = None,
+    detection_interval: int = 10,
+    miss_threshold: int = 5,
+    roi_options: Optional[ROI_Options] = None,
+    scheduler_options: Optional[Scheduler_Options] = None,
+    kalman_options: Optional[Kalman_Options] = None,
+    multi_ball_options: Optional[Multi_Ball_Options] = None,
+    motion_options: Optional[Motion_Options] = None,
+    tracking_scale: float = 1.0,
+    export_file: Optional[Path] = None,
+    export_options: Optional[Export_Options] = None,
+    auto_options: Optional[Auto_Options] = None,
+) -> Iterator[Stream_Frame]:
+    """
+    process_stream detects and tracks the soccer ball in the frames of any source
+    and yields the outcome of each frame as soon as it is processed. Nothing is
+    written; render or store the yielded frames as needed.
+
+    With a latency budget, frames that waited longer than the budget are dropped
+    while a newer frame is waiting, so that processing catches up with the source.
+
+    :param source: A video file, a camera device index, a URL or an iterable of BGR frames.
+    :type source: Stream_Source
+    :param tracker_type: Type of tracker to use for tracking
+    :type tracker_type: str
+    :param detector: The detector to use. The default OpenCV CPU detector of the
+    process is loaded and warmed up if not provided, see `model_registry`.
+    :type detector: Optional[Soccer_Ball_Detector]
+    :param options: How frames flow from the source, e.g. the latency budget.
+    :type options: Optional[Stream_Options]
+    :param detection_interval: The frames count after which the app should re-detect
+    :type detection_interval: int
+    :param miss_threshold: The max number of missed tracker predictions after
+    which the app should re-detect the soccer ball
+    :type miss_threshold: int
+    :param roi_options: See `process_video`.
+    :type roi_options: Optional[ROI_Options]
+    :param scheduler_options: See `process_video`.
+    :type scheduler_options: Optional[Scheduler_Options]
+    :param kalman_options: See `process_video`.
+    :type kalman_options: Optional[Kalman_Options]
+    :param multi_ball_options: See `process_video`.
+    :type multi_ball_options: Optional[Multi_Ball_Options]
+    :param motion_options: See `process_video`.
+    :type motion_options: Optional[Motion_Options]
+    :param tracking_scale: See `process_video`.
+    :type tracking_scale: float
+    :param export_file: See `process_video`. The dropped frames are not exported.
+    Set `keep_trajectories=False` in the options so that a long-running stream
+    does not grow in memory.
+    :type export_file: Optional[Path]
+    :param export_options: See `process_video`.
+    :type export_options: Optional[Export_Options]
+    :param auto_options: See `process_video`.
+    :type auto_options: Optional[Auto_Options]
+    """
+    if options is None:
+        options = Stream_Options()
+    if options.drop_policy not in DROP_POLICIES_ALL:
+        raise ValueError(f"Unknown drop policy {options.drop_policy}")
+    if detector is None:
+        detector = warm_up_detector()
+
+    frame_source = Frame_Source(source, options.fps)
+    trajectory_exporter = None
+    if export_file is not None:
+        trajectory_exporter = Trajectory_Exporter(
+            export_file, frame_source.fps, export_options
+        )
+    processor = Frame_Processor(
+        tracker_type=tracker_type,
+        detector=detector,
+        input_fps=frame_source.fps,
+        detection_interval=detection_interval,
+        miss_threshold=miss_threshold,
+        roi_options=roi_options,
+        scheduler_options=scheduler_options,
+        kalman_options=kalman_options,
+        multi_ball_options=multi_ball_options,
+        motion_options=motion_options,
+        tracking_scale=tracking_scale,
+        trajectory_exporter=trajectory_exporter,
+        auto_options=auto_options,
+    )
+    reader = Stream_Reader(frame_source, options)
+    reader.start()
+
+    can_drop_late = (
+        options.latency_budget is not None and options.drop_policy != DROP_NONE
+    )
+    processed_frame_count = 0
+    late_frame_count = 0
+    try:
+        while True:
+            item = reader.get()
+            if item is _END_OF_STREAM:
+                break
+
+            frame_index, capture_time, frame = item
+            if (
+                can_drop_late
+                and time.perf_counter() - capture_time > options.latency_budget
+                and not reader.frames.empty()
+            ):
+                late_frame_count += 1
+                continue
+
+            # The trajectories are indexed by the frames of the source, while the
+            # detections are scheduled on the processed frames.
+            processor.frame_index = frame_index
+            state = processor.process_frame(frame)
+            processed_frame_count += 1
+            yield Stream_Frame(
+                frame_index=frame_index,
+                frame=frame,
+                state=state,
+                capture_time=capture_time,
+                latency=time.perf_counter() - capture_time,
+                dropped_frame_count=late_frame_count + reader.dropped_frame_count,
+            )
+    finally:
+        reader.stop()
+        frame_source.release()
+        processor.finish()
+        if trajectory_exporter is not None:
+            trajectory_exporter.close()
+        logger.info(
+            "Stream processed %s frames, dropped %s",
+            processed_frame_count,
+            late_frame_count + reader.dropped_frame_count,
+        )
+
+
+async def process_stream_async(
+    source: Stream_Source, *args, **kwargs
+) -> AsyncIterator[Stream_Frame]:
+    """
+    process_stream_async is `process_stream` as an async iterator. The frames are
+    processed on a worker thread, so the event loop is not blocked.
+    The arguments are the ones of `process_stream`.
+    """
+    # asyncio is only imported by the async callers, for a fast startup.
+    import asyncio
+
+    stream = process_stream(source, *args, **kwargs)
+    try:
+        while True:
+            stream_frame = await asyncio.to_thread(next, stream, None)
+            if stream_frame is None:
+                break
+            yield stream_frame
+    finally:
+        stream.close()
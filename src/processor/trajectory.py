@@ -0,0 +1,202 @@
+from pathlib import Path
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Where the boundary of a frame comes from.
+# The frame was not detected, e.g. between scheduled detections.
+SOURCE_SKIPPED = 0
+# The frame was detected or tracked, but no soccer ball was found.
+SOURCE_MISSED = 1
+SOURCE_TRACKED = 2
+SOURCE_DETECTED = 3
+
+_INITIAL_CAPACITY = 1024
+
+
+class Trajectory:
+    """
+    Trajectory stores one boundary per frame in growable NumPy columns:
+    the frame index, the (x, y, width, height) box, the confidence and the source.
+    Frames without a boundary have a NaN box and are excluded by `valid`.
+    """
+
+    def __init__(self, capacity: int = _INITIAL_CAPACITY):
+        capacity = max(1, capacity)
+        self._frame_index = np.zeros(capacity, dtype=np.int64)
+        self._boxes = np.full((capacity, 4), np.nan, dtype=np.float32)
+        self._confidence = np.full(capacity, np.nan, dtype=np.float32)
+        self._source = np.zeros(capacity, dtype=np.int8)
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __repr__(self) -> str:
+        return f"Trajectory(frames={len(self)}, valid={int(self.valid.sum())})"
+
+    def _grow(self):
+        capacity = max(_INITIAL_CAPACITY, 2 * len(self._source))
+        for name in ["_frame_index", "_boxes", "_confidence", "_source"]:
+            column = getattr(self, name)
+            grown = np.empty((capacity,) + column.shape[1:], dtype=column.dtype)
+            grown[: self._length] = column[: self._length]
+            setattr(self, name, grown)
+
+    def append(
+        self,
+        frame_index: int,
+        boundary: Optional[Sequence[float]],
+        source: int,
+        confidence: float = np.nan,
+    ):
+        """
+        append adds the boundary of the next frame.
+
+        :param frame_index: The index of the frame.
+        :type frame_index: int
+        :param boundary: The (x, y, width, height) boundary, or `None` if there is none.
+        :type boundary: Optional[Sequence[float]]
+        :param source: Where the boundary comes from, one of the `SOURCE_` constants.
+        :type source: int
+        :param confidence: The confidence of the boundary, if known.
+        :type confidence: float
+        """
+        if self._length == len(self._source):
+            self._grow()
+
+        i = self._length
+        self._frame_index[i] = frame_index
+        self._boxes[i] = boundary if boundary is not None else np.nan
+        self._confidence[i] = confidence
+        self._source[i] = source
+        self._length += 1
+
+    def clear(self):
+        """
+        clear removes every frame and keeps the allocated columns, so a trajectory
+        that is cleared regularly stays at the same size.
+        """
+        self._length = 0
+
+    @property
+    def frame_index(self) -> np.ndarray:
+        return self._frame_index[: self._length]
+
+    @property
+    def boxes(self) -> np.ndarray:
+        return self._boxes[: self._length]
+
+    @property
+    def confidence(self) -> np.ndarray:
+        return self._confidence[: self._length]
+
+    @property
+    def source(self) -> np.ndarray:
+        return self._source[: self._length]
+
+    @property
+    def valid(self) -> np.ndarray:
+        """
+        valid is the mask of the frames that have a boundary.
+        """
+        return self.source >= SOURCE_TRACKED
+
+    def to_bbox_list(self, include_skipped: bool = True) -> List[Optional[Tuple]]:
+        """
+        to_bbox_list returns the boundaries as a list of tuples, with `None` for
+        the frames without a boundary.
+
+        :param include_skipped: Whether to include the frames that were skipped.
+        :type include_skipped: bool
+        """
+        rows = np.flatnonzero(
+            np.ones(len(self), dtype=bool)
+            if include_skipped
+            else self.source != SOURCE_SKIPPED
+        )
+        valid = self.valid
+        return [
+            tuple(self.boxes[i].tolist()) if valid[i] else None for i in rows.tolist()
+        ]
+
+    def save(self, path: Path):
+        """
+        save writes the trajectory to an uncompressed `.npz` file or, for any other
+        path, to a directory with one `.npy` file per column that can be memory-mapped.
+
+        :param path: The file or directory to write.
+        :type path: Path
+        """
+        path = Path(path)
+        columns = {
+            "frame_index": self.frame_index,
+            "boxes": self.boxes,
+            "confidence": self.confidence,
+            "source": self.source,
+        }
+        if path.suffix == ".npz":
+            np.savez(path, **columns)
+            return
+
+        path.mkdir(parents=True, exist_ok=True)
+        for name, column in columns.items():
+            np.save(path / f"{name}.npy", column)
+
+    @classmethod
+    def load(cls, path: Path, mmap_mode: Optional[str] = None) -> "Trajectory":
+        """
+        load reads a trajectory written by `save`.
+
+        :param path: The file or directory to read.
+        :type path: Path
+        :param mmap_mode: For a directory, the mode in which the columns are
+        memory-mapped instead of read, e.g. "r".
+        :type mmap_mode: Optional[str]
+        """
+        path = Path(path)
+        names = ["frame_index", "boxes", "confidence", "source"]
+        if path.suffix == ".npz":
+            with np.load(path) as data:
+                return cls.from_arrays(*(data[name] for name in names))
+
+        return cls.from_arrays(
+            *(np.load(path / f"{name}.npy", mmap_mode=mmap_mode) for name in names)
+        )
+
+    @classmethod
+    def from_arrays(
+        cls,
+        frame_index: np.ndarray,
+        boxes: np.ndarray,
+        confidence: np.ndarray,
+        source: np.ndarray,
+    ) -> "Trajectory":
+        """
+        from_arrays makes a trajectory from its columns, without copying them.
+        """
+        trajectory = cls(capacity=1)
+        trajectory._frame_index = frame_index
+        trajectory._boxes = boxes
+        trajectory._confidence = confidence
+        trajectory._source = source
+        trajectory._length = len(source)
+        return trajectory
+
+    @classmethod
+    def concatenate(cls, trajectories: Sequence["Trajectory"]) -> "Trajectory":
+        """
+        concatenate joins trajectories of consecutive parts of a video.
+
+        :param trajectories: The trajectories, in order.
+        :type trajectories: Sequence[Trajectory]
+        """
+        if len(trajectories) == 0:
+            return cls()
+        return cls.from_arrays(
+            np.concatenate([t.frame_index for t in trajectories]),
+            np.concatenate([t.boxes for t in trajectories]),
+            np.concatenate([t.confidence for t in trajectories]),
+            np.concatenate([t.source for t in trajectories]),
+        )
@@ -0,0 +1,384 @@
+from pathlib import Path
+from dataclasses import dataclass
+import csv
+import json
+import math
+import os
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import src.processor.trajectory as trajectory
+from src.processor.trajectory import Trajectory
+from src.tracker.tracker_health import Tracker_Health
+
+# The formats of a trajectory export.
+# One JSON record per line.
+EXPORT_JSONL = "JSONL"
+EXPORT_CSV = "CSV"
+# A directory with one appendable `.npy` file per column, which can be
+# memory-mapped and range-read while it is being written, see `read_export_window`.
+EXPORT_BINARY = "BINARY"
+
+EXPORT_FORMATS_ALL = [EXPORT_JSONL, EXPORT_CSV, EXPORT_BINARY]
+
+EXPORT_VERSION = 2
+
+# The signals of `Tracker_Health` exported for every frame, `NaN` or empty when
+# the tracker cannot measure them or there is no tracker.
+TRACKER_HEALTH_COLUMNS = ["appearance_score", "innovation", "uncertainty"]
+
+EXPORT_CSV_COLUMNS = [
+    "frame_index",
+    "timestamp",
+    "tracked_x",
+    "tracked_y",
+    "tracked_width",
+    "tracked_height",
+    "tracked_source",
+    "tracked_confidence",
+    "detected_x",
+    "detected_y",
+    "detected_width",
+    "detected_height",
+    "detected_source",
+    "detected_confidence",
+    *TRACKER_HEALTH_COLUMNS,
+]
+
+# The name of each source in the JSONL and CSV exports.
+SOURCE_NAMES = {
+    trajectory.SOURCE_SKIPPED: "skipped",
+    trajectory.SOURCE_MISSED: "missed",
+    trajectory.SOURCE_TRACKED: "tracked",
+    trajectory.SOURCE_DETECTED: "detected",
+}
+
+# The size of the header of the appendable `.npy` files. It is rewritten with the
+# row count after every chunk, so it is padded to a fixed size.
+_NPY_HEADER_SIZE = 128
+_METADATA_FILE = "metadata.json"
+_TRAJECTORY_COLUMNS = ["frame_index", "boxes", "confidence", "source"]
+
+
+@dataclass
+class Export_Options:
+    """
+    Export_Options tunes the streaming trajectory export.
+    """
+
+    # One of `EXPORT_FORMATS_ALL`. By default, JSONL for a ".jsonl" path, CSV for
+    # a ".csv" path and binary for any other path, which is a directory.
+    format: Optional[str] = None
+    # The frames written at once. Readers see the export grow by whole chunks.
+    chunk_size: int = 256
+    # Whether the result also keeps the trajectories in memory. If not, the rows
+    # are dropped once exported, so memory stays flat however long the video is,
+    # and the trajectories of the result only hold the rows of the last chunk.
+    keep_trajectories: bool = True
+
+
+def get_export_format(path: Path) -> str:
+    """
+    get_export_format returns the format of an export from the suffix of its path.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == ".jsonl":
+        return EXPORT_JSONL
+    if suffix == ".csv":
+        return EXPORT_CSV
+    return EXPORT_BINARY
+
+
+def _optional_float(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+def get_health_row(health: Optional[Tracker_Health]) -> Tuple[float, ...]:
+    """
+    get_health_row returns the `TRACKER_HEALTH_COLUMNS` of the tracker health of
+    a frame, `NaN` for the signals that are `None` or if there is no tracker.
+    """
+    if health is None:
+        health = Tracker_Health()
+    return tuple(
+        math.nan if value is None else float(value)
+        for value in (getattr(health, column) for column in TRACKER_HEALTH_COLUMNS)
+    )
+
+
+class _Npy_Appender:
+    """
+    _Npy_Appender writes a `.npy` file one chunk of rows at a time. The header
+    is rewritten after the rows of each chunk, so a reader that loads the file at
+    any time sees whole rows only.
+    """
+
+    def __init__(self, path: Path, dtype: np.dtype, row_shape: Tuple[int, ...] = ()):
+        self.dtype = np.dtype(dtype)
+        self.row_shape = row_shape
+        self.row_count = 0
+        self.file = open(path, "wb")
+        self._write_header()
+
+    def _write_header(self):
+        header = {
+            "descr": np.lib.format.dtype_to_descr(self.dtype),
+            "fortran_order": False,
+            "shape": (self.row_count, *self.row_shape),
+        }
+        # The magic string, the version and the length of the header come first.
+        header_length = _NPY_HEADER_SIZE - 10
+        header_text = repr(header).ljust(header_length - 1) + "\n"
+        self.file.seek(0)
+        self.file.write(np.lib.format.magic(1, 0))
+        self.file.write(header_length.to_bytes(2, "little"))
+        self.file.write(header_text.encode("latin1"))
+        self.file.flush()
+
+    def append(self, rows: np.ndarray):
+        self.file.seek(0, os.SEEK_END)
+        self.file.write(np.ascontiguousarray(rows, dtype=self.dtype).tobytes())
+        self.file.flush()
+        self.row_count += len(rows)
+        self._write_header()
+
+    def close(self):
+        self.file.close()
+
+
+class Trajectory_Exporter:
+    """
+    Trajectory_Exporter writes the detected and tracked boundary of every frame as
+    it is processed, one chunk at a time. Each record holds the frame index, its
+    timestamp, the tracked and detected boxes with their sources and confidences,
+    and the health of the tracker. Only the current chunk is held in memory.
+    """
+
+    def __init__(
+        self, path: Path, fps: float, options: Optional[Export_Options] = None
+    ):
+        """
+        :param path: The export file or, for the binary format, directory.
+        :type path: Path
+        :param fps: The frame rate of the video, to timestamp the frames.
+        :type fps: float
+        :param options: How to export.
+        :type options: Optional[Export_Options]
+        """
+        self.path = Path(path)
+        self.fps = fps
+        self.options = options if options is not None else Export_Options()
+        self.format = self.options.format or get_export_format(self.path)
+        if self.format not in EXPORT_FORMATS_ALL:
+            raise ValueError(f"Unknown export format {self.format}")
+        self.row_count = 0
+
+        self.file = None
+        self.csv_writer = None
+        self.appenders: Dict[str, _Npy_Appender] = {}
+        if self.format == EXPORT_BINARY:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self.appenders["timestamp"] = _Npy_Appender(
+                self.path / "timestamp.npy", np.float64
+            )
+            for name in ["tracked", "detected"]:
+                (self.path / name).mkdir(exist_ok=True)
+                for column, dtype, row_shape in [
+                    ("frame_index", np.int64, ()),
+                    ("boxes", np.float32, (4,)),
+                    ("confidence", np.float32, ()),
+                    ("source", np.int8, ()),
+                ]:
+                    self.appenders[f"{name}/{column}"] = _Npy_Appender(
+                        self.path / name / f"{column}.npy", dtype, row_shape
+                    )
+            (self.path / "health").mkdir(exist_ok=True)
+            for column in TRACKER_HEALTH_COLUMNS:
+                self.appenders[f"health/{column}"] = _Npy_Appender(
+                    self.path / "health" / f"{column}.npy", np.float32
+                )
+            self._write_metadata()
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.file = open(self.path, "w", newline="")
+            if self.format == EXPORT_CSV:
+                self.csv_writer = csv.writer(self.file)
+                self.csv_writer.writerow(EXPORT_CSV_COLUMNS)
+                self.file.flush()
+
+    def write(
+        self,
+        detected_trajectory: Trajectory,
+        tracked_trajectory: Trajectory,
+        start: int = 0,
+        health_rows: Optional[np.ndarray] = None,
+    ):
+        """
+        write exports the rows of the trajectories from `start` on. The two
+        trajectories must have one row per frame, for the same frames.
+
+        :param detected_trajectory: The detected boundaries.
+        :type detected_trajectory: Trajectory
+        :param tracked_trajectory: The tracked boundaries.
+        :type tracked_trajectory: Trajectory
+        :param start: The first row to export.
+        :type start: int
+        :param health_rows: The (N, 3) tracker health of the exported rows, see
+        `get_health_row`. `NaN` if not provided.
+        :type health_rows: Optional[np.ndarray]
+        """
+        frame_index = tracked_trajectory.frame_index[start:]
+        if len(frame_index) == 0:
+            return
+        if health_rows is None:
+            health_rows = np.full(
+                (len(frame_index), len(TRACKER_HEALTH_COLUMNS)), np.nan, np.float32
+            )
+        timestamp = frame_index / self.fps
+        columns = {
+            "frame_index": frame_index,
+            "timestamp": timestamp,
+            "tracked_boxes": tracked_trajectory.boxes[start:],
+            "tracked_source": tracked_trajectory.source[start:],
+            "tracked_confidence": tracked_trajectory.confidence[start:],
+            "detected_boxes": detected_trajectory.boxes[start:],
+            "detected_source": detected_trajectory.source[start:],
+            "detected_confidence": detected_trajectory.confidence[start:],
+            **{
+                column: health_rows[:, i]
+                for i, column in enumerate(TRACKER_HEALTH_COLUMNS)
+            },
+        }
+        if self.format == EXPORT_BINARY:
+            self._write_binary(columns)
+        elif self.format == EXPORT_CSV:
+            self._write_csv(columns)
+        else:
+            self._write_jsonl(columns)
+        self.row_count += len(frame_index)
+
+    def _write_jsonl(self, columns: Dict[str, np.ndarray]):
+        lines = []
+        for i in range(len(columns["frame_index"])):
+            tracked_box = columns["tracked_boxes"][i]
+            detected_box = columns["detected_boxes"][i]
+            record = {
+                "frame_index": int(columns["frame_index"][i]),
+                "timestamp": float(columns["timestamp"][i]),
+                "tracked": (None if np.isnan(tracked_box[0]) else tracked_box.tolist()),
+                "tracked_source": SOURCE_NAMES[int(columns["tracked_source"][i])],
+                "tracked_confidence": _optional_float(
+                    float(columns["tracked_confidence"][i])
+                ),
+                "detected": (
+                    None if np.isnan(detected_box[0]) else detected_box.tolist()
+                ),
+                "detected_source": SOURCE_NAMES[int(columns["detected_source"][i])],
+                "detected_confidence": _optional_float(
+                    float(columns["detected_confidence"][i])
+                ),
+                **{
+                    column: _optional_float(float(columns[column][i]))
+                    for column in TRACKER_HEALTH_COLUMNS
+                },
+            }
+            lines.append(json.dumps(record) + "\n")
+        self.file.writelines(lines)
+        self.file.flush()
+
+    def _write_csv(self, columns: Dict[str, np.ndarray]):
+        rows = []
+        for i in range(len(columns["frame_index"])):
+            rows.append(
+                [
+                    int(columns["frame_index"][i]),
+                    f"{columns['timestamp'][i]:.6f}",
+                    *(f"{value:.6g}" for value in columns["tracked_boxes"][i]),
+                    SOURCE_NAMES[int(columns["tracked_source"][i])],
+                    f"{columns['tracked_confidence'][i]:.6g}",
+                    *(f"{value:.6g}" for value in columns["detected_boxes"][i]),
+                    SOURCE_NAMES[int(columns["detected_source"][i])],
+                    f"{columns['detected_confidence'][i]:.6g}",
+                    *(f"{columns[column][i]:.6g}" for column in TRACKER_HEALTH_COLUMNS),
+                ]
+            )
+        self.csv_writer.writerows(rows)
+        self.file.flush()
+
+    def _write_binary(self, columns: Dict[str, np.ndarray]):
+        self.appenders["timestamp"].append(columns["timestamp"])
+        for name in ["tracked", "detected"]:
+            self.appenders[f"{name}/frame_index"].append(columns["frame_index"])
+            self.appenders[f"{name}/boxes"].append(columns[f"{name}_boxes"])
+            self.appenders[f"{name}/confidence"].append(columns[f"{name}_confidence"])
+            self.appenders[f"{name}/source"].append(columns[f"{name}_source"])
+        for column in TRACKER_HEALTH_COLUMNS:
+            self.appenders[f"health/{column}"].append(columns[column])
+        # The metadata is written last, so its row count is always complete.
+        self._write_metadata(self.row_count + len(columns["frame_index"]))
+
+    def _write_metadata(self, row_count: int = 0):
+        metadata_file = self.path / _METADATA_FILE
+        temporary_file = metadata_file.with_suffix(".tmp")
+        with open(temporary_file, "w") as file:
+            json.dump(
+                {"version": EXPORT_VERSION, "fps": self.fps, "row_count": row_count},
+                file,
+            )
+        os.replace(temporary_file, metadata_file)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        for appender in self.appenders.values():
+            appender.close()
+
+
+def read_export_window(
+    path: Path,
+    start_time: Optional[float] = None,
+    end_time: Optional[float] = None,
+) -> Tuple[Trajectory, Trajectory, np.ndarray, Dict[str, np.ndarray]]:
+    """
+    read_export_window memory-maps a binary export and returns the rows of the
+    frames with a timestamp between `start_time` and `end_time`, inclusive, as
+    the detected and tracked trajectories, the timestamps of the frames and the
+    tracker health by `TRACKER_HEALTH_COLUMNS`. Only the rows of the window are
+    read from disk, and the export may still be being written.
+
+    :param path: The directory of the binary export.
+    :type path: Path
+    :param start_time: The first timestamp of the window, in seconds. From the start if `None`.
+    :type start_time: Optional[float]
+    :param end_time: The last timestamp of the window, in seconds. To the end if `None`.
+    :type end_time: Optional[float]
+    """
+    path = Path(path)
+    with open(path / _METADATA_FILE) as file:
+        row_count = json.load(file)["row_count"]
+
+    timestamp = np.load(path / "timestamp.npy", mmap_mode="r")[:row_count]
+    start = 0 if start_time is None else int(np.searchsorted(timestamp, start_time))
+    end = (
+        row_count
+        if end_time is None
+        else int(np.searchsorted(timestamp, end_time, side="right"))
+    )
+
+    trajectories: List[Trajectory] = []
+    for name in ["detected", "tracked"]:
+        trajectories.append(
+            Trajectory.from_arrays(
+                *(
+                    np.load(path / name / f"{column}.npy", mmap_mode="r")[start:end]
+                    for column in _TRAJECTORY_COLUMNS
+                )
+            )
+        )
+    health = {
+        column: np.load(path / "health" / f"{column}.npy", mmap_mode="r")[start:end]
+        for column in TRACKER_HEALTH_COLUMNS
+    }
+    return trajectories[0], trajectories[1], timestamp[start:end], health
@@ -0,0 +1,57 @@
+from pathlib import Path
+
+import numpy as np
+
+from src.processor.trajectory import Trajectory
+
+TRAJECTORY_COLUMNS = [
+    "frame_index",
+    "tracked_x",
+    "tracked_y",
+    "tracked_width",
+    "tracked_height",
+    "detected_x",
+    "detected_y",
+    "detected_width",
+    "detected_height",
+    "detected_confidence",
+]
+
+
+def write_trajectory_csv(
+    output_file: Path, detected_trajectory: Trajectory, tracked_trajectory: Trajectory
+):
+    """
+    write_trajectory_csv writes the tracked and detected boundaries of every frame
+    to a CSV file. Missing boundaries are written as `nan`.
+
+    :param output_file: The CSV file to write.
+    :type output_file: Path
+    :param detected_trajectory: The detected boundaries, one row per frame.
+    :type detected_trajectory: Trajectory
+    :param tracked_trajectory: The tracked boundaries, one row per frame.
+    :type tracked_trajectory: Trajectory
+    """
+    detected_boxes = np.where(
+        detected_trajectory.valid[:, None], detected_trajectory.boxes, np.nan
+    )
+    tracked_boxes = np.where(
+        tracked_trajectory.valid[:, None], tracked_trajectory.boxes, np.nan
+    )
+    rows = np.column_stack(
+        (
+            tracked_trajectory.frame_index,
+            tracked_boxes,
+            detected_boxes,
+            detected_trajectory.confidence,
+        )
+    )
+    np.savetxt(
+        output_file,
+        rows,
+        # The frame index stays an integer on long videos.
+        fmt=["%d"] + ["%.6g"] * (len(TRAJECTORY_COLUMNS) - 1),
+        delimiter=",",
+        header=",".join(TRAJECTORY_COLUMNS),
+        comments="",
+    )
@@ -0,0 +1,205 @@
+from dataclasses import dataclass, field
+from logger import logger
+import time
+
+from typing import Dict, List, Optional
+
+import src.tracker.tracker_constants as tracker_constants
+from src.tracker.base_tracker import Base_Tracker
+from src.tracker.kalman_tracker import Kalman_Options
+import src.tracker.tracker_registry as tracker_registry
+from src.tracker.tracker_health import Tracker_Health
+from src.utils.boundary_utils import calculate_iou
+
+
+@dataclass
+class Auto_Options:
+    """
+    Auto_Options tunes the automatic selection of the tracker.
+    """
+
+    # The frame rate to keep up with. Defaults to the frame rate of the video,
+    # i.e. real time.
+    fps_budget: Optional[float] = None
+    # The trackers to choose from, see `tracker_registry.get_tracker_types`.
+    tracker_types: List[str] = field(
+        default_factory=lambda: list(tracker_constants.TRACKERS_ALL)
+    )
+    # The ball is stable after this many detections in a row that agreed with
+    # the tracked box. A stable ball is followed by the cheapest tracker.
+    stable_detections: int = 2
+    # A ball narrower or shorter than this many pixels is never stable.
+    min_stable_size: int = 16
+    # The weight of the latest measurement in the running averages of the costs,
+    # and of the agreement with the detections.
+    cost_smoothing: float = 0.1
+    accuracy_smoothing: float = 0.2
+
+
+class Auto_Tracker(Base_Tracker):
+    """
+    Auto_Tracker picks the tracker of the ball at every detection, within a frame
+    rate budget. While the ball is small, occluded or disagrees with the
+    detections, the most accurate tracker that fits in the budget follows it.
+    Once it is stable, the cheapest tracker does.
+
+    The budget left for tracking is the frame period of the budget minus the time
+    spent outside the tracker, measured between updates. The cost and accuracy of
+    each tracker start from its profile, see `tracker_registry`, and follow its
+    measured update times and its IoU with the detections once it has run.
+    """
+
+    def __init__(
+        self,
+        options: Optional[Auto_Options] = None,
+        kalman_options: Optional[Kalman_Options] = None,
+    ):
+        self.options = options if options is not None else Auto_Options()
+        if len(self.options.tracker_types) == 0:
+            raise ValueError("The automatic tracker needs at least one tracker type")
+        self.kalman_options = kalman_options
+
+        self.profiles = {
+            tracker_type: tracker_registry.get_tracker_profile(tracker_type)
+            for tracker_type in self.options.tracker_types
+        }
+        # The running average of the seconds per update of each tracker.
+        self.frame_costs: Dict[str, float] = {
+            tracker_type: profile.frame_cost
+            for tracker_type, profile in self.profiles.items()
+        }
+        # The running average of the IoU of each tracker with the detections, 0 when
+        # it lost the ball.
+        self.accuracies: Dict[str, float] = {
+            tracker_type: profile.accuracy
+            for tracker_type, profile in self.profiles.items()
+        }
+        # The running average of the seconds between two updates.
+        self.frame_period: Optional[float] = None
+        self.last_update_time: Optional[float] = None
+
+        self.tracker: Optional[Base_Tracker] = None
+        self.tracker_type: Optional[str] = None
+        self.fps_budget = self.options.fps_budget
+        # Whether the last update tracked the ball, `None` before the first
+        # update of the current tracker.
+        self.did_track: Optional[bool] = None
+        self.last_bbox = None
+        self.stable_count = 0
+
+        # The updates by each tracker and the switches over the whole run.
+        self.update_counts: Dict[str, int] = {
+            tracker_type: 0 for tracker_type in self.options.tracker_types
+        }
+        self.switch_count = 0
+
+    def init(self, frame, bbox, fps):
+        if self.options.fps_budget is None:
+            self.fps_budget = fps
+        self.stable_count = 0
+        self.switch_tracker(self.select_tracker_type(bbox), frame, bbox, fps)
+
+    def update(self, frame):
+        start_time = time.perf_counter()
+        if self.last_update_time is not None:
+            self.frame_period = self.smooth_cost(
+                self.frame_period, start_time - self.last_update_time
+            )
+        self.last_update_time = start_time
+
+        self.did_track, bbox = self.tracker.update(frame)
+        self.frame_costs[self.tracker_type] = self.smooth_cost(
+            self.frame_costs[self.tracker_type], time.perf_counter() - start_time
+        )
+        self.update_counts[self.tracker_type] += 1
+
+        if self.did_track:
+            self.last_bbox = bbox
+        else:
+            # The ball is occluded or moved too fast for the tracker.
+            self.stable_count = 0
+        return self.did_track, bbox
+
+    def correct(self, frame, bbox, fps) -> bool:
+        if self.did_track is not None:
+            iou = calculate_iou(self.last_bbox, bbox) if self.did_track else 0.0
+            self.accuracies[self.tracker_type] += self.options.accuracy_smoothing * (
+                iou - self.accuracies[self.tracker_type]
+            )
+            if iou >= tracker_constants.CORRECTION_IOU_TOLERANCE:
+                self.stable_count += 1
+            else:
+                self.stable_count = 0
+
+        tracker_type = self.select_tracker_type(bbox)
+        if tracker_type != self.tracker_type:
+            self.switch_tracker(tracker_type, frame, bbox, fps)
+            return True
+        return self.tracker.correct(frame, bbox, fps)
+
+    def get_health(self) -> Tracker_Health:
+        if self.tracker is None:
+            return Tracker_Health()
+        return self.tracker.get_health()
+
+    def smooth_cost(self, average: Optional[float], cost: float) -> float:
+        if average is None:
+            return cost
+        return average + self.options.cost_smoothing * (cost - average)
+
+    def get_tracking_budget(self) -> float:
+        """
+        get_tracking_budget returns the seconds per frame left for the tracker
+        within the frame rate budget.
+        """
+        budget = 1.0 / self.fps_budget if self.fps_budget else float("inf")
+        if self.frame_period is not None and self.tracker_type is not None:
+            budget -= max(0.0, self.frame_period - self.frame_costs[self.tracker_type])
+        return budget
+
+    def select_tracker_type(self, bbox) -> str:
+        """
+        select_tracker_type returns the tracker to follow the ball detected in the
+        box: the cheapest tracker that fits in the budget while the ball is stable,
+        and the most accurate one otherwise. If none fits, the cheapest tracker.
+
+        :param bbox: The (x, y, width, height) box of the detected ball.
+        """
+        budget = self.get_tracking_budget()
+        tracker_types = [
+            tracker_type
+            for tracker_type, cost in self.frame_costs.items()
+            if cost <= budget
+        ]
+        if len(tracker_types) == 0:
+            return min(self.frame_costs, key=self.frame_costs.get)
+
+        is_stable = (
+            self.stable_count >= self.options.stable_detections
+            and min(bbox[2], bbox[3]) >= self.options.min_stable_size
+        )
+        if is_stable:
+            return min(tracker_types, key=lambda t: self.frame_costs[t])
+        return max(
+            tracker_types,
+            key=lambda t: (self.accuracies[t], -self.frame_costs[t]),
+        )
+
+    def switch_tracker(self, tracker_type: str, frame, bbox, fps):
+        """
+        switch_tracker starts following the ball with a new tracker of the type.
+        """
+        if self.tracker is not None:
+            self.switch_count += 1
+        self.tracker = tracker_registry.build_tracker(tracker_type, self.kalman_options)
+        self.tracker.set_tracking_scale(self.tracking_scale)
+        self.tracker.init(frame, bbox, fps)
+        self.tracker_type = tracker_type
+        self.did_track = None
+
+    def log_stats(self):
+        logger.info(
+            "Automatic tracker updates: %s, switches: %s",
+            self.update_counts,
+            self.switch_count,
+        )
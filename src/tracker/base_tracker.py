@@ -1,4 +1,16 @@
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from src.tracker.tracker_health import Tracker_Health
+
+
 class Base_Tracker:
+    # The scale of the frames the tracker works on, e.g. 0.5 to track at half the
+    # resolution. The boxes it is given and returns stay in source frame coordinates.
+    tracking_scale = 1.0
+
     def init(self, frame, bbox, fps):
         # bbox is expected to be a tuple in the form of (x, y, width, height)
         raise NotImplementedError
@@ -6,5 +18,43 @@ class Base_Tracker:
     def update(self, frame):
         raise NotImplementedError
 
-    def correct(self, frame, bbox, fps):
+    def correct(self, frame, bbox, fps) -> bool:
+        # Returns whether the tracker had to be re-initialised on the detection.
         raise NotImplementedError
+
+    def get_health(self) -> Tracker_Health:
+        # The health signals of the last update, see `Tracker_Health`.
+        return Tracker_Health()
+
+    def smooth(self) -> Optional[np.ndarray]:
+        # The smoothed box of every update for offline runs, `None` if not supported.
+        return None
+
+    def set_tracking_scale(self, tracking_scale: float):
+        if not 0 < tracking_scale <= 1:
+            raise ValueError(f"Tracking scale must be in (0, 1], got {tracking_scale}")
+        self.tracking_scale = tracking_scale
+
+    def to_tracking_frame(self, frame):
+        # The frame at the tracking scale.
+        if self.tracking_scale == 1.0:
+            return frame
+        return cv2.resize(
+            frame,
+            None,
+            fx=self.tracking_scale,
+            fy=self.tracking_scale,
+            interpolation=cv2.INTER_AREA,
+        )
+
+    def to_tracking_bbox(self, bbox):
+        # A box of the source frame in the coordinates of the tracking frame.
+        if self.tracking_scale == 1.0:
+            return tuple(bbox)
+        return tuple(float(value) * self.tracking_scale for value in bbox)
+
+    def from_tracking_bbox(self, bbox):
+        # A box of the tracking frame in the coordinates of the source frame.
+        if self.tracking_scale == 1.0:
+            return bbox
+        return tuple(float(value) / self.tracking_scale for value in bbox)
@@ -0,0 +1,56 @@
+from typing import Callable
+
+import cv2
+import src.tracker.tracker_constants as tracker_constants
+from src.tracker.base_tracker import Base_Tracker
+from src.tracker.tracker_health import Appearance_Model, Tracker_Health
+from src.utils.boundary_utils import calculate_iou
+
+
+class Correlation_Tracker(Base_Tracker):
+    """
+    Correlation_Tracker follows the ball with one of the correlation filter
+    trackers of `cv2.legacy`, e.g. MOSSE or CSRT, built by the factory.
+    """
+
+    def __init__(self, create_tracker: Callable[[], cv2.legacy.Tracker]):
+        self.create_tracker = create_tracker
+        self.tracker = None
+        self.appearance_model = Appearance_Model()
+        # The last tracked frame and box, scored only when the health is asked for.
+        self.last_frame = None
+        self.last_bbox = None
+
+    def init(self, frame, bbox, fps):
+        self.tracker = self.create_tracker()
+        self.tracker.init(self.to_tracking_frame(frame), self.to_tracking_bbox(bbox))
+        self.appearance_model.reset(frame, bbox)
+        self.last_frame = None
+
+    def update(self, frame):
+        did_track, bbox = self.tracker.update(self.to_tracking_frame(frame))
+        bbox = self.from_tracking_bbox(bbox)
+        self.last_frame = frame if did_track else None
+        self.last_bbox = bbox
+        return did_track, bbox
+
+    def correct(self, frame, bbox, fps) -> bool:
+        # The model cannot be moved once trained, so it is only rebuilt when the
+        # detection disagrees with the track.
+        if (
+            self.last_frame is not None
+            and calculate_iou(self.last_bbox, bbox)
+            >= tracker_constants.CORRECTION_IOU_TOLERANCE
+        ):
+            return False
+        self.init(frame, bbox, fps)
+        return True
+
+    def get_health(self) -> Tracker_Health:
+        if self.last_frame is None:
+            return Tracker_Health()
+        return Tracker_Health(
+            appearance_score=self.appearance_model.score(
+                self.last_frame, self.last_bbox
+            )
+        )
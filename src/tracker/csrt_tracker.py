@@ -1,17 +1,7 @@
 import cv2
-from src.tracker.base_tracker import Base_Tracker
+from src.tracker.correlation_tracker import Correlation_Tracker
 
 
-class CSRT_Tracker(Base_Tracker):
+class CSRT_Tracker(Correlation_Tracker):
     def __init__(self):
-        self.tracker = None
-
-    def init(self, frame, bbox, fps):
-        self.tracker = cv2.legacy.TrackerCSRT().create()
-        self.tracker.init(frame, tuple(bbox))
-
-    def update(self, frame):
-        return self.tracker.update(frame)
-
-    def correct(self, frame, bbox, fps):
-        self.init(frame, bbox, fps)
+        super().__init__(cv2.legacy.TrackerCSRT.create)
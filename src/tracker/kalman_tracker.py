@@ -1,70 +1,292 @@
-import cv2
+from dataclasses import dataclass
+
+from typing import List, Optional
+
+import math
+
 import numpy as np
 
 from src.tracker.base_tracker import Base_Tracker
+from src.tracker.tracker_health import Tracker_Health
+
+MOTION_CONSTANT_VELOCITY = "velocity"
+MOTION_CONSTANT_ACCELERATION = "acceleration"
+
+# The measured (center x, center y, width). The box of the ball is assumed to be
+# square, i.e. width == height.
+MEASUREMENT_SIZE = 3
+MEASUREMENT_IDENTITY = np.eye(MEASUREMENT_SIZE)
+
+# The 99% quantile of the chi-squared distribution with 3 degrees of freedom:
+# 1% of the correct detections are rejected by a gate at this squared Mahalanobis distance.
+GATE_THRESHOLD_99 = 11.345
+
+
+@dataclass
+class Kalman_Options:
+    """
+    Kalman_Options tunes the Kalman tracker. The noises are relative to the width
+    of the ball, so that the same options work for near and far balls, and are
+    scaled by the time between frames, so that they work at any frame rate.
+    """
+
+    # MOTION_CONSTANT_VELOCITY or MOTION_CONSTANT_ACCELERATION.
+    motion_model: str = MOTION_CONSTANT_VELOCITY
+    # The standard deviation of the unmodelled change of the highest derivative:
+    # the acceleration for a constant velocity model, the jerk for a constant
+    # acceleration model. In ball widths per s^2, or per s^3.
+    process_noise: float = 40.0
+    # The process noise of the width, as a fraction of the process noise of the position.
+    size_process_noise: float = 0.2
+    # The standard deviation of a detected center and width, in ball widths.
+    measurement_noise: float = 0.1
+    # The squared Mahalanobis distance beyond which a detection is rejected as a
+    # false detection. `None` to accept every detection.
+    gate_threshold: Optional[float] = GATE_THRESHOLD_99
+    # After this many rejected detections in a row, the tracker is re-initialised
+    # on the detection, in case it is the track that went wrong.
+    max_rejections: int = 3
+    # The standard deviation of the predicted center, in ball widths, beyond
+    # which the ball is reported as lost.
+    lost_uncertainty: float = 3.0
+    # Whether to keep the filtered states, so that `smooth` can return the
+    # smoothed boxes after the run. Only for offline runs, it grows with the video.
+    smooth: bool = False
+
+
+@dataclass
+class _Step:
+    """
+    _Step is the state of the filter after one update, kept for smoothing.
+    """
+
+    segment: int
+    predicted_state: np.ndarray
+    predicted_covariance: np.ndarray
+    state: np.ndarray
+    covariance: np.ndarray
+
+
+def get_transition_matrix(order: int, dt: float) -> np.ndarray:
+    """
+    get_transition_matrix returns the transition of one coordinate and its
+    `order - 1` derivatives over `dt` seconds.
+    """
+    transition = np.eye(order)
+    for i in range(order):
+        for j in range(i + 1, order):
+            transition[i, j] = dt ** (j - i) / np.prod(np.arange(1, j - i + 1))
+    return transition
+
+
+def get_process_noise(order: int, dt: float) -> np.ndarray:
+    """
+    get_process_noise returns the process noise of one coordinate and its
+    derivatives for a unit white noise of the highest derivative, held constant
+    over each step of `dt` seconds.
+    """
+    gain = get_transition_matrix(order + 1, dt)[:order, order]
+    return np.outer(gain, gain)
+
+
+def invert_3x3(matrix: np.ndarray) -> np.ndarray:
+    """
+    invert_3x3 inverts a 3x3 matrix by its cofactors, which for a single small
+    matrix is several times faster than `np.linalg.inv`.
+    """
+    (a, b, c), (d, e, f), (g, h, i) = matrix.tolist()
+    cofactors = [
+        [e * i - f * h, c * h - b * i, b * f - c * e],
+        [f * g - d * i, a * i - c * g, c * d - a * f],
+        [d * h - e * g, b * g - a * h, a * e - b * d],
+    ]
+    determinant = a * cofactors[0][0] + b * cofactors[1][0] + c * cofactors[2][0]
+    return np.array(cofactors) / determinant
 
 
 class Kalman_Tracker(Base_Tracker):
-    def __init__(self):
-        self.kf = cv2.KalmanFilter(6, 3)
-
-        # This is set to 6 because of the assumption that the
-        # boundary box of the ball will be square, i.e., width == height.
-        self.kf.transitionMatrix = np.eye(6, dtype=np.float32)
-
-        self.kf.measurementMatrix = np.array(
-            [
-                [1, 0, 0, 0, 0, 0],
-                [0, 1, 0, 0, 0, 0],
-                [0, 0, 1, 0, 0, 0],
-            ],
-            np.float32,
-        )
+    """
+    Kalman_Tracker predicts the center and width of the ball with a constant
+    velocity or constant acceleration Kalman filter, in NumPy. It does not look at
+    the frames, so it needs regular corrections and costs a few matrix products
+    per frame. Detections far from the prediction are rejected by a Mahalanobis
+    gate, and the ball is reported as lost once the prediction is too uncertain.
+    """
+
+    def __init__(self, options: Optional[Kalman_Options] = None):
+        self.options = options if options is not None else Kalman_Options()
+        if self.options.motion_model == MOTION_CONSTANT_VELOCITY:
+            self.order = 2
+        elif self.options.motion_model == MOTION_CONSTANT_ACCELERATION:
+            self.order = 3
+        else:
+            raise ValueError(f"Unknown motion model {self.options.motion_model}")
 
-        self.kf.processNoiseCov = np.eye(6, dtype=np.float32) * 1e-1
-        self.kf.measurementNoiseCov = np.eye(3, dtype=np.float32) * 1e-1
+        # The state is the (center x, center y, width) followed by each of their
+        # derivatives, e.g. the (vx, vy, vw) velocities.
+        state_size = self.order * MEASUREMENT_SIZE
+        self.transition_matrix = np.eye(state_size)
+        # The process noise for a ball of width 1, it scales with the squared width.
+        self.unit_process_noise = np.zeros((state_size, state_size))
 
+        self.state = None
+        self.covariance = None
+        self.predicted_covariance = None
         self.initialised = False
+        self.innovation = None
+        self.rejection_count = 0
+        # The detections rejected by the gate over the whole run.
+        self.rejected_count = 0
+
+        self.segment = 0
+        self.history: List[_Step] = []
 
     def init(self, frame, bbox, fps):
         x, y, width, height = bbox
-        centerX = x + width / 2
-        centerY = y + height / 2
+        width = max(1.0, float(width))
+        self.set_dt(1 / fps)
 
-        dt = 1 / fps
-        self.set_dt(dt)
+        self.state = np.zeros(self.order * MEASUREMENT_SIZE)
+        self.state[:MEASUREMENT_SIZE] = (x + width / 2, y + height / 2, width)
+        # The position is known to the detection noise, the motion is unknown:
+        # up to a few ball widths per second.
+        deviations = np.full(self.order, 4.0 * width)
+        deviations[0] = self.options.measurement_noise * width
+        self.covariance = np.diag(np.repeat(deviations**2, MEASUREMENT_SIZE))
+        self.predicted_covariance = self.covariance
 
-        state = np.array([[centerX], [centerY], [width], [0], [0], [0]], np.float32)
-        self.kf.statePre = state
-        self.kf.statePost = state.copy()
         self.initialised = True
+        self.innovation = None
+        self.rejection_count = 0
+        self.segment += 1
 
     def update(self, frame):
         if not self.initialised:
             return False, None
 
-        prediction = self.kf.predict()
-        centerX = prediction[0].item()
-        centerY = prediction[1].item()
-        width = prediction[2].item()
-        width = max(1, int(width))
+        width = max(1.0, self.state[2])
+        self.state = self.transition_matrix @ self.state
+        self.covariance = (
+            self.transition_matrix @ self.covariance @ self.transition_matrix.T
+            + self.unit_process_noise * width**2
+        )
+        self.predicted_covariance = self.covariance
+        if self.options.smooth:
+            self.history.append(
+                _Step(
+                    self.segment,
+                    self.state,
+                    self.covariance,
+                    self.state,
+                    self.covariance,
+                )
+            )
 
-        x = int(centerX - width / 2)
-        y = int(centerY - width / 2)
-        return True, (x, y, width, width)
+        if self.get_uncertainty() > self.options.lost_uncertainty:
+            return False, None
+        return True, self.get_bbox(self.state)
 
-    def correct(self, frame, bbox, fps):
+    def correct(self, frame, bbox, fps) -> bool:
         x, y, width, height = bbox
-        cx = x + width / 2
-        cy = y + height / 2
+        measurement = np.array([x + width / 2, y + height / 2, width], np.float64)
+
+        residual = measurement - self.state[:MEASUREMENT_SIZE]
+        # How far the detection is from the prediction, relative to the ball size.
+        self.innovation = math.hypot(residual[0], residual[1]) / max(1.0, self.state[2])
 
-        measurement = np.array(
-            [[np.float32(cx)], [np.float32(cy)], [np.float32(width)]],
-            dtype=np.float32,
+        # A lost track is restarted on the detection rather than corrected.
+        if self.get_uncertainty() > self.options.lost_uncertainty:
+            self.init(frame, bbox, fps)
+            return True
+
+        # The measurement picks the first rows of the state, so the measurement
+        # matrix products are slices of the covariance.
+        measured_covariance = self.covariance[:MEASUREMENT_SIZE]
+        residual_covariance = (
+            measured_covariance[:, :MEASUREMENT_SIZE]
+            + self.get_measurement_variance(width) * MEASUREMENT_IDENTITY
+        )
+        residual_precision = invert_3x3(residual_covariance)
+        if self.options.gate_threshold is not None:
+            distance = residual @ residual_precision @ residual
+            if distance > self.options.gate_threshold:
+                self.rejection_count += 1
+                self.rejected_count += 1
+                if self.rejection_count < self.options.max_rejections:
+                    return False
+                self.init(frame, bbox, fps)
+                return True
+        self.rejection_count = 0
+
+        # The transposed Kalman gain.
+        gain_T = residual_precision @ measured_covariance
+        self.state = self.state + residual @ gain_T
+        self.covariance = self.covariance - gain_T.T @ measured_covariance
+        if self.options.smooth and len(self.history) > 0:
+            step = self.history[-1]
+            if step.segment == self.segment:
+                step.state = self.state
+                step.covariance = self.covariance
+        return False
+
+    def get_health(self) -> Tracker_Health:
+        if not self.initialised:
+            return Tracker_Health()
+        return Tracker_Health(
+            innovation=self.innovation, uncertainty=self.get_uncertainty()
         )
-        self.kf.correct(measurement)
+
+    def get_uncertainty(self) -> float:
+        # The standard deviation of the predicted center, relative to the ball size.
+        covariance = self.predicted_covariance
+        return math.sqrt(covariance[0, 0] + covariance[1, 1]) / max(1.0, self.state[2])
+
+    def get_measurement_variance(self, width: float) -> float:
+        # The same for the center and the width, at least a pixel.
+        return max(1.0, self.options.measurement_noise * width) ** 2
+
+    def get_bbox(self, state: np.ndarray):
+        center_x, center_y, width = state[:MEASUREMENT_SIZE]
+        width = max(1, int(width))
+        x = int(center_x - width / 2)
+        y = int(center_y - width / 2)
+        return (x, y, width, width)
 
     def set_dt(self, dt):
-        self.kf.transitionMatrix[0, 3] = dt
-        self.kf.transitionMatrix[1, 4] = dt
-        self.kf.transitionMatrix[2, 5] = dt
+        self.transition_matrix = np.kron(
+            get_transition_matrix(self.order, dt), MEASUREMENT_IDENTITY
+        )
+        deviations = self.options.process_noise * np.array(
+            [1.0, 1.0, self.options.size_process_noise]
+        )
+        self.unit_process_noise = np.kron(
+            get_process_noise(self.order, dt), np.diag(deviations**2)
+        )
+
+    def smooth(self) -> Optional[np.ndarray]:
+        """
+        smooth runs a Rauch-Tung-Striebel smoother over the kept states and returns
+        the smoothed (x, y, width, height) box of every update, in order. Each track,
+        from an initialisation to the next, is smoothed separately.
+        Returns `None` unless the tracker was created with `smooth` enabled.
+        """
+        if not self.options.smooth:
+            return None
+
+        states = [step.state for step in self.history]
+        for i in range(len(self.history) - 2, -1, -1):
+            step, next_step = self.history[i], self.history[i + 1]
+            if step.segment != next_step.segment:
+                continue
+            smoother_gain = np.linalg.solve(
+                next_step.predicted_covariance,
+                self.transition_matrix @ step.covariance,
+            ).T
+            states[i] = step.state + smoother_gain @ (
+                states[i + 1] - next_step.predicted_state
+            )
+
+        boxes = np.empty((len(states), 4), np.float32)
+        for i, state in enumerate(states):
+            boxes[i] = self.get_bbox(state)
+        return boxes
@@ -0,0 +1,370 @@
+from dataclasses import dataclass, field
+from logger import logger
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from src.tracker.base_tracker import Base_Tracker
+from src.tracker.kalman_tracker import Kalman_Options
+import src.tracker.tracker_constants as tracker_constants
+from src.tracker.tracker_creator import create_tracker
+from src.tracker.tracker_health import Tracker_Health
+from src.utils.boundary_utils import calculate_center_errors, calculate_ious
+
+MATCHING_GREEDY = "greedy"
+# Requires scipy.
+MATCHING_HUNGARIAN = "hungarian"
+
+
+@dataclass
+class Multi_Ball_Options:
+    """
+    Multi_Ball_Options tunes the tracking of several balls at once.
+    """
+
+    # The most balls tracked at once. Candidates beyond it do not start a track.
+    max_tracks: int = 5
+    # How detections are assigned to tracks, MATCHING_GREEDY or MATCHING_HUNGARIAN.
+    matching: str = MATCHING_GREEDY
+    # A track and a candidate that do not overlap may still match when their
+    # centers are at most this many ball widths apart, e.g. for a fast ball.
+    max_distance: float = 2.0
+    # The same for the unconfirmed tracks, whose trackers have not learned the
+    # velocity of the ball yet, so that a fast ball can still be confirmed.
+    tentative_max_distance: float = 6.0
+    # A track is confirmed after this many matched detections, including the first.
+    # Until then it is not reported, and it is removed at its first miss.
+    min_hits: int = 2
+    # A confirmed track is removed after this many detections in a row without a match.
+    max_misses: int = 3
+    # The primary ball changes to another confirmed track that was detected with
+    # a higher confidence this many detections in a row.
+    primary_switch_detections: int = 3
+    # The tracker of each ball, one of `tracker_constants.TRACKERS_ALL`.
+    tracker_type: str = tracker_constants.TRACKER_KALMAN
+    # The association replaces the gate of the Kalman trackers.
+    kalman_options: Kalman_Options = field(
+        default_factory=lambda: Kalman_Options(gate_threshold=None)
+    )
+    # The scale of the frames the tracker of each ball works on, see `Base_Tracker`.
+    tracking_scale: float = 1.0
+
+
+@dataclass
+class Ball_Track:
+    """
+    Ball_Track is one ball followed by its own tracker.
+    """
+
+    track_id: int
+    tracker: Base_Tracker
+    # The last tracked or detected boundary.
+    boundary: Tuple[int, int, int, int]
+    confidence: float
+    hits: int = 1
+    misses: int = 0
+    # Whether the tracker followed the ball in the last update.
+    is_tracked: bool = True
+    # Whether the track was matched by the last detection.
+    is_detected: bool = True
+
+    def is_confirmed(self, options: Multi_Ball_Options) -> bool:
+        return self.hits >= options.min_hits
+
+
+def calculate_association_costs(
+    track_boxes: np.ndarray,
+    candidate_boxes: np.ndarray,
+    max_distance: float | np.ndarray,
+) -> np.ndarray:
+    """
+    calculate_association_costs returns the (tracks, candidates) cost of assigning
+    each candidate to each track: 1 - IoU plus the distance between the centers in
+    track widths. Pairs that do not overlap and are further than `max_distance`
+    widths apart cannot match and cost infinity.
+
+    :param track_boxes: The (x, y, width, height) boxes of the tracks, shape (T, 4).
+    :type track_boxes: np.ndarray
+    :param candidate_boxes: The (x, y, width, height) boxes of the candidates, shape (C, 4).
+    :type candidate_boxes: np.ndarray
+    :param max_distance: The largest center distance, in track widths, of a match,
+    for all tracks or for each track, shape (T,).
+    :type max_distance: float | np.ndarray
+    """
+    track_boxes = track_boxes[:, np.newaxis, :]
+    candidate_boxes = candidate_boxes[np.newaxis, :, :]
+    ious = calculate_ious(track_boxes, candidate_boxes)
+    distances = calculate_center_errors(track_boxes, candidate_boxes) / np.maximum(
+        1.0, track_boxes[..., 2]
+    )
+    costs = 1 - ious + distances
+    max_distance = np.reshape(max_distance, (-1, 1))
+    costs[(ious <= 0) & (distances > max_distance)] = np.inf
+    return costs
+
+
+def match_greedy(costs: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    match_greedy assigns the cheapest pairs first, each track and candidate at most once.
+    Returns the matched (track, candidate) indices.
+
+    :param costs: The (tracks, candidates) costs, infinity for pairs that cannot match.
+    :type costs: np.ndarray
+    """
+    track_count, candidate_count = costs.shape
+    order = np.argsort(costs, axis=None, kind="stable")
+    order = order[np.isfinite(costs.flat[order])]
+    is_track_used = np.zeros(track_count, dtype=bool)
+    is_candidate_used = np.zeros(candidate_count, dtype=bool)
+    matches = []
+    for track_index, candidate_index in zip(*np.unravel_index(order, costs.shape)):
+        if is_track_used[track_index] or is_candidate_used[candidate_index]:
+            continue
+        is_track_used[track_index] = True
+        is_candidate_used[candidate_index] = True
+        matches.append((int(track_index), int(candidate_index)))
+        if len(matches) == min(track_count, candidate_count):
+            break
+    return matches
+
+
+def match_hungarian(costs: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    match_hungarian assigns the candidates to the tracks with the lowest total
+    cost. Returns the matched (track, candidate) indices.
+
+    :param costs: The (tracks, candidates) costs, infinity for pairs that cannot match.
+    :type costs: np.ndarray
+    """
+    try:
+        from scipy.optimize import linear_sum_assignment
+    except ImportError as error:
+        raise ImportError(
+            "The Hungarian matching of the multi-ball tracker requires the scipy package"
+        ) from error
+
+    is_finite = np.isfinite(costs)
+    # Pairs that cannot match cost more than any set of pairs that can.
+    infeasible_cost = 1 + 2 * costs[is_finite].sum() if is_finite.any() else 1.0
+    track_indices, candidate_indices = linear_sum_assignment(
+        np.where(is_finite, costs, infeasible_cost)
+    )
+    return [
+        (int(track_index), int(candidate_index))
+        for track_index, candidate_index in zip(track_indices, candidate_indices)
+        if is_finite[track_index, candidate_index]
+    ]
+
+
+class Multi_Ball_Tracker(Base_Tracker):
+    """
+    Multi_Ball_Tracker tracks up to `max_tracks` balls, each with its own tracker.
+    The candidates of every detection are assigned to the tracks by their cost,
+    unmatched candidates start new tracks and tracks that keep missing are removed.
+
+    One confirmed track is the primary ball. `update` and `get_health` report it,
+    so the single-ball outputs follow the primary ball. It stays primary while it
+    is detected, unless another ball is consistently detected with a higher
+    confidence, so the outputs do not jump to another ball nearby.
+    """
+
+    def __init__(self, options: Optional[Multi_Ball_Options] = None):
+        self.options = options if options is not None else Multi_Ball_Options()
+        if self.options.matching == MATCHING_GREEDY:
+            self.match = match_greedy
+        elif self.options.matching == MATCHING_HUNGARIAN:
+            self.match = match_hungarian
+        else:
+            raise ValueError(f"Unknown matching {self.options.matching}")
+
+        self.tracks: List[Ball_Track] = []
+        self.primary_track: Optional[Ball_Track] = None
+        # The detections in a row at which another confirmed track was more
+        # confident than the primary ball.
+        self.primary_challenge_count = 0
+        self.next_track_id = 0
+        # The tracks started and removed over the whole run.
+        self.birth_count = 0
+        self.death_count = 0
+
+    def init(self, frame, bbox, fps):
+        self.tracks = []
+        self.primary_track = None
+        self.primary_challenge_count = 0
+        self.observe(frame, np.array([[*bbox, np.nan]], np.float32), fps)
+
+    def update(self, frame):
+        for track in self.tracks:
+            track.is_tracked, boundary = track.tracker.update(frame)
+            track.is_detected = False
+            if track.is_tracked:
+                track.boundary = boundary
+
+        primary_track = self.primary_track
+        if primary_track is None or not primary_track.is_tracked:
+            return False, None
+        return True, primary_track.boundary
+
+    def correct(self, frame, bbox, fps) -> bool:
+        self.observe(frame, np.array([[*bbox, np.nan]], np.float32), fps)
+        return False
+
+    def get_health(self) -> Tracker_Health:
+        if self.primary_track is None:
+            return Tracker_Health()
+        return self.primary_track.tracker.get_health()
+
+    def observe(self, frame, candidates: np.ndarray, fps: float) -> Optional[int]:
+        """
+        observe assigns the candidates of a detection to the tracks, corrects the
+        matched tracks, starts tracks for the unmatched candidates, removes the
+        tracks that missed too often and selects the primary ball.
+        Returns the index of the candidate of the primary ball, if it was detected.
+
+        :param frame: The detected frame.
+        :param candidates: The (N, 5) candidates of the frame, see `decode_detections`.
+        :type candidates: np.ndarray
+        :param fps: The frame rate of the video.
+        :type fps: float
+        """
+        options = self.options
+        for track in self.tracks:
+            track.is_detected = False
+
+        candidate_boxes = candidates[:, :4].astype(np.float64)
+        matches = []
+        if len(self.tracks) > 0 and len(candidates) > 0:
+            track_boxes = np.array(
+                [track.boundary for track in self.tracks], np.float64
+            )
+            max_distances = np.array(
+                [
+                    (
+                        options.max_distance
+                        if track.is_confirmed(options)
+                        else options.tentative_max_distance
+                    )
+                    for track in self.tracks
+                ]
+            )
+            matches = self.match(
+                calculate_association_costs(track_boxes, candidate_boxes, max_distances)
+            )
+
+        # The candidate that detected each track in this frame, by track id.
+        detected_candidates = {}
+        for track_index, candidate_index in matches:
+            track = self.tracks[track_index]
+            boundary = tuple(int(value) for value in candidate_boxes[candidate_index])
+            track.tracker.correct(frame, boundary, fps)
+            track.boundary = boundary
+            track.confidence = float(candidates[candidate_index, 4])
+            track.hits += 1
+            track.misses = 0
+            track.is_detected = True
+            detected_candidates[track.track_id] = candidate_index
+
+        surviving_tracks = []
+        for track in self.tracks:
+            if not track.is_detected:
+                track.misses += 1
+                if (
+                    not track.is_confirmed(options)
+                    or track.misses >= options.max_misses
+                ):
+                    self.death_count += 1
+                    continue
+            surviving_tracks.append(track)
+        self.tracks = surviving_tracks
+
+        # The candidates are sorted by confidence, so the most confident start first.
+        is_candidate_matched = np.zeros(len(candidates), dtype=bool)
+        is_candidate_matched[list(detected_candidates.values())] = True
+        for candidate_index in np.flatnonzero(~is_candidate_matched).tolist():
+            if len(self.tracks) >= options.max_tracks:
+                break
+            boundary = tuple(int(value) for value in candidate_boxes[candidate_index])
+            tracker = create_tracker(
+                options.tracker_type, options.kalman_options, options.tracking_scale
+            )
+            tracker.init(frame, boundary, fps)
+            self.tracks.append(
+                Ball_Track(
+                    track_id=self.next_track_id,
+                    tracker=tracker,
+                    boundary=boundary,
+                    confidence=float(candidates[candidate_index, 4]),
+                )
+            )
+            detected_candidates[self.next_track_id] = candidate_index
+            self.next_track_id += 1
+            self.birth_count += 1
+
+        self.select_primary_track()
+        if self.primary_track is None:
+            return None
+        return detected_candidates.get(self.primary_track.track_id)
+
+    def select_primary_track(self) -> None:
+        """
+        select_primary_track keeps the primary ball while it is confirmed and
+        detected. It picks another track when the primary ball was removed, missed
+        the last detection while another confirmed track was detected, or was
+        less confident than another detected confirmed track for
+        `primary_switch_detections` detections in a row. The detected confirmed
+        tracks are preferred, then the most confident. Before any track is
+        confirmed, the best unconfirmed track stands in.
+        """
+        options = self.options
+        primary_track = self.primary_track
+        is_alive = any(track is primary_track for track in self.tracks)
+        challengers = [
+            track
+            for track in self.tracks
+            if track is not primary_track
+            and track.is_confirmed(options)
+            and track.is_detected
+        ]
+
+        if is_alive and primary_track.is_confirmed(options):
+            if primary_track.is_detected and any(
+                track.confidence > primary_track.confidence for track in challengers
+            ):
+                self.primary_challenge_count += 1
+            else:
+                self.primary_challenge_count = 0
+
+            is_outranked = (
+                self.primary_challenge_count >= options.primary_switch_detections
+            )
+            is_lost = not primary_track.is_detected and len(challengers) > 0
+            if not is_outranked and not is_lost:
+                return
+        elif is_alive and not any(track.is_confirmed(options) for track in self.tracks):
+            return
+
+        self.primary_challenge_count = 0
+        self.primary_track = max(
+            self.tracks,
+            key=lambda track: (
+                track.is_confirmed(options),
+                track.is_detected,
+                track.confidence,
+                track.hits,
+            ),
+            default=None,
+        )
+
+    def get_confirmed_tracks(self) -> List[Ball_Track]:
+        """
+        get_confirmed_tracks returns the tracks that are reported, i.e. confirmed.
+        """
+        return [track for track in self.tracks if track.is_confirmed(self.options)]
+
+    def log_stats(self):
+        logger.info(
+            "Ball tracks started: %s, removed: %s",
+            self.birth_count,
+            self.death_count,
+        )
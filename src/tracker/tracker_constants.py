@@ -1,6 +1,15 @@
 TRACKER_KALMAN = "KALMAN"
 TRACKER_MOSSE = "MOSSE"
 TRACKER_CSRT = "CSRT"
+# Picks one of the other trackers at every detection within a frame rate budget,
+# see `Auto_Tracker`.
+TRACKER_AUTO = "AUTO"
 
 
 TRACKERS_ALL = [TRACKER_KALMAN, TRACKER_CSRT, TRACKER_MOSSE]
+# The trackers and the automatic selection, e.g. for the command line.
+TRACKER_CHOICES_ALL = TRACKERS_ALL + [TRACKER_AUTO]
+
+# The correlation trackers keep their model when a detection overlaps the
+# tracked box by at least this IoU, instead of being re-initialised on it.
+CORRECTION_IOU_TOLERANCE = 0.5
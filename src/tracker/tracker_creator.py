@@ -1,25 +1,40 @@
 from logger import logger
 
+from typing import Optional
+
 import src.tracker.tracker_constants as tracker_constants
 
-from src.tracker.mosse_tracker import MOSSE_Tracker
-from src.tracker.csrt_tracker import CSRT_Tracker
+from src.tracker.auto_tracker import Auto_Options, Auto_Tracker
 from src.tracker.base_tracker import Base_Tracker
-from src.tracker.kalman_tracker import Kalman_Tracker
-
+from src.tracker.kalman_tracker import Kalman_Options
+import src.tracker.tracker_registry as tracker_registry
 
-def create_tracker(tracker_type: str):
-    if tracker_type == tracker_constants.TRACKER_MOSSE:
-        logger.info("Using %s tracker", tracker_type)
-        return MOSSE_Tracker()
 
-    if tracker_type == tracker_constants.TRACKER_CSRT:
-        logger.info("Using %s tracker", tracker_type)
-        return CSRT_Tracker()
+def create_tracker(
+    tracker_type: str,
+    kalman_options: Optional[Kalman_Options] = None,
+    tracking_scale: float = 1.0,
+    auto_options: Optional[Auto_Options] = None,
+) -> Base_Tracker:
+    """
+    create_tracker returns a new tracker of a type registered in `tracker_registry`,
+    or the automatic tracker for `TRACKER_AUTO`. Raises `ValueError` for an
+    unknown type.
 
-    if tracker_type == tracker_constants.TRACKER_KALMAN:
-        logger.info("Using %s tracker", tracker_type)
-        return Kalman_Tracker()
+    :param tracker_type: The type of the tracker.
+    :type tracker_type: str
+    :param kalman_options: The options of the Kalman tracker.
+    :type kalman_options: Optional[Kalman_Options]
+    :param tracking_scale: The scale of the frames the tracker works on, see `Base_Tracker`.
+    :type tracking_scale: float
+    :param auto_options: The options of the automatic tracker.
+    :type auto_options: Optional[Auto_Options]
+    """
+    if tracker_type == tracker_constants.TRACKER_AUTO:
+        tracker = Auto_Tracker(auto_options, kalman_options)
+    else:
+        tracker = tracker_registry.build_tracker(tracker_type, kalman_options)
 
-    logger.warning("Unknown tracker type %s, defaulting to Base_Tracker", tracker_type)
-    return Base_Tracker()
+    logger.info("Using %s tracker", tracker_type)
+    tracker.set_tracking_scale(tracking_scale)
+    return tracker
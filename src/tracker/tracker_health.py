@@ -0,0 +1,101 @@
+from dataclasses import dataclass
+
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+# The size the patches are resized to before comparing their appearance.
+APPEARANCE_PATCH_SIZE = (32, 32)
+
+
+@dataclass
+class Tracker_Health:
+    """
+    Tracker_Health holds the signals of how well a tracker is following the ball.
+    A signal is `None` when the tracker cannot measure it.
+    """
+
+    # The normalised cross-correlation, in [-1, 1], between the tracked patch and
+    # the patch of the ball at the last detection.
+    appearance_score: Optional[float] = None
+    # The distance between the predicted and the detected position at the last
+    # correction, as a fraction of the box size.
+    innovation: Optional[float] = None
+    # The standard deviation of the predicted position, as a fraction of the box size.
+    uncertainty: Optional[float] = None
+
+
+def get_patch(
+    frame: cv2.typing.MatLike, bbox: Tuple[int, int, int, int]
+) -> Optional[np.ndarray]:
+    """
+    get_patch returns the grayscale patch of the frame in the box, resized to
+    `APPEARANCE_PATCH_SIZE` and normalised to zero mean and unit norm, or `None`
+    if the box is outside the frame or the patch is flat.
+
+    :param frame: The frame.
+    :type frame: cv2.typing.MatLike
+    :param bbox: The (x, y, width, height) box.
+    :type bbox: Tuple[int, int, int, int]
+    """
+    x, y, width, height = (int(value) for value in bbox)
+    frame_height, frame_width = frame.shape[:2]
+    left, top = max(0, x), max(0, y)
+    right, bottom = min(frame_width, x + width), min(frame_height, y + height)
+    if right - left < 2 or bottom - top < 2:
+        return None
+
+    patch = cv2.resize(
+        frame[top:bottom, left:right],
+        APPEARANCE_PATCH_SIZE,
+        interpolation=cv2.INTER_AREA,
+    )
+    if patch.ndim == 3:
+        patch = cv2.cvtColor(patch, cv2.COLOR_BGR2GRAY)
+    patch = patch.astype(np.float32)
+    patch -= patch.mean()
+    norm = np.linalg.norm(patch)
+    if norm < 1e-6:
+        return None
+    return patch / norm
+
+
+class Appearance_Model:
+    """
+    Appearance_Model remembers the patch of the ball at the last detection and
+    scores how similar a tracked patch is to it.
+    """
+
+    def __init__(self):
+        self.template = None
+
+    def reset(self, frame: cv2.typing.MatLike, bbox: Tuple[int, int, int, int]):
+        """
+        reset takes the patch of the ball in the box as the new reference.
+
+        :param frame: The frame the ball was detected in.
+        :type frame: cv2.typing.MatLike
+        :param bbox: The (x, y, width, height) box of the ball.
+        :type bbox: Tuple[int, int, int, int]
+        """
+        self.template = get_patch(frame, bbox)
+
+    def score(
+        self, frame: cv2.typing.MatLike, bbox: Tuple[int, int, int, int]
+    ) -> Optional[float]:
+        """
+        score returns the normalised cross-correlation between the patch in the box
+        and the reference patch, or `None` if either patch is missing.
+
+        :param frame: The frame that was tracked.
+        :type frame: cv2.typing.MatLike
+        :param bbox: The (x, y, width, height) tracked box.
+        :type bbox: Tuple[int, int, int, int]
+        """
+        if self.template is None:
+            return None
+        patch = get_patch(frame, bbox)
+        if patch is None:
+            return None
+        return float(np.sum(patch * self.template))
@@ -0,0 +1,190 @@
+from pathlib import Path
+from dataclasses import asdict, dataclass
+from logger import logger
+import json
+import platform
+import threading
+
+from typing import Callable, Dict, List, Optional
+
+import src.tracker.tracker_constants as tracker_constants
+from src.tracker.base_tracker import Base_Tracker
+from src.tracker.csrt_tracker import CSRT_Tracker
+from src.tracker.kalman_tracker import Kalman_Options, Kalman_Tracker
+from src.tracker.mosse_tracker import MOSSE_Tracker
+
+# Define common PATHs
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[2]
+
+# The calibrated profiles of every host, see `calibrate_trackers`.
+DEFAULT_PROFILE_FILE = ROOT / "cache" / "tracker_profiles.json"
+
+# Builds a tracker from the options of the Kalman tracker, for trackers that use them.
+Tracker_Factory = Callable[[Optional[Kalman_Options]], Base_Tracker]
+
+
+@dataclass
+class Tracker_Profile:
+    """
+    Tracker_Profile is the cost and accuracy of a tracker, used to pick a tracker
+    within a frame rate budget, see `Auto_Tracker`.
+    """
+
+    # Seconds per update of the tracker, at full resolution.
+    frame_cost: float
+    # The mean IoU of the tracked and detected boxes of an evaluation run.
+    accuracy: float
+    # Whether the profile was measured on this host, or is a default.
+    is_calibrated: bool = False
+
+
+@dataclass
+class _Registration:
+    factory: Tracker_Factory
+    profile: Tracker_Profile
+
+
+_registrations: Dict[str, _Registration] = {}
+_loaded_profile_files = set()
+_lock = threading.Lock()
+
+
+def register_tracker(
+    tracker_type: str, factory: Tracker_Factory, profile: Tracker_Profile
+):
+    """
+    register_tracker makes a tracker available to `create_tracker` under its type.
+    Registering a type again replaces it.
+
+    :param tracker_type: The name of the tracker, e.g. "MOSSE".
+    :type tracker_type: str
+    :param factory: Builds a new tracker, given the options of the Kalman tracker.
+    :type factory: Tracker_Factory
+    :param profile: The default cost and accuracy of the tracker, until it is calibrated.
+    :type profile: Tracker_Profile
+    """
+    if tracker_type == tracker_constants.TRACKER_AUTO:
+        raise ValueError(f"{tracker_type} is reserved for the automatic selection")
+    with _lock:
+        _registrations[tracker_type] = _Registration(factory, profile)
+
+
+def get_tracker_types() -> List[str]:
+    """
+    get_tracker_types returns the types of the registered trackers.
+    """
+    return list(_registrations)
+
+
+def build_tracker(
+    tracker_type: str, kalman_options: Optional[Kalman_Options] = None
+) -> Base_Tracker:
+    """
+    build_tracker returns a new tracker of a registered type.
+
+    :param tracker_type: The type of the tracker, see `get_tracker_types`.
+    :type tracker_type: str
+    :param kalman_options: The options of the Kalman tracker.
+    :type kalman_options: Optional[Kalman_Options]
+    """
+    registration = _registrations.get(tracker_type)
+    if registration is None:
+        raise ValueError(
+            f"Unknown tracker type {tracker_type}, expected one of "
+            f"{get_tracker_types() + [tracker_constants.TRACKER_AUTO]}"
+        )
+    return registration.factory(kalman_options)
+
+
+def get_tracker_profile(
+    tracker_type: str, profile_file: Path = DEFAULT_PROFILE_FILE
+) -> Tracker_Profile:
+    """
+    get_tracker_profile returns the cost and accuracy of a registered tracker. The
+    profiles calibrated on this host are read from the profile file on first use.
+
+    :param tracker_type: The type of the tracker, see `get_tracker_types`.
+    :type tracker_type: str
+    :param profile_file: The file of the calibrated profiles.
+    :type profile_file: Path
+    """
+    if profile_file not in _loaded_profile_files:
+        load_tracker_profiles(profile_file)
+    registration = _registrations.get(tracker_type)
+    if registration is None:
+        raise ValueError(f"Unknown tracker type {tracker_type}")
+    return registration.profile
+
+
+def set_tracker_profile(tracker_type: str, profile: Tracker_Profile):
+    """
+    set_tracker_profile replaces the cost and accuracy of a registered tracker,
+    e.g. with calibrated ones.
+    """
+    with _lock:
+        registration = _registrations.get(tracker_type)
+        if registration is None:
+            raise ValueError(f"Unknown tracker type {tracker_type}")
+        registration.profile = profile
+
+
+def load_tracker_profiles(profile_file: Path = DEFAULT_PROFILE_FILE):
+    """
+    load_tracker_profiles sets the profiles calibrated on this host, if any, from
+    the profile file. Trackers that were not calibrated keep their default profile.
+    """
+    _loaded_profile_files.add(profile_file)
+    if not Path(profile_file).exists():
+        return
+
+    with open(profile_file) as file:
+        host_profiles = json.load(file).get(platform.node(), {})
+    for tracker_type, profile in host_profiles.items():
+        if tracker_type in _registrations:
+            set_tracker_profile(tracker_type, Tracker_Profile(**profile))
+    logger.info("Loaded the tracker profiles of this host from %s", profile_file)
+
+
+def save_tracker_profiles(profile_file: Path = DEFAULT_PROFILE_FILE):
+    """
+    save_tracker_profiles writes the calibrated profiles of this host to the
+    profile file, keeping those of the other hosts.
+    """
+    profile_file = Path(profile_file)
+    data = {}
+    if profile_file.exists():
+        with open(profile_file) as file:
+            data = json.load(file)
+    data[platform.node()] = {
+        tracker_type: asdict(registration.profile)
+        for tracker_type, registration in _registrations.items()
+        if registration.profile.is_calibrated
+    }
+    profile_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(profile_file, "w") as file:
+        json.dump(data, file, indent=2)
+    _loaded_profile_files.add(profile_file)
+
+
+# The default profiles all come from three `calibrate_trackers` runs on one video,
+# the 640x360 synthetic video of `Synthetic_Video_Options(frame_count=300,
+# ball_radius=0.05)` with its ground truth boxes as detections. Every tracker
+# follows that ball, while MOSSE loses the smaller default one. The costs are the
+# median time per update, the quantity `Auto_Tracker` follows, and the accuracies
+# their mean IoU, which is the same in every run.
+register_tracker(
+    tracker_constants.TRACKER_KALMAN,
+    Kalman_Tracker,
+    Tracker_Profile(frame_cost=0.000095, accuracy=0.642),
+)
+register_tracker(
+    tracker_constants.TRACKER_MOSSE,
+    lambda kalman_options: MOSSE_Tracker(),
+    Tracker_Profile(frame_cost=0.000119, accuracy=0.601),
+)
+register_tracker(
+    tracker_constants.TRACKER_CSRT,
+    lambda kalman_options: CSRT_Tracker(),
+    Tracker_Profile(frame_cost=0.030, accuracy=0.651),
+)
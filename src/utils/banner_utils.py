@@ -2,6 +2,16 @@ import cv2
 import numpy as np
 
 
+def get_banner_height(frameHeight, heightPercentage=0.08):
+    """
+    get_banner_height returns the height of the banner added to a frame.
+
+    :param frameHeight: The height of the frame/image to which the banner is added.
+    :param heightPercentage: Percentage of the frame height to add as a banner.
+    """
+    return int(heightPercentage * frameHeight)
+
+
 def add_banner(frame, heightPercentage=0.08, bannerColour=(0, 0, 0)):
     """
     add_banner adds a banner to the frame at the top of it.
@@ -10,7 +20,7 @@ def add_banner(frame, heightPercentage=0.08, bannerColour=(0, 0, 0)):
     :param heightPercentage: Percentage of the frame height to add as a banner.
     :param bannerColour: The colour of the banner.
     """
-    bannerHeight = int(heightPercentage * frame.shape[0])
+    bannerHeight = get_banner_height(frame.shape[0], heightPercentage)
     newFrame = np.zeros(
         (bannerHeight + frame.shape[0], frame.shape[1], 3), dtype=np.uint8
     )
@@ -30,6 +40,7 @@ def add_text(
 ):
     """
     add_text adds text on the frame using the parameters provided.
+    Returns the (left, top, width, height) area the text was drawn in.
 
     :param frame: The frame on which text is added.
     :param text: The text that is added to the frame.
@@ -48,3 +59,15 @@ def add_text(
         fontThickness,
         cv2.LINE_AA,
     )
+
+    (width, height), baseline = cv2.getTextSize(
+        text, cv2.FONT_HERSHEY_PLAIN, fontScale, fontThickness
+    )
+    # Anti-aliasing and the stroke thickness spill slightly outside the text size.
+    margin = fontThickness + 1
+    return (
+        location[0] - margin,
+        location[1] - height - margin,
+        width + 2 * margin,
+        height + baseline + 2 * margin,
+    )
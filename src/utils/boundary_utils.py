@@ -1,4 +1,10 @@
+from typing import Sequence
+
 import cv2
+import numpy as np
+
+# The thickness of the rectangles drawn around boundaries.
+RECTANGLE_THICKNESS = 3
 
 
 def draw_rectangle(frame: cv2.typing.MatLike, boundaryBox: list[int], rectangleColour):
@@ -10,12 +16,94 @@ def draw_rectangle(frame: cv2.typing.MatLike, boundaryBox: list[int], rectangleC
     :param boundaryBox: The boundary using which the rectangle will be drawn. It needs to be in the format of (left, top, width, height).
     :type boundaryBox: list[int]
     :param rectangleColour: The colour of the rectangle
+    :return: The (left, top, width, height) area the rectangle was drawn in.
     """
     cv2.rectangle(
         frame,
         (int(boundaryBox[0]), int(boundaryBox[1])),
         (int(boundaryBox[0] + boundaryBox[2]), int(boundaryBox[1] + boundaryBox[3])),
         rectangleColour,
-        3,
+        RECTANGLE_THICKNESS,
         cv2.LINE_AA,
     )
+
+    margin = RECTANGLE_THICKNESS
+    return (
+        int(boundaryBox[0]) - margin,
+        int(boundaryBox[1]) - margin,
+        int(boundaryBox[2]) + 2 * margin,
+        int(boundaryBox[3]) + 2 * margin,
+    )
+
+
+def calculate_iou(boundary_A: Sequence[float], boundary_B: Sequence[float]) -> float:
+    """
+    calculate_iou returns the intersection over union of two (left, top, width, height)
+    boundaries, 0 if either is empty. See `calculate_ious` for arrays.
+
+    :param boundary_A: The first boundary.
+    :type boundary_A: Sequence[float]
+    :param boundary_B: The second boundary.
+    :type boundary_B: Sequence[float]
+    """
+    ax, ay, aw, ah = boundary_A
+    bx, by, bw, bh = boundary_B
+    intersection_width = min(ax + aw, bx + bw) - max(ax, bx)
+    intersection_height = min(ay + ah, by + bh) - max(ay, by)
+    if intersection_width <= 0 or intersection_height <= 0:
+        return 0.0
+
+    intersection_area = intersection_width * intersection_height
+    union_area = aw * ah + bw * bh - intersection_area
+    return intersection_area / union_area if union_area > 0 else 0.0
+
+
+def calculate_ious(boxes_A: np.ndarray, boxes_B: np.ndarray) -> np.ndarray:
+    """
+    calculate_ious returns the IoU of every pair of (x, y, width, height) boxes,
+    NaN where either box is missing. The arrays are broadcast, e.g. two
+    (runs, frames, 4) arrays give a (runs, frames) array.
+
+    :param boxes_A: The first boxes, shape (..., 4).
+    :type boxes_A: np.ndarray
+    :param boxes_B: The second boxes, shape (..., 4).
+    :type boxes_B: np.ndarray
+    """
+    boxes_A = np.asarray(boxes_A, dtype=np.float64)
+    boxes_B = np.asarray(boxes_B, dtype=np.float64)
+    x1 = np.maximum(boxes_A[..., 0], boxes_B[..., 0])
+    y1 = np.maximum(boxes_A[..., 1], boxes_B[..., 1])
+    x2 = np.minimum(
+        boxes_A[..., 0] + boxes_A[..., 2], boxes_B[..., 0] + boxes_B[..., 2]
+    )
+    y2 = np.minimum(
+        boxes_A[..., 1] + boxes_A[..., 3], boxes_B[..., 1] + boxes_B[..., 3]
+    )
+
+    intersection_area = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    union_area = (
+        boxes_A[..., 2] * boxes_A[..., 3]
+        + boxes_B[..., 2] * boxes_B[..., 3]
+        - intersection_area
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ious = np.where(union_area > 0, intersection_area / union_area, 0.0)
+    # NaN boxes give NaN areas, which the comparison above turns into 0.
+    return np.where(np.isnan(union_area), np.nan, ious)
+
+
+def calculate_center_errors(boxes_A: np.ndarray, boxes_B: np.ndarray) -> np.ndarray:
+    """
+    calculate_center_errors returns the euclidean distance between the centers of
+    every pair of (x, y, width, height) boxes, NaN where either box is missing.
+
+    :param boxes_A: The first boxes, shape (..., 4).
+    :type boxes_A: np.ndarray
+    :param boxes_B: The second boxes, shape (..., 4).
+    :type boxes_B: np.ndarray
+    """
+    boxes_A = np.asarray(boxes_A, dtype=np.float64)
+    boxes_B = np.asarray(boxes_B, dtype=np.float64)
+    centers_A = boxes_A[..., :2] + boxes_A[..., 2:] / 2
+    centers_B = boxes_B[..., :2] + boxes_B[..., 2:] / 2
+    return np.hypot(*np.moveaxis(centers_A - centers_B, -1, 0))
@@ -0,0 +1,100 @@
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+from src.utils.banner_utils import get_banner_height
+import src.utils.profiler as profiler_utils
+from src.utils.profiler import NULL_PROFILER, Profiler
+
+
+class Frame_Buffer:
+    """
+    Frame_Buffer is a preallocated canvas made of a banner on top of the image.
+    Frames are decoded directly into the image part of the canvas, so adding the
+    banner costs neither an allocation nor a copy.
+    """
+
+    def __init__(
+        self,
+        frameHeight: int,
+        frameWidth: int,
+        heightPercentage: float = 0.08,
+        bannerColour=(0, 0, 0),
+    ):
+        """
+        :param frameHeight: The height of the decoded frames.
+        :param frameWidth: The width of the decoded frames.
+        :param heightPercentage: Percentage of the frame height to add as a banner.
+        :param bannerColour: The colour of the banner.
+        """
+        bannerHeight = get_banner_height(frameHeight, heightPercentage)
+        self.bannerColour = bannerColour
+        self.canvas = np.empty((bannerHeight + frameHeight, frameWidth, 3), np.uint8)
+        self.canvas[:bannerHeight] = bannerColour
+        self.banner = self.canvas[:bannerHeight]
+        self.image = self.canvas[bannerHeight:]
+
+        # The (left, top, width, height) areas of the canvas that were drawn on.
+        self.drawn_boxes: List[Tuple[int, int, int, int]] = []
+
+    def read(self, cap: cv2.VideoCapture, profiler: Profiler = NULL_PROFILER) -> bool:
+        """
+        read decodes the next frame of the video into the buffer.
+        Returns whether a frame was read.
+
+        :param cap: The video to read from.
+        :type cap: cv2.VideoCapture
+        :param profiler: Times the banner restore and the decoding.
+        :type profiler: Profiler
+        """
+        with profiler.stage(profiler_utils.STAGE_BANNER):
+            self.clear_banner()
+        with profiler.stage(profiler_utils.STAGE_DECODE):
+            has_frame, image = cap.read(self.image)
+            if has_frame and not np.shares_memory(image, self.image):
+                # The decoder could not write in place, e.g. the frame size changed.
+                np.copyto(self.image, image)
+        return has_frame
+
+    def clear_banner(self):
+        """
+        clear_banner restores the banner where something was drawn on it.
+        The image part is overwritten by the next decoded frame.
+        """
+        bannerHeight, bannerWidth = self.banner.shape[:2]
+        for left, top, width, height in self.drawn_boxes:
+            if top >= bannerHeight:
+                continue
+            self.banner[
+                max(0, top) : min(bannerHeight, top + height),
+                max(0, left) : min(bannerWidth, left + width),
+            ] = self.bannerColour
+        self.drawn_boxes.clear()
+
+
+class Frame_Buffer_Ring:
+    """
+    Frame_Buffer_Ring hands out a fixed set of frame buffers in a round robin.
+    A buffer is reused `size` frames after it was handed out, so `size` must be
+    larger than the number of frames in flight at once.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        frameHeight: int,
+        frameWidth: int,
+        heightPercentage: float = 0.08,
+        bannerColour=(0, 0, 0),
+    ):
+        self.buffers = [
+            Frame_Buffer(frameHeight, frameWidth, heightPercentage, bannerColour)
+            for _ in range(max(1, size))
+        ]
+        self.index = 0
+
+    def next(self) -> Frame_Buffer:
+        buffer = self.buffers[self.index]
+        self.index = (self.index + 1) % len(self.buffers)
+        return buffer
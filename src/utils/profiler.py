@@ -0,0 +1,181 @@
+from pathlib import Path
+from dataclasses import dataclass
+from contextlib import nullcontext
+import json
+import os
+import threading
+import time
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# The stages of the pipeline. Detection stages are nested in `STAGE_DETECT`,
+# and the tracking and detection of a frame are nested in `STAGE_FRAME`.
+STAGE_DECODE = "decode"
+STAGE_BANNER = "banner"
+STAGE_FRAME = "frame"
+# Computing the motion map of the motion gate.
+STAGE_MOTION = "motion"
+STAGE_DETECT = "detect"
+STAGE_PREPROCESS = "preprocess"
+STAGE_FORWARD = "forward"
+STAGE_POSTPROCESS = "postprocess"
+STAGE_TRACK = "track"
+# Initialising or correcting the tracker with a detection.
+STAGE_CORRECT = "correct"
+STAGE_RENDER = "render"
+STAGE_ENCODE = "encode"
+STAGE_DISPLAY = "display"
+# Writing a chunk of the trajectory export.
+STAGE_EXPORT = "export"
+
+
+@dataclass
+class Stage_Stats:
+    """
+    Stage_Stats summarises the time spent in one stage, in seconds.
+    """
+
+    count: int
+    total_time: float
+    p50: float
+    p95: float
+    p99: float
+
+
+class _Stage:
+    """
+    _Stage times one call of a stage, see `Profiler.stage`.
+    """
+
+    __slots__ = ["events", "name", "start_time"]
+
+    def __init__(self, events: list, name: str):
+        self.events = events
+        self.name = name
+
+    def __enter__(self):
+        self.start_time = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        end_time = time.perf_counter_ns()
+        self.events.append(
+            (
+                self.name,
+                self.start_time,
+                end_time - self.start_time,
+                threading.get_ident(),
+            )
+        )
+        return False
+
+
+class Profiler:
+    """
+    Profiler records the start and duration of every call of each stage with a
+    monotonic clock. Stages may be timed from several threads, e.g. the decoder
+    and encoder threads of the pipeline.
+    """
+
+    is_enabled = True
+
+    def __init__(self):
+        # (stage, start in ns, duration in ns, thread id) of every call.
+        self.events: List[Tuple[str, int, int, int]] = []
+
+    def stage(self, name: str) -> _Stage:
+        """
+        stage returns a context manager that times the code it wraps as one call
+        of the stage.
+
+        :param name: The name of the stage, e.g. one of the `STAGE_` constants.
+        :type name: str
+        """
+        return _Stage(self.events, name)
+
+    def record(self, name: str, start_time: int, duration: int):
+        """
+        record adds one call of the stage that was timed by the caller.
+
+        :param name: The name of the stage.
+        :type name: str
+        :param start_time: The start of the call, from `time.perf_counter_ns`.
+        :type start_time: int
+        :param duration: The duration of the call, in nanoseconds.
+        :type duration: int
+        """
+        self.events.append((name, start_time, duration, threading.get_ident()))
+
+    def summary(self) -> Dict[str, Stage_Stats]:
+        """
+        summary returns the call count, total time and latency percentiles of each stage.
+        """
+        if len(self.events) == 0:
+            return {}
+
+        names = np.array([event[0] for event in self.events])
+        durations = np.array([event[2] for event in self.events], dtype=np.float64)
+        durations /= 1e9
+        stats = {}
+        for name in dict.fromkeys(names.tolist()):
+            stage_durations = durations[names == name]
+            p50, p95, p99 = np.percentile(stage_durations, [50, 95, 99])
+            stats[name] = Stage_Stats(
+                count=len(stage_durations),
+                total_time=float(stage_durations.sum()),
+                p50=float(p50),
+                p95=float(p95),
+                p99=float(p99),
+            )
+        return stats
+
+    def write_trace(self, trace_file: Path):
+        """
+        write_trace writes the calls as a Chrome trace event JSON file, which
+        timeline viewers such as Perfetto or chrome://tracing can load.
+
+        :param trace_file: The file to write.
+        :type trace_file: Path
+        """
+        trace_file = Path(trace_file)
+        trace_file.parent.mkdir(parents=True, exist_ok=True)
+        process_id = os.getpid()
+        first_start = min((event[1] for event in self.events), default=0)
+        trace_events = [
+            {
+                "name": name,
+                "ph": "X",
+                "ts": (start - first_start) / 1e3,
+                "dur": duration / 1e3,
+                "pid": process_id,
+                "tid": thread_id,
+            }
+            for name, start, duration, thread_id in self.events
+        ]
+        with open(trace_file, "w") as file:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, file)
+
+
+class Null_Profiler:
+    """
+    Null_Profiler has the interface of `Profiler` but records nothing, so that
+    instrumented code costs a single no-op context manager when profiling is disabled.
+    """
+
+    is_enabled = False
+
+    _NULL_STAGE = nullcontext()
+
+    def stage(self, name: str) -> nullcontext:
+        return self._NULL_STAGE
+
+    def record(self, name: str, start_time: int, duration: int):
+        pass
+
+    def summary(self) -> Dict[str, Stage_Stats]:
+        return {}
+
+
+NULL_PROFILER = Null_Profiler()
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from src.tracker.auto_tracker import Auto_Options, Auto_Tracker
+from src.tracker.base_tracker import Base_Tracker
+import src.tracker.tracker_registry as tracker_registry
+from src.tracker.tracker_registry import Tracker_Profile
+
+CHEAP = "TEST_CHEAP"
+ACCURATE = "TEST_ACCURATE"
+FPS = 30.0
+FRAME = np.zeros((360, 640, 3), np.uint8)
+BALL = (100, 100, 32, 32)
+
+
+class Still_Tracker(Base_Tracker):
+    """
+    Still_Tracker reports the ball where it was last detected.
+    """
+
+    def init(self, frame, bbox, fps):
+        self.bbox = bbox
+
+    def update(self, frame):
+        return True, self.bbox
+
+    def correct(self, frame, bbox, fps) -> bool:
+        self.bbox = bbox
+        return False
+
+
+@pytest.fixture(autouse=True)
+def test_trackers(monkeypatch):
+    # The test trackers are only registered for the test.
+    monkeypatch.setattr(
+        tracker_registry, "_registrations", dict(tracker_registry._registrations)
+    )
+    tracker_registry.register_tracker(
+        CHEAP,
+        lambda kalman_options: Still_Tracker(),
+        Tracker_Profile(frame_cost=0.001, accuracy=0.5),
+    )
+    tracker_registry.register_tracker(
+        ACCURATE,
+        lambda kalman_options: Still_Tracker(),
+        Tracker_Profile(frame_cost=0.02, accuracy=0.9),
+    )
+
+
+def make_tracker(fps_budget: float) -> Auto_Tracker:
+    return Auto_Tracker(
+        Auto_Options(fps_budget=fps_budget, tracker_types=[CHEAP, ACCURATE])
+    )
+
+
+def follow(tracker: Auto_Tracker, bbox, detection_count: int):
+    for _ in range(detection_count):
+        tracker.update(FRAME)
+        tracker.correct(FRAME, bbox, FPS)
+
+
+def test_picks_the_most_accurate_tracker_in_the_budget():
+    tracker = make_tracker(fps_budget=FPS)
+    tracker.init(FRAME, BALL, FPS)
+
+    assert tracker.tracker_type == ACCURATE
+
+
+def test_picks_a_tracker_that_fits_the_budget():
+    # 0.02 seconds per update does not fit in the 0.01 seconds of 100 FPS.
+    tracker = make_tracker(fps_budget=100)
+    tracker.init(FRAME, BALL, FPS)
+    assert tracker.tracker_type == CHEAP
+
+    # If no tracker fits, the cheapest one follows the ball.
+    tracker = make_tracker(fps_budget=10000)
+    tracker.init(FRAME, BALL, FPS)
+    assert tracker.tracker_type == CHEAP
+
+
+def test_stable_ball_switches_to_the_cheapest_tracker():
+    tracker = make_tracker(fps_budget=1)
+    tracker.init(FRAME, BALL, FPS)
+    follow(tracker, BALL, detection_count=1)
+    assert tracker.tracker_type == ACCURATE
+    assert tracker.switch_count == 0
+
+    follow(tracker, BALL, detection_count=1)
+    assert tracker.tracker_type == CHEAP
+    assert tracker.switch_count == 1
+
+
+def test_small_ball_is_never_stable():
+    tracker = make_tracker(fps_budget=1)
+    tracker.init(FRAME, (100, 100, 8, 8), FPS)
+    follow(tracker, (100, 100, 8, 8), detection_count=5)
+
+    assert tracker.tracker_type == ACCURATE
+    assert tracker.update_counts[ACCURATE] == 5
+    assert tracker.update_counts[CHEAP] == 0
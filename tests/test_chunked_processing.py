@@ -0,0 +1,31 @@
+from src.processor.chunked_processing import plan_segments
+
+
+def test_segments_cover_every_frame_once():
+    segments = plan_segments(100, 3, overlap_frames=10)
+
+    assert segments[0][:2] == (0, 0)
+    assert segments[-1][2] == 100
+    for (_, _, end), (_, start, _) in zip(segments[:-1], segments[1:]):
+        assert start == end
+    for warm_up_start, start, end in segments:
+        assert warm_up_start == max(0, start - 10)
+        assert start < end
+
+
+def test_warm_up_starts_at_keyframes():
+    segments = plan_segments(1000, 4, overlap_frames=60, keyframe_interval=48)
+
+    for warm_up_start, start, _ in segments:
+        assert warm_up_start <= max(0, start - 60)
+        # Frame index 0 is the second frame of the video, so the seek to
+        # `warm_up_start + 1` must land on a keyframe.
+        if warm_up_start > 0:
+            assert (warm_up_start + 1) % 48 == 0
+        assert start - warm_up_start < 60 + 48
+
+
+def test_more_segments_than_frames():
+    segments = plan_segments(2, 5, overlap_frames=1)
+
+    assert [(start, end) for _, start, end in segments] == [(0, 1), (1, 2)]
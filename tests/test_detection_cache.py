@@ -0,0 +1,84 @@
+from pathlib import Path
+
+import numpy as np
+
+from src.detector.detect_soccer_ball import empty_candidates
+from src.detector.detection_cache import Detection_Cache, get_cache_key
+
+
+class Fake_Detector:
+    """
+    Fake_Detector returns one candidate per frame, at the mean of the frame,
+    and counts the frames it detects.
+    """
+
+    def __init__(self, model_file: Path, backend: str = "OPENCV", target: str = "CPU"):
+        self.model_files = [model_file]
+        self.backend = backend
+        self.target = target
+        self.input_size = (416, 416)
+        self.frame_count = 0
+
+    def detect_batch(self, frames, profiler=None):
+        self.frame_count += len(frames)
+        return [
+            np.array([[float(frame.mean()), 0, 10, 10, 0.9]], np.float32)
+            for frame in frames
+        ]
+
+
+def make_frames(count: int):
+    return [np.full((4, 4, 3), i, np.uint8) for i in range(count)]
+
+
+def test_round_trips_through_npz(tmp_path):
+    cache = Detection_Cache(tmp_path / "cache.npz")
+    ball = np.array([[1, 2, 3, 4, 0.5], [5, 6, 7, 8, 0.25]], np.float32)
+    cache.put(0, ball)
+    cache.put(2, empty_candidates())
+    cache.put(5, ball[:1])
+    cache.save()
+
+    loaded = Detection_Cache(tmp_path / "cache.npz")
+    assert np.array_equal(loaded.get(0), ball)
+    assert len(loaded.get(2)) == 0
+    assert np.array_equal(loaded.get(5), ball[:1])
+    # Frames that were never detected are not cached.
+    assert loaded.get(1) is None
+    assert loaded.get(100) is None
+    assert not loaded.is_modified
+
+
+def test_detects_only_the_missing_frames(tmp_path):
+    detector = Fake_Detector(tmp_path / "model.cfg")
+    cache = Detection_Cache(tmp_path / "cache.npz")
+    frames = make_frames(6)
+
+    first = cache.detect_batch(detector, frames[:4], 0)
+    assert detector.frame_count == 4
+    second = cache.detect_batch(detector, frames, 0)
+    assert detector.frame_count == 6
+    assert cache.hit_count == 4
+    assert cache.miss_count == 6
+    for i, candidates in enumerate(second):
+        assert candidates[0, 0] == i
+    for a, b in zip(first, second):
+        assert np.array_equal(a, b)
+
+
+def test_key_changes_with_the_detector(tmp_path):
+    input_file = tmp_path / "video.mp4"
+    input_file.write_bytes(b"video")
+    model_file = tmp_path / "model.cfg"
+    model_file.write_bytes(b"model")
+
+    key = get_cache_key(input_file, Fake_Detector(model_file))
+    assert key == get_cache_key(input_file, Fake_Detector(model_file))
+    assert key != get_cache_key(input_file, Fake_Detector(model_file, target="CUDA"))
+    assert key != get_cache_key(
+        input_file, Fake_Detector(model_file, backend="ONNXRUNTIME")
+    )
+
+    other_file = tmp_path / "other.mp4"
+    other_file.write_bytes(b"other video")
+    assert key != get_cache_key(other_file, Fake_Detector(model_file))
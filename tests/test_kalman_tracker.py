@@ -0,0 +1,144 @@
+import numpy as np
+import pytest
+
+from src.tracker.kalman_tracker import (
+    MOTION_CONSTANT_ACCELERATION,
+    Kalman_Options,
+    Kalman_Tracker,
+    invert_3x3,
+)
+
+FPS = 30.0
+BALL_WIDTH = 20
+FRAME_COUNT = 60
+
+
+def get_ball_box(frame_index: int):
+    # The ball moves right at 6 pixels and down at 2 pixels per frame.
+    return (100 + 6 * frame_index, 50 + 2 * frame_index, BALL_WIDTH, BALL_WIDTH)
+
+
+def get_center(box) -> np.ndarray:
+    x, y, width, height = box
+    return np.array([x + width / 2, y + height / 2])
+
+
+def test_invert_3x3_matches_numpy():
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(3, 3)) + 3 * np.eye(3)
+
+    assert np.allclose(invert_3x3(matrix), np.linalg.inv(matrix))
+
+
+@pytest.mark.parametrize("motion_model", ["velocity", MOTION_CONSTANT_ACCELERATION])
+def test_follows_a_ball_at_constant_velocity(motion_model):
+    tracker = Kalman_Tracker(Kalman_Options(motion_model=motion_model))
+    tracker.init(None, get_ball_box(0), FPS)
+    for frame_index in range(1, FRAME_COUNT):
+        did_track, box = tracker.update(None)
+        assert did_track
+        assert tracker.correct(None, get_ball_box(frame_index), FPS) is False
+
+    did_track, box = tracker.update(None)
+    assert did_track
+    assert np.linalg.norm(get_center(box) - get_center(get_ball_box(FRAME_COUNT))) <= 2
+
+
+def test_gate_rejects_far_detections_then_reinitialises():
+    tracker = Kalman_Tracker(Kalman_Options(max_rejections=3))
+    tracker.init(None, get_ball_box(0), FPS)
+    for frame_index in range(1, 10):
+        tracker.update(None)
+        tracker.correct(None, get_ball_box(frame_index), FPS)
+
+    far_box = (500, 300, BALL_WIDTH, BALL_WIDTH)
+    for rejection_count in range(1, 3):
+        _, box = tracker.update(None)
+        assert tracker.correct(None, far_box, FPS) is False
+        assert tracker.rejected_count == rejection_count
+        # A rejected detection does not move the track.
+        assert np.linalg.norm(get_center(box) - get_center(far_box)) > 100
+
+    tracker.update(None)
+    assert tracker.correct(None, far_box, FPS) is True
+    _, box = tracker.update(None)
+    assert np.linalg.norm(get_center(box) - get_center(far_box)) <= 2
+
+
+def test_without_gate_every_detection_is_accepted():
+    tracker = Kalman_Tracker(Kalman_Options(gate_threshold=None))
+    tracker.init(None, get_ball_box(0), FPS)
+    tracker.update(None)
+
+    assert tracker.correct(None, (500, 300, BALL_WIDTH, BALL_WIDTH), FPS) is False
+    assert tracker.rejected_count == 0
+    assert tracker.get_health().innovation > 10
+
+
+def test_loses_the_ball_without_corrections():
+    tracker = Kalman_Tracker()
+    tracker.init(None, get_ball_box(0), FPS)
+    uncertainties = []
+    did_track = True
+    while did_track and len(uncertainties) < 1000:
+        did_track, box = tracker.update(None)
+        uncertainties.append(tracker.get_health().uncertainty)
+
+    assert not did_track
+    assert box is None
+    assert uncertainties == sorted(uncertainties)
+    assert uncertainties[-1] > Kalman_Options().lost_uncertainty
+
+
+def test_smoothing_is_more_accurate_than_filtering():
+    rng = np.random.default_rng(0)
+    tracker = Kalman_Tracker(Kalman_Options(smooth=True))
+    tracker.init(None, get_ball_box(0), FPS)
+    tracked_boxes = []
+    for frame_index in range(1, FRAME_COUNT):
+        did_track, box = tracker.update(None)
+        tracked_boxes.append(box)
+        x, y, width, height = get_ball_box(frame_index)
+        noise_x, noise_y = rng.normal(scale=2.0, size=2)
+        tracker.correct(None, (x + noise_x, y + noise_y, width, height), FPS)
+
+    smoothed_boxes = tracker.smooth()
+    assert smoothed_boxes.shape == (FRAME_COUNT - 1, 4)
+    truth = np.array([get_center(get_ball_box(i)) for i in range(1, FRAME_COUNT)])
+    tracked_error = np.linalg.norm(
+        np.array([get_center(box) for box in tracked_boxes]) - truth, axis=1
+    )
+    smoothed_error = np.linalg.norm(
+        np.array([get_center(box) for box in smoothed_boxes]) - truth, axis=1
+    )
+    # The first updates have no velocity yet, so both start far off.
+    assert smoothed_error[10:].mean() < tracked_error[10:].mean()
+
+
+def test_smooths_each_track_separately():
+    tracker = Kalman_Tracker(Kalman_Options(smooth=True))
+    tracker.init(None, get_ball_box(0), FPS)
+    for frame_index in range(1, 6):
+        tracker.update(None)
+        tracker.correct(None, get_ball_box(frame_index), FPS)
+
+    # The ball jumps, and a new track starts at the jump.
+    jump_box = (500, 300, BALL_WIDTH, BALL_WIDTH)
+    tracker.init(None, jump_box, FPS)
+    for _ in range(5):
+        tracker.update(None)
+        tracker.correct(None, jump_box, FPS)
+
+    smoothed_boxes = tracker.smooth()
+    assert len(smoothed_boxes) == 10
+    # The boxes before the jump are not pulled towards it.
+    assert np.all(smoothed_boxes[:5, 0] < 200)
+    assert np.allclose(smoothed_boxes[5:], jump_box, atol=1)
+
+
+def test_does_not_smooth_by_default():
+    tracker = Kalman_Tracker()
+    tracker.init(None, get_ball_box(0), FPS)
+    tracker.update(None)
+
+    assert tracker.smooth() is None
@@ -0,0 +1,139 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from src.analyser.metrics import (
+    DISTANCE_THRESHOLDS,
+    IOU_THRESHOLDS,
+    calculate_metrics,
+    calculate_result_metrics,
+    calculate_run_lengths,
+    count_identity_switches,
+)
+from src.processor.result import Process_Result
+import src.processor.trajectory as trajectory
+from src.processor.trajectory import Trajectory
+
+NAN_BOX = [np.nan] * 4
+
+
+def make_result(detected_boxes, tracked_boxes, frame_latencies) -> Process_Result:
+    detected_trajectory = Trajectory()
+    tracked_trajectory = Trajectory()
+    for frame_index, (detected_box, tracked_box) in enumerate(
+        zip(detected_boxes, tracked_boxes)
+    ):
+        detected_trajectory.append(
+            frame_index, detected_box, trajectory.SOURCE_DETECTED
+        )
+        tracked_trajectory.append(frame_index, tracked_box, trajectory.SOURCE_TRACKED)
+    return Process_Result(
+        input_path=None,
+        output_path=None,
+        tracker_type="KALMAN",
+        input_fps=30.0,
+        frame_count=len(detected_boxes),
+        processing_time=1.0,
+        detected_frame_count=len(detected_boxes),
+        tracked_frame_count=len(tracked_boxes),
+        tracking_missed_count=0,
+        detected_trajectory=detected_trajectory,
+        tracked_trajectory=tracked_trajectory,
+        frame_latencies=np.asarray(frame_latencies, np.float64),
+    )
+
+
+def test_matches_a_frame_by_frame_comparison():
+    detected_boxes = np.array(
+        [[0, 0, 10, 10], [10, 0, 10, 10], [20, 0, 10, 10], NAN_BOX], np.float64
+    )
+    tracked_boxes = np.array(
+        [[0, 0, 10, 10], [15, 0, 10, 10], NAN_BOX, [30, 0, 10, 10]], np.float64
+    )
+    metrics = calculate_metrics(detected_boxes, tracked_boxes)
+
+    assert metrics["compared_frame_count"] == 2
+    # The second frame overlaps by half: an IoU of 5 * 10 / (15 * 10).
+    assert metrics["mean_iou"] == pytest.approx((1 + 1 / 3) / 2)
+    assert metrics["mean_distance"] == pytest.approx(2.5)
+    assert metrics["precision"] == 1.0
+    expected_precision_curve = [int(0 <= t) + int(5 <= t) for t in DISTANCE_THRESHOLDS]
+    assert np.allclose(
+        metrics["precision_curve"], np.divide(expected_precision_curve, 2)
+    )
+    expected_success_curve = [int(1 > t) + int(1 / 3 > t) for t in IOU_THRESHOLDS]
+    assert np.allclose(metrics["success_curve"], np.divide(expected_success_curve, 2))
+    assert metrics["tracked_ratio"] == 0.75
+    assert metrics["longest_track_ratio"] == 0.5
+    assert metrics["track_fragment_count"] == 2
+    assert metrics["reacquisition_count"] == 1
+
+
+def test_runs_are_computed_at_once_with_padding():
+    rng = np.random.default_rng(0)
+    runs = []
+    for frame_count in [5, 9]:
+        boxes = rng.uniform(0, 50, size=(2, frame_count, 4))
+        boxes[..., 2:] += 10
+        runs.append(boxes)
+    stacked = np.full((2, 2, 9, 4), np.nan)
+    for i, boxes in enumerate(runs):
+        stacked[:, i, : boxes.shape[1]] = boxes
+    metrics = calculate_metrics(stacked[0], stacked[1], frame_counts=np.array([5, 9]))
+
+    for i, boxes in enumerate(runs):
+        run_metrics = calculate_metrics(boxes[0], boxes[1])
+        for name, values in run_metrics.items():
+            assert np.allclose(metrics[name][i], values, equal_nan=True), name
+
+
+def test_all_nan_run_has_nan_accuracy_without_warnings():
+    boxes = np.full((2, 6, 4), np.nan)
+    boxes[0, :, :] = [0, 0, 10, 10]
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        metrics = calculate_metrics(
+            boxes[0], boxes[1], frame_latencies=np.full(6, np.nan)
+        )
+
+    assert metrics["compared_frame_count"] == 0
+    for name in ["mean_iou", "mean_distance", "precision", "success_auc"]:
+        assert np.isnan(metrics[name]), name
+    assert np.isnan(metrics["precision_curve"]).all()
+    assert np.isnan(metrics["success_curve"]).all()
+    assert np.isnan(metrics["latency_p50"])
+    assert metrics["tracked_ratio"] == 0
+    assert metrics["track_fragment_count"] == 0
+    assert metrics["reacquisition_count"] == 0
+    assert metrics["identity_switch_count"] == 0
+
+
+def test_empty_runs():
+    results = [
+        make_result([], [], []),
+        make_result([[0, 0, 10, 10]], [[0, 0, 10, 10]], [0.01]),
+    ]
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        metrics = calculate_result_metrics(results)
+
+    assert list(metrics["compared_frame_count"]) == [0, 1]
+    assert np.isnan(metrics["mean_iou"][0])
+    assert metrics["mean_iou"][1] == 1
+    assert np.isnan(metrics["latency_p95"][0])
+    assert metrics["latency_p95"][1] == pytest.approx(0.01)
+
+    # Without any frame in any run.
+    metrics = calculate_result_metrics([make_result([], [], [])])
+    assert metrics["compared_frame_count"].shape == (1,)
+    assert metrics["precision_curve"].shape == (1, len(DISTANCE_THRESHOLDS))
+    assert np.isnan(metrics["latency_p99"]).all()
+
+
+def test_run_lengths_and_identity_switches():
+    mask = np.array([True, True, False, True, True, True, False])
+    assert list(calculate_run_lengths(mask)) == [1, 2, 0, 1, 2, 3, 0]
+
+    ious = np.array([0.8, np.nan, 0.0, 0.0, 0.5, np.nan, 0.0])
+    assert count_identity_switches(ious) == 2
@@ -0,0 +1,167 @@
+import numpy as np
+import pytest
+
+from src.tracker.multi_ball_tracker import (
+    MATCHING_HUNGARIAN,
+    Multi_Ball_Options,
+    Multi_Ball_Tracker,
+    calculate_association_costs,
+    match_greedy,
+    match_hungarian,
+)
+
+FPS = 30.0
+BALL_WIDTH = 20
+
+
+def get_ball_box(ball: int, frame_index: int):
+    # Ball 0 moves right along the top, ball 1 left along the bottom.
+    if ball == 0:
+        return (100 + 5 * frame_index, 100, BALL_WIDTH, BALL_WIDTH)
+    return (500 - 5 * frame_index, 300, BALL_WIDTH, BALL_WIDTH)
+
+
+def make_candidates(boxes, confidences) -> np.ndarray:
+    return np.array(
+        [[*box, confidence] for box, confidence in zip(boxes, confidences)],
+        np.float32,
+    )
+
+
+def detect(tracker: Multi_Ball_Tracker, frame_index: int, balls, confidences):
+    tracker.update(None)
+    candidates = make_candidates(
+        [get_ball_box(ball, frame_index) for ball in balls], confidences
+    )
+    return tracker.observe(None, candidates, FPS)
+
+
+def test_association_costs():
+    track_boxes = np.array([[0, 0, 10, 10], [100, 100, 10, 10]], np.float64)
+    candidate_boxes = np.array([[0, 0, 10, 10], [15, 0, 10, 10]], np.float64)
+    costs = calculate_association_costs(track_boxes, candidate_boxes, 2.0)
+
+    assert costs.shape == (2, 2)
+    assert costs[0, 0] == 0
+    # No overlap, but 1.5 widths away.
+    assert costs[0, 1] == pytest.approx(2.5)
+    assert np.isinf(costs[1]).all()
+    # The limit can be set per track.
+    costs = calculate_association_costs(
+        track_boxes, candidate_boxes, np.array([1.0, 2.0])
+    )
+    assert np.isinf(costs[0, 1])
+
+
+def test_greedy_matching_takes_the_cheapest_pairs():
+    costs = np.array([[0.1, 0.5, np.inf], [0.2, np.inf, np.inf], [np.inf] * 3])
+
+    assert match_greedy(costs) == [(0, 0)]
+    costs[0, 0] = 0.3
+    assert sorted(match_greedy(costs)) == [(0, 1), (1, 0)]
+
+
+def test_hungarian_matching_minimises_the_total_cost():
+    pytest.importorskip("scipy")
+    costs = np.array([[0.1, 0.2], [0.15, np.inf]])
+
+    # Greedy takes (0, 0) first and leaves track 1 unmatched.
+    assert match_greedy(costs) == [(0, 0)]
+    assert sorted(match_hungarian(costs)) == [(0, 1), (1, 0)]
+
+
+def test_keeps_the_identity_of_each_ball():
+    tracker = Multi_Ball_Tracker()
+    tracker.observe(None, make_candidates([get_ball_box(0, 0)], [0.9]), FPS)
+    tracker.update(None)
+    tracker.observe(
+        None, make_candidates([get_ball_box(1, 1), get_ball_box(0, 1)], [0.9, 0.8]), FPS
+    )
+    track_ids = {track.boundary[1]: track.track_id for track in tracker.tracks}
+
+    for frame_index in range(2, 20):
+        # The order of the candidates changes with their confidence.
+        balls = [0, 1] if frame_index % 2 else [1, 0]
+        detect(tracker, frame_index, balls, [0.9, 0.8])
+        assert len(tracker.tracks) == 2
+        for track in tracker.tracks:
+            assert track_ids[track.boundary[1]] == track.track_id
+    assert len(tracker.get_confirmed_tracks()) == 2
+    assert tracker.birth_count == 2
+    assert tracker.death_count == 0
+
+
+def test_removes_tracks_that_keep_missing():
+    tracker = Multi_Ball_Tracker(Multi_Ball_Options(max_misses=3))
+    detect(tracker, 0, [0, 1], [0.9, 0.8])
+    detect(tracker, 1, [0, 1], [0.9, 0.8])
+    assert len(tracker.get_confirmed_tracks()) == 2
+
+    for frame_index in range(2, 4):
+        detect(tracker, frame_index, [0], [0.9])
+        assert len(tracker.tracks) == 2
+    detect(tracker, 4, [0], [0.9])
+    assert len(tracker.tracks) == 1
+    assert tracker.death_count == 1
+
+    # An unconfirmed track is removed at its first miss.
+    detect(tracker, 5, [0, 1], [0.9, 0.8])
+    assert len(tracker.tracks) == 2
+    detect(tracker, 6, [0], [0.9])
+    assert len(tracker.tracks) == 1
+
+
+def test_limits_the_number_of_tracks():
+    tracker = Multi_Ball_Tracker(Multi_Ball_Options(max_tracks=1))
+    detect(tracker, 0, [1, 0], [0.9, 0.8])
+
+    assert len(tracker.tracks) == 1
+    assert tracker.tracks[0].boundary == get_ball_box(1, 0)
+
+
+def test_primary_ball_changes_only_when_consistently_outranked():
+    tracker = Multi_Ball_Tracker(Multi_Ball_Options(primary_switch_detections=3))
+    assert detect(tracker, 0, [0], [0.9]) == 0
+    detect(tracker, 1, [0, 1], [0.9, 0.5])
+    detect(tracker, 2, [0, 1], [0.9, 0.5])
+    primary_id = tracker.primary_track.track_id
+
+    # The other ball is more confident twice, not enough to take over.
+    for frame_index in range(3, 5):
+        assert detect(tracker, frame_index, [1, 0], [0.95, 0.9]) == 1
+        assert tracker.primary_track.track_id == primary_id
+    assert detect(tracker, 5, [0, 1], [0.9, 0.5]) == 0
+    assert tracker.primary_track.track_id == primary_id
+
+    for frame_index in range(6, 8):
+        detect(tracker, frame_index, [1, 0], [0.95, 0.9])
+    assert tracker.primary_track.track_id == primary_id
+    assert detect(tracker, 8, [1, 0], [0.95, 0.9]) == 0
+    assert tracker.primary_track.track_id != primary_id
+    did_track, boundary = tracker.update(None)
+    assert did_track
+    assert boundary[1] > 250
+
+
+def test_primary_ball_changes_when_it_is_missed():
+    tracker = Multi_Ball_Tracker()
+    for frame_index in range(3):
+        detect(tracker, frame_index, [0, 1], [0.9, 0.5])
+    primary_id = tracker.primary_track.track_id
+
+    assert detect(tracker, 3, [1], [0.5]) == 0
+    assert tracker.primary_track.track_id != primary_id
+
+
+@pytest.mark.parametrize("matching", ["greedy", MATCHING_HUNGARIAN])
+def test_single_ball_outputs_follow_the_primary_ball(matching):
+    if matching == MATCHING_HUNGARIAN:
+        pytest.importorskip("scipy")
+    tracker = Multi_Ball_Tracker(Multi_Ball_Options(matching=matching))
+    tracker.init(None, get_ball_box(0, 0), FPS)
+    for frame_index in range(1, 10):
+        did_track, boundary = tracker.update(None)
+        assert did_track
+        assert abs(boundary[0] - get_ball_box(0, frame_index)[0]) <= 5
+        tracker.correct(None, get_ball_box(0, frame_index), FPS)
+    assert tracker.get_health().uncertainty is not None
@@ -0,0 +1,116 @@
+import time
+
+from typing import Iterator
+
+import cv2
+import numpy as np
+
+from src.detector.detect_soccer_ball import empty_candidates
+from src.processor.stream import DROP_OLDEST, Stream_Options, process_stream
+import src.tracker.tracker_constants as tracker_constants
+
+FRAME_COUNT = 60
+FRAME_SIZE = (320, 180)
+
+
+class Fake_Detector:
+    """
+    Fake_Detector finds the white ball of the synthetic frames, optionally taking
+    a fixed time per call like a slow network would.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.call_count = 0
+
+    def detect(self, frame, profiler=None) -> np.ndarray:
+        self.call_count += 1
+        time.sleep(self.delay)
+        ys, xs = np.nonzero(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) > 200)
+        if len(xs) == 0:
+            return empty_candidates()
+        x, y = xs.min(), ys.min()
+        width, height = xs.max() - x + 1, ys.max() - y + 1
+        return np.array([[x, y, width, height, 0.9]], np.float32)
+
+
+def get_ball_center(frame_index: int):
+    return (20 + 4 * frame_index, 90)
+
+
+def generate_frames(frame_count: int = FRAME_COUNT) -> Iterator[np.ndarray]:
+    width, height = FRAME_SIZE
+    for frame_index in range(frame_count):
+        frame = np.full((height, width, 3), 40, np.uint8)
+        cv2.circle(frame, get_ball_center(frame_index), 8, (255, 255, 255), -1)
+        yield frame
+
+
+def test_yields_every_frame_in_order():
+    detector = Fake_Detector()
+    stream_frames = list(
+        process_stream(
+            generate_frames(),
+            tracker_constants.TRACKER_KALMAN,
+            detector=detector,
+            detection_interval=5,
+        )
+    )
+
+    assert [stream_frame.frame_index for stream_frame in stream_frames] == list(
+        range(FRAME_COUNT)
+    )
+    assert all(stream_frame.dropped_frame_count == 0 for stream_frame in stream_frames)
+    assert detector.call_count == FRAME_COUNT // 5
+    for stream_frame in stream_frames:
+        assert stream_frame.state.frame_index == stream_frame.frame_index
+        assert stream_frame.latency >= 0
+        if stream_frame.frame_index % 5 == 0:
+            x, y, width, height = stream_frame.state.detected_boundary
+            center_x, center_y = get_ball_center(stream_frame.frame_index)
+            assert abs(x + width / 2 - center_x) <= 1
+            assert abs(y + height / 2 - center_y) <= 1
+        else:
+            assert stream_frame.state.tracked_boundary is not None
+
+
+def test_oldest_policy_does_not_drop_without_latency_budget():
+    stream_frames = list(
+        process_stream(
+            generate_frames(),
+            tracker_constants.TRACKER_KALMAN,
+            detector=Fake_Detector(delay=0.005),
+            detection_interval=1,
+            options=Stream_Options(drop_policy=DROP_OLDEST, queue_size=1),
+        )
+    )
+
+    assert len(stream_frames) == FRAME_COUNT
+    assert stream_frames[-1].dropped_frame_count == 0
+
+
+def test_drops_late_frames_and_keeps_detecting():
+    # The source delivers a frame every 10 ms, while every second frame takes
+    # 50 ms to detect, so processing falls behind the budget.
+    stream_frames = list(
+        process_stream(
+            generate_frames(),
+            tracker_constants.TRACKER_KALMAN,
+            detector=Fake_Detector(delay=0.05),
+            detection_interval=2,
+            options=Stream_Options(
+                latency_budget=0.01, is_real_time=True, fps=100, queue_size=2
+            ),
+        )
+    )
+
+    frame_indices = [stream_frame.frame_index for stream_frame in stream_frames]
+    dropped_frame_count = stream_frames[-1].dropped_frame_count
+    assert dropped_frame_count > 0
+    assert len(stream_frames) + dropped_frame_count <= FRAME_COUNT
+    assert frame_indices == sorted(set(frame_indices))
+    # The detections follow the processed frames, not the source indices that
+    # skip the dropped frames.
+    assert [stream_frame.state.stage == "DETECT" for stream_frame in stream_frames] == [
+        i % 2 == 0 for i in range(len(stream_frames))
+    ]
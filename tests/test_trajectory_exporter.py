@@ -0,0 +1,157 @@
+import csv
+import json
+
+from typing import Iterator
+
+import cv2
+import numpy as np
+import pytest
+
+from src.detector.detect_soccer_ball import empty_candidates
+from src.processor.frame_processor import Frame_Processor
+import src.processor.trajectory as trajectory
+from src.processor.trajectory import Trajectory
+from src.processor.trajectory_exporter import (
+    EXPORT_CSV_COLUMNS,
+    TRACKER_HEALTH_COLUMNS,
+    Export_Options,
+    Trajectory_Exporter,
+    _Npy_Appender,
+    read_export_window,
+)
+import src.tracker.tracker_constants as tracker_constants
+
+FRAME_COUNT = 40
+FRAME_SIZE = (320, 180)
+FPS = 20.0
+
+
+class Fake_Detector:
+    """
+    Fake_Detector finds the white ball of the synthetic frames.
+    """
+
+    def detect(self, frame, profiler=None) -> np.ndarray:
+        ys, xs = np.nonzero(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) > 200)
+        if len(xs) == 0:
+            return empty_candidates()
+        x, y = xs.min(), ys.min()
+        width, height = xs.max() - x + 1, ys.max() - y + 1
+        return np.array([[x, y, width, height, 0.9]], np.float32)
+
+
+def generate_frames(frame_count: int = FRAME_COUNT) -> Iterator[np.ndarray]:
+    width, height = FRAME_SIZE
+    for frame_index in range(frame_count):
+        frame = np.full((height, width, 3), 40, np.uint8)
+        cv2.circle(frame, (20 + 4 * frame_index, 90), 8, (255, 255, 255), -1)
+        yield frame
+
+
+def export_video(path, chunk_size: int = 16) -> Frame_Processor:
+    exporter = Trajectory_Exporter(path, FPS, Export_Options(chunk_size=chunk_size))
+    processor = Frame_Processor(
+        tracker_type=tracker_constants.TRACKER_KALMAN,
+        detector=Fake_Detector(),
+        input_fps=FPS,
+        detection_interval=5,
+        trajectory_exporter=exporter,
+    )
+    for frame in generate_frames():
+        processor.process_frame(frame)
+    processor.finish()
+    exporter.close()
+    return processor
+
+
+def test_appender_writes_a_loadable_npy_file(tmp_path):
+    path = tmp_path / "boxes.npy"
+    appender = _Npy_Appender(path, np.float32, (4,))
+    assert np.load(path).shape == (0, 4)
+
+    rows = np.arange(20, dtype=np.float32).reshape(5, 4)
+    appender.append(rows[:2])
+    # A reader sees the rows of the chunks appended so far.
+    assert np.array_equal(np.load(path, mmap_mode="r"), rows[:2])
+    appender.append(rows[2:])
+    appender.close()
+
+    assert np.array_equal(np.load(path), rows)
+
+
+def test_binary_export_reads_back_windows(tmp_path):
+    processor = export_video(tmp_path / "export")
+    detected, tracked, timestamp, health = read_export_window(tmp_path / "export")
+
+    assert len(tracked) == len(detected) == FRAME_COUNT
+    assert np.array_equal(tracked.frame_index, np.arange(FRAME_COUNT))
+    assert np.allclose(timestamp, np.arange(FRAME_COUNT) / FPS)
+    assert np.array_equal(detected.source, processor.detected_trajectory.source)
+    assert np.array_equal(tracked.source, processor.tracked_trajectory.source)
+    assert np.array_equal(
+        detected.confidence, processor.detected_trajectory.confidence, equal_nan=True
+    )
+    assert sorted(health) == sorted(TRACKER_HEALTH_COLUMNS)
+    # The Kalman tracker measures its uncertainty on every tracked frame.
+    is_tracked = tracked.source == trajectory.SOURCE_TRACKED
+    assert is_tracked.any()
+    assert not np.isnan(health["uncertainty"][is_tracked]).any()
+    assert np.isnan(health["appearance_score"]).all()
+
+    detected, tracked, timestamp, health = read_export_window(
+        tmp_path / "export", start_time=0.5, end_time=1.0
+    )
+    assert np.array_equal(tracked.frame_index, np.arange(10, 21))
+    assert np.array_equal(detected.frame_index, np.arange(10, 21))
+    assert len(timestamp) == len(health["innovation"]) == 11
+
+
+@pytest.mark.parametrize("suffix", [".jsonl", ".csv"])
+def test_text_exports_match_binary_export(tmp_path, suffix):
+    export_video(tmp_path / "export")
+    _, tracked, _, health = read_export_window(tmp_path / "export")
+    export_video(tmp_path / f"export{suffix}")
+
+    with open(tmp_path / f"export{suffix}") as file:
+        if suffix == ".jsonl":
+            records = [json.loads(line) for line in file]
+        else:
+            reader = csv.DictReader(file)
+            assert reader.fieldnames == EXPORT_CSV_COLUMNS
+            records = list(reader)
+
+    assert len(records) == FRAME_COUNT
+    for i, record in enumerate(records):
+        assert int(record["frame_index"]) == i
+        assert "tracked_confidence" in record
+        for column in TRACKER_HEALTH_COLUMNS:
+            value = record[column]
+            if suffix == ".csv":
+                value = float(value)
+                if np.isnan(value):
+                    value = None
+            if np.isnan(health[column][i]):
+                assert value is None
+            else:
+                assert value == pytest.approx(health[column][i], rel=1e-5)
+
+
+def test_exports_pending_rows_only(tmp_path):
+    detected = Trajectory()
+    tracked = Trajectory()
+    for frame_index in range(3):
+        detected.append(frame_index, None, trajectory.SOURCE_SKIPPED)
+        tracked.append(frame_index, [1, 2, 3, 4], trajectory.SOURCE_TRACKED)
+
+    exporter = Trajectory_Exporter(tmp_path / "export.jsonl", FPS)
+    exporter.write(detected, tracked)
+    exporter.write(detected, tracked, start=2)
+    exporter.write(detected, tracked, start=3)
+    exporter.close()
+
+    with open(tmp_path / "export.jsonl") as file:
+        records = [json.loads(line) for line in file]
+    assert [record["frame_index"] for record in records] == [0, 1, 2, 2]
+    assert records[0]["tracked"] == [1, 2, 3, 4]
+    assert records[0]["detected"] is None
+    assert all(record["uncertainty"] is None for record in records)